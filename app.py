@@ -3,20 +3,140 @@ import yaml
 import os
 import json
 import tempfile
+import time
 import shutil
+import traceback
 from datetime import datetime
-from utils.doc_loader import load_document
+from utils.doc_loader import SUPPORTED_FILE_TYPES
+from utils.batch_loader import collect_sources, load_corpus
 from utils.graph_db import Neo4jHandler
-from utils.llm_extractor import process_text_with_llm, generate_cypher
+from utils.pipeline import build_graph
+from utils.build_control import BuildControl
+from utils.usage import UsageTracker
+from utils.token_accounting import ThroughputStore, plan_build
+from utils.model_router import CascadeRouter
+from utils.gazetteer import build_gazetteer, SKIP_NEVER, SKIP_NO_MATCH, SKIP_NO_ENTITIES
+from utils.entity_resolution import build_resolver
+from utils.ontology import compile_ontology
+from utils.triple_exporter import open_exporter, EXPORT_FORMATS, DEFAULT_EXPORT_DIR
+from utils.provider_registry import get_registry
+from utils.job_runner import JobRunner, ACTIVE_STATUSES, JOB_PAUSED
+from utils.logging_utils import configure_logging
+from utils.autotune import autotune, profile_key, TuningStore
+from utils.config_manager import config_manager
+from components import (display_usage_stats, display_routing_stats, display_gazetteer_stats, display_resolution_stats,
+                        display_normalization_stats, display_export_stats, display_write_failures, display_build_plan, display_autotune_profile, display_job_status,
+                        display_job_list, render_triple_card_html, BuildProgressView)
+
+# 后台任务状态自动刷新的间隔（秒）
+JOB_REFRESH_INTERVAL = 5
 
 # 页面配置
 st.set_page_config(page_title="KG AI Builder", layout="wide", page_icon="🔗")
 
-# --- 自定义CSS样式 --- 
-# 从外部文件加载CSS样式
-with open("styles/main.css", "r", encoding="utf-8") as f:
-    custom_css = f.read()
-st.markdown(f"<style>{custom_css}</style>", unsafe_allow_html=True)
+# 日志级别取环境变量 KG_LOG_LEVEL 或 config/app_config.py 中的 LOG_LEVEL
+configure_logging()
+
+
+@st.cache_resource
+def load_static_assets():
+    """读取自定义 CSS 和 JavaScript（每个进程只读取一次，重新运行脚本时不再访问磁盘）"""
+    with open("styles/main.css", "r", encoding="utf-8") as f:
+        custom_css = f.read()
+    with open("styles/main.js", "r", encoding="utf-8") as f:
+        custom_js = f.read()
+    return f"<style>{custom_css}</style>", f"<script>{custom_js}</script>"
+
+
+@st.cache_resource
+def get_llm_options():
+    """模型下拉框选项，来自服务商注册表（config/providers.yaml），每个进程只构建一次"""
+    return get_registry().ui_options()
+
+
+@st.cache_resource
+def get_job_runner():
+    """进程级共享的后台任务执行器，所有会话共用同一个全局并发上限"""
+    return JobRunner(max_concurrent_jobs=2)
+
+
+def corpus_cache_key(uploaded_files, directory, max_chunk_size, min_chunk_size, dedup):
+    """文档解析结果的缓存键：上传文件的名称和大小、目录中文件的路径/大小/修改时间，以及切分和去重参数"""
+    files = tuple((getattr(f, "file_id", None), f.name, f.size) for f in uploaded_files or [])
+    dir_files = ()
+    if directory and os.path.isdir(directory):
+        dir_files = tuple(
+            (path, stat.st_size, stat.st_mtime_ns)
+            for root, _, names in os.walk(directory) for name in sorted(names)
+            for path in [os.path.join(root, name)] for stat in [os.stat(path)])
+    return files, directory, dir_files, int(max_chunk_size), int(min_chunk_size), bool(dedup)
+
+
+def load_corpus_cached(uploaded_files, directory, max_chunk_size, min_chunk_size, dedup):
+    """
+    解析上传文件和目录中的文档；输入和参数不变时复用上一次的结果（每次界面交互都会重新运行脚本），
+    只缓存最近一次的结果
+
+    Returns:
+        (文本块记录列表, 文档统计列表, 错误信息列表)
+    """
+    key = corpus_cache_key(uploaded_files, directory, max_chunk_size, min_chunk_size, dedup)
+    cached = st.session_state.get("corpus_cache")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    sources, source_errors = collect_sources(uploaded_files, directory)
+    chunk_records, documents, load_errors = load_corpus(sources, max_chunk_size, min_chunk_size, dedup=dedup)
+    result = (chunk_records, documents, source_errors + load_errors)
+    st.session_state.corpus_cache = (key, result)
+    return result
+
+
+def cancel_running_build():
+    """“停止构建”按钮的回调：请求取消本会话正在运行的同步构建"""
+    control = st.session_state.get("build_control")
+    if control is not None:
+        control.cancel()
+
+
+def cancelled_build_message(stats):
+    """已取消构建的提示：处理进度以及取消延迟、放弃的在途请求数（见 BuildControl.summary）"""
+    message = (f"⏹ 构建已停止：已处理 {stats['total_chunks']} 个语义块，入库了 {stats['total_triples']} 个三元组，"
+               f"未处理的文本块可重新构建。")
+    control_stats = stats.get("control") or {}
+    if control_stats.get("cancel_latency_seconds") is not None:
+        message += (f"取消后 {control_stats['cancel_latency_seconds']:.1f} 秒停止，"
+                    f"放弃 {control_stats['abandoned_requests']} 个超时的在途请求。")
+    return message
+
+
+def apply_autotune_profile(profile):
+    """在下一次运行脚本、创建输入框之前，把调优配置写入文本块大小、并发数和写入批量输入框的状态"""
+    st.session_state.autotune_pending = {
+        "max_chunk_input": profile["chunk_size"],
+        "min_chunk_input": profile["min_chunk_size"],
+        "max_concurrency_input": profile["concurrency"],
+        "write_batch_input": profile["write_batch_size"]
+    }
+    st.rerun()
+
+
+def load_gazetteer(ontology, skip_policy, neo4j_config):
+    """构建已知实体索引：每次重新读取图谱中的实体名称，读取失败时只使用YAML中的声明"""
+    gazetteer = build_gazetteer(ontology, skip_policy=skip_policy)
+    try:
+        name_handler = Neo4jHandler(neo4j_config["uri"], neo4j_config["user"], neo4j_config["password"])
+        try:
+            gazetteer.add_graph_names(name_handler)
+        finally:
+            name_handler.close()
+    except Exception as e:
+        st.warning(f"⚠️ 读取图谱实体名称失败，仅使用YAML中声明的实体和关键词: {e}")
+    return gazetteer
+
+
+# --- 自定义CSS样式和JavaScript（已缓存）---
+custom_css_html, custom_js_html = load_static_assets()
+st.markdown(custom_css_html, unsafe_allow_html=True)
 
 # 页面标题和副标题
 st.markdown("""
@@ -25,10 +145,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # 添加JavaScript来禁用输入框的回车提交功能
-# 从外部文件加载JavaScript脚本
-with open("styles/main.js", "r", encoding="utf-8") as f:
-    custom_js = f.read()
-st.markdown(f"<script>{custom_js}</script>", unsafe_allow_html=True)
+st.markdown(custom_js_html, unsafe_allow_html=True)
 
 # --- 步骤式主界面 ---
 
@@ -69,7 +186,10 @@ with main_col:
         try:
             ontology_data = yaml.safe_load(uploaded_yaml)
 
-            ontology_content = yaml.dump(ontology_data, allow_unicode=True)
+            ontology_yaml = yaml.dump(ontology_data, allow_unicode=True)
+            # 检查属性类型和索引声明，声明有误时不进入构建
+            compile_ontology(ontology_yaml)
+            ontology_content = ontology_yaml
 
             # 终端风格展示 YAML 解析结果（统一为一个完整的终端）
             # 使用紧凑的字符串拼接避免多余空白
@@ -107,7 +227,14 @@ with main_col:
     # st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<h3>Source Documents</h3>', unsafe_allow_html=True)
 
-    uploaded_file = st.file_uploader("Upload Text Document", type=["pdf", "docx", "xlsx"])
+    uploaded_files = st.file_uploader("Upload Text Documents", type=SUPPORTED_FILE_TYPES + ["zip"],
+                                      accept_multiple_files=True)
+    source_directory = st.text_input("或输入本地目录路径（批量导入目录下所有文档）", value="",
+                                     placeholder="/path/to/docs", key="source_dir_input")
+
+    # 应用自动调优的结果（输入框创建之后不能再修改其状态）
+    for widget_key, widget_value in st.session_state.pop("autotune_pending", {}).items():
+        st.session_state[widget_key] = widget_value
 
     # 文本块大小配置
     col1, col2 = st.columns(2)
@@ -120,23 +247,35 @@ with main_col:
                                          value=500, step=50,
                                          key="min_chunk_input")
 
+    # 去重配置：去除跨页重复的页眉页脚/免责声明，以及重复或近重复的文本块
+    enable_dedup = st.checkbox("🧹 去除样板内容与重复文本块（节省LLM调用）", value=False, key="dedup_checkbox",
+                               help="删除在多页中反复出现的行，并使用MinHash/LSH剔除近重复文本块，全部在本地完成")
+
     chunks = []
-    if uploaded_file:
+    chunk_records = []
+    if uploaded_files or source_directory.strip():
         with st.spinner("智能解析文档中..."):
-            chunks_list, err = load_document(uploaded_file, max_chunk_size, min_chunk_size)
-            if err:
+            chunk_records, documents, load_errors = load_corpus_cached(uploaded_files,
+                                                                       source_directory.strip() or None,
+                                                                       max_chunk_size, min_chunk_size, enable_dedup)
+            for err in load_errors:
                 st.error(err)
-            else:
-                chunks = chunks_list
-                st.success(f"智能切分完成！共生成 {len(chunks)} 个语义块")
+
+            if chunk_records:
+                chunks = [record["text"] for record in chunk_records]
+                st.success(f"智能切分完成！共解析 {len(documents)} 个文档，生成 {len(chunks)} 个语义块")
+
+                tokens_saved = sum(doc["tokens_saved"] for doc in documents)
+                if enable_dedup and tokens_saved:
+                    st.info(f"🧹 去重完成：删除样板内容与重复文本块，预计节省 {tokens_saved} tokens")
 
                 # 保存文件信息到session state
                 st.session_state['uploaded_files'] = [{
-                    'name': uploaded_file.name,
-                    'size': uploaded_file.size,
-                    'chunks_count': len(chunks),
+                    'name': doc['name'],
+                    'size': doc['chars'],
+                    'chunks_count': doc['chunks_count'],
                     'uploaded_at': datetime.now().isoformat()
-                }]
+                } for doc in documents]
 
                 # 显示统计信息
                 col1, col2, col3 = st.columns(3)
@@ -150,8 +289,17 @@ with main_col:
                     st.metric("总字符数", f"{total_chars} 字符")
 
                 # 终端风格展示解析内容
-                terminal_content = '<div class="terminal-container"><div class="terminal-header"><div class="terminal-dot close"></div><div class="terminal-dot minimize"></div><div class="terminal-dot maximize"></div><div class="terminal-title">Document Parsing Results</div></div><div class="terminal"><span class="command">$</span> <span class="path">smart-parse-document</span> <span class="result">{0}</span><br><span class="success">✓</span> <span class="info">Document parsed successfully with smart segmentation</span><br><span class="info">Total semantic chunks:</span> <span class="result">{1}</span><br><span class="info">Average chunk size:</span> <span class="result">{2} chars</span><br><br><span class="info">Sample chunks:</span><br>'.format(
-                    uploaded_file.name, len(chunks), avg_size)
+                terminal_content = '<div class="terminal-container"><div class="terminal-header"><div class="terminal-dot close"></div><div class="terminal-dot minimize"></div><div class="terminal-dot maximize"></div><div class="terminal-title">Document Parsing Results</div></div><div class="terminal"><span class="command">$</span> <span class="path">smart-parse-document</span> <span class="result">{0} document(s)</span><br><span class="success">✓</span> <span class="info">Documents parsed successfully with smart segmentation</span><br><span class="info">Total semantic chunks:</span> <span class="result">{1}</span><br><span class="info">Average chunk size:</span> <span class="result">{2} chars</span><br><br><span class="info">Documents:</span><br>'.format(
+                    len(documents), len(chunks), avg_size)
+
+                # 显示前5个文档
+                for i, doc in enumerate(documents[:5]):
+                    terminal_content += '<span class="sentence">[{0:2d}] {1} ({2} chunks)</span><br>'.format(
+                        i + 1, doc['name'], doc['chunks_count'])
+                if len(documents) > 5:
+                    terminal_content += '<span class="info">... and {0} more documents</span><br>'.format(len(documents) - 5)
+
+                terminal_content += '<br><span class="info">Sample chunks:</span><br>'
 
                 # 显示前3个文本块
                 for i, chunk in enumerate(chunks[:3]):
@@ -170,34 +318,8 @@ with main_col:
 
     # LLM 模型选择
     st.subheader("LLM Configuration")
-    llm_options = [
-        {"name": "GLM-4-Flash (智谱AI)", "key": "glm4", "model_name": "glm-4-flash",
-         "api_key_label": "Zhipu AI API Key"},
-        {"name": "GLM-4 (智谱AI)", "key": "glm4_full", "model_name": "glm-4", "api_key_label": "Zhipu AI API Key"},
-        {"name": "GPT-4 (OpenAI)", "key": "gpt4", "model_name": "gpt-4", "api_key_label": "OpenAI API Key"},
-        {"name": "GPT-3.5-Turbo (OpenAI)", "key": "gpt35", "model_name": "gpt-3.5-turbo",
-         "api_key_label": "OpenAI API Key"},
-        {"name": "GPT-4-Turbo (OpenAI)", "key": "gpt4_turbo", "model_name": "gpt-4-turbo",
-         "api_key_label": "OpenAI API Key"},
-        {"name": "Claude 3-Opus (Anthropic)", "key": "claude3_opus", "model_name": "claude-3-opus-20240229",
-         "api_key_label": "Anthropic API Key"},
-        {"name": "Claude 3-Sonnet (Anthropic)", "key": "claude3_sonnet", "model_name": "claude-3-sonnet-20240229",
-         "api_key_label": "Anthropic API Key"},
-        {"name": "Claude 3-Haiku (Anthropic)", "key": "claude3_haiku", "model_name": "claude-3-haiku-20240307",
-         "api_key_label": "Anthropic API Key"},
-        {"name": "Gemini-Pro (Google)", "key": "gemini_pro", "model_name": "gemini-pro",
-         "api_key_label": "Google API Key"},
-        {"name": "Gemini-Pro-Vision (Google)", "key": "gemini_pro_vision", "model_name": "gemini-pro-vision",
-         "api_key_label": "Google API Key"},
-        {"name": "Qwen-Turbo (阿里云通义千问)", "key": "qwen_turbo", "model_name": "qwen-turbo",
-         "api_key_label": "Aliyun API Key"},
-        {"name": "Qwen-Plus (阿里云通义千问)", "key": "qwen_plus", "model_name": "qwen-plus",
-         "api_key_label": "Aliyun API Key"},
-        {"name": "Llama 3-8B (Meta)", "key": "llama3_8b", "model_name": "llama3-8b",
-         "api_key_label": "Llama 3 API Key"},
-        {"name": "Llama 3-70B (Meta)", "key": "llama3_70b", "model_name": "llama3-70b",
-         "api_key_label": "Llama 3 API Key"}
-    ]
+    # 模型列表来自服务商注册表（config/providers.yaml）
+    llm_options = get_llm_options()
 
     # 渲染模型选择下拉框
     default_llm_index = 0
@@ -218,6 +340,86 @@ with main_col:
                             type="password",
                             key="api_key_input")
 
+    # 并发配置：整个语料的文本块共享同一个调度队列
+    max_concurrency = st.number_input("并发LLM请求数", min_value=1, max_value=32,
+                                      value=min(4, llm_choice["max_concurrency"]), step=1,
+                                      key="max_concurrency_input",
+                                      help="同时在途的LLM请求数量，跨文档调度以保持请求池满载；"
+                                           f"该服务商的并发上限为 {llm_choice['max_concurrency']}")
+
+    # Neo4j 写入批量：攒够指定数量的三元组后再写入，默认取配置文件中的 processing.batch_size
+    write_batch_size = st.number_input("Neo4j写入批量（三元组数）", min_value=1, max_value=5000,
+                                       value=int(config_manager.get("processing.batch_size", 1)), step=1,
+                                       key="write_batch_input",
+                                       help="1 表示每个文本块抽取完成后立即写入；较大的批量可减少数据库会话开销")
+
+    # 自动调优：按 模型@接口地址 保存的校准结果可直接复用
+    saved_profile = TuningStore().get(profile_key(selected_model_name))
+    if saved_profile:
+        tune_col1, tune_col2 = st.columns([3, 1])
+        with tune_col1:
+            st.caption(f"🎛️ 已保存该模型的调优配置：文本块 {saved_profile['chunk_size']} 字符，"
+                       f"并发 {saved_profile['concurrency']}，写入批量 {saved_profile['write_batch_size']}")
+        with tune_col2:
+            if st.button("应用调优配置", key="apply_autotune_button", use_container_width=True):
+                apply_autotune_profile(saved_profile)
+
+    # 本体裁剪：根据YAML中声明的keywords/aliases，为每个文本块只发送相关的类型和关系
+    prune_schema = st.checkbox("✂️ 按文本块裁剪本体（减少提示词token）", value=False, key="prune_schema_checkbox",
+                               help="需要在YAML的实体/关系中声明keywords或aliases；未命中任何类型时自动使用完整本体")
+
+    # 级联路由：先用所选模型抽取，解析失败、校验通过率低或文本块复杂时升级到更强的模型
+    use_cascade = st.checkbox("🪜 级联路由（低成本模型优先，失败时升级）", value=False, key="use_cascade_checkbox",
+                              help="所选模型作为第一级；响应无法解析、三元组大多不符合本体或文本块较复杂时，交给升级模型处理")
+    escalation_choice = None
+    escalation_api_key = ""
+    min_accept_ratio = 0.5
+    route_complex = True
+    if use_cascade:
+        escalation_options = [option for option in llm_options if option["key"] != selected_llm_key]
+        escalation_choice = st.selectbox("升级模型", options=escalation_options, format_func=lambda x: x["name"],
+                                         key="escalation_model_select")
+        if escalation_choice["api_key_label"] != api_key_label:
+            escalation_api_key = st.text_input(escalation_choice["api_key_label"] + "（升级模型）", value='',
+                                               type="password", key="escalation_api_key_input")
+        min_accept_ratio = st.slider("本体校验通过率低于该值时升级", min_value=0.0, max_value=1.0, value=0.5,
+                                     step=0.05, key="min_accept_ratio_slider")
+        route_complex = st.checkbox("复杂文本块直接交给升级模型", value=True, key="route_complex_checkbox",
+                                    help="超过最大文本块大小（无法再拆分）、以表格为主或数据密集的文本块跳过第一级模型")
+
+    # 已知实体索引：用图谱中已有的实体名称和YAML中的别名/关键词在本地扫描文本块
+    use_gazetteer = st.checkbox("🔎 已知实体索引（本地预扫描文本块）", value=False, key="use_gazetteer_checkbox",
+                                help="把图谱中已有实体的名称、YAML known_entities 中的别名和本体关键词编译为自动机，"
+                                     "命中的实体作为提示附加在提示词末尾，并可跳过不可能抽取出三元组的文本块")
+    skip_policy = SKIP_NEVER
+    if use_gazetteer:
+        skip_policy_labels = {
+            SKIP_NEVER: "不跳过（只附加提示）",
+            SKIP_NO_MATCH: "跳过既无已知实体也无关键词的文本块",
+            SKIP_NO_ENTITIES: "跳过没有已知实体的文本块（只补充已有图谱）"
+        }
+        skip_policy = st.selectbox("跳过策略", options=list(skip_policy_labels),
+                                   format_func=lambda x: skip_policy_labels[x], key="skip_policy_select")
+
+    # 实体消解：写入前把 "科技公司A"、"科技公司A有限公司" 等写法归并为同一节点
+    resolve_entities = st.checkbox("🧬 实体消解（写入前归并同一实体的不同写法）", value=False,
+                                   key="resolve_entities_checkbox",
+                                   help="按实体类型规范化名称并用n-gram相似度归并，别名表保存在 .kgbuilder/aliases.db，"
+                                        "后续构建会继续使用")
+
+    # 三元组导出：构建过程中把通过校验的三元组流式写出为 JSONL 或 Parquet 文件，供下游分析或导入其他存储
+    export_triples = st.checkbox("📤 导出三元组（JSONL / Parquet）", value=False, key="export_triples_checkbox",
+                                 help="每个三元组附带来源文本块ID、文档名和模型，按行数轮转文件，内存占用与构建规模无关")
+    export_format = EXPORT_FORMATS[0]
+    export_dir = DEFAULT_EXPORT_DIR
+    if export_triples:
+        export_col1, export_col2 = st.columns([1, 2])
+        with export_col1:
+            export_format = st.selectbox("导出格式", EXPORT_FORMATS, key="export_format_select",
+                                         help="parquet 需要安装 pyarrow")
+        with export_col2:
+            export_dir = st.text_input("导出目录", value=DEFAULT_EXPORT_DIR, key="export_dir_input")
+
     # 数据库配置，使用缓存数据
     st.subheader("Database (Neo4j)")
 
@@ -294,8 +496,76 @@ with main_col:
     if 'current_triples' not in st.session_state:
         st.session_state.current_triples = None
 
-    # 生成图谱按钮，使用参考图片样式
-    build_button_clicked = st.button("▶ Build Graph", type="primary", use_container_width=True)
+    # 快速渲染：去掉人为等待，按固定间隔原地刷新进度，只显示最近的三元组
+    render_col1, render_col2 = st.columns([2, 1])
+    with render_col1:
+        fast_render = st.checkbox("⚡ 快速渲染模式（大批量文档推荐）", value=True, key="fast_render_checkbox")
+    with render_col2:
+        render_interval = st.number_input("界面刷新间隔 (秒)", min_value=0.1, max_value=10.0, value=0.5, step=0.1,
+                                          key="render_interval_input", disabled=not fast_render)
+
+    # 后台运行：构建任务提交给后台执行器，页面只轮询任务状态，刷新页面不会中断构建
+    run_in_background = st.checkbox("🕒 后台运行（提交为后台任务，可关闭或刷新页面）", value=False,
+                                    key="run_in_background_checkbox")
+
+    # 生成图谱按钮，使用参考图片样式；试运行只做本地统计，不调用LLM
+    build_col, dry_run_col, autotune_col = st.columns([3, 1, 1])
+    with build_col:
+        build_button_clicked = st.button("▶ Build Graph", type="primary", use_container_width=True)
+    with dry_run_col:
+        dry_run_clicked = st.button("🧮 试运行预估", use_container_width=True,
+                                    help="渲染全部提示词并在本地统计token，预估费用和耗时，不调用LLM")
+    with autotune_col:
+        autotune_clicked = st.button("🎛️ 自动调优", use_container_width=True,
+                                     help="在文档样本上进行简短校准：测量不同文本块大小的延迟和三元组产出、"
+                                          "逐级提高并发时的错误率以及Neo4j写入批量的耗时，并保存为该模型的调优配置")
+
+    if autotune_clicked:
+        if not ontology_content or not chunk_records or not api_key:
+            st.warning("⚠️ 请先配置Schema、上传文档并填写API Key")
+        else:
+            tuned_profile = None
+            with st.spinner("正在文档样本上校准文本块大小、并发数和写入批量..."):
+                tune_handler = None
+                try:
+                    tune_handler = Neo4jHandler(neo4j_uri, neo4j_user, neo4j_pwd)
+                    if not tune_handler.test_connection()[0]:
+                        tune_handler.close()
+                        tune_handler = None
+                except Exception:
+                    tune_handler = None
+                try:
+                    tuned_profile, _ = autotune(chunk_records, ontology_content, api_key, selected_model_name,
+                                                tune_handler, recalibrate=True,
+                                                default_chunk_size=int(max_chunk_size),
+                                                default_write_batch_size=int(write_batch_size))
+                except Exception as e:
+                    st.error(f"❌ 自动调优失败，保留当前参数: {e}")
+                finally:
+                    if tune_handler is not None:
+                        tune_handler.close()
+            if tuned_profile is not None:
+                st.session_state.autotune_profile = tuned_profile
+                apply_autotune_profile(tuned_profile)
+
+    if st.session_state.get("autotune_profile"):
+        with st.expander("🎛️ 自动调优结果", expanded=False):
+            display_autotune_profile(st.session_state.autotune_profile)
+
+    if dry_run_clicked:
+        if not ontology_content or not chunk_records:
+            st.warning("⚠️ 请先配置Schema并上传文档")
+        else:
+            with st.spinner("正在渲染提示词并统计token..."):
+                plan_gazetteer = None
+                if use_gazetteer:
+                    plan_gazetteer = load_gazetteer(ontology_content, skip_policy,
+                                                    {"uri": neo4j_uri, "user": neo4j_user, "password": neo4j_pwd})
+                build_plan = plan_build(chunk_records, ontology_content, selected_model_name,
+                                        max_workers=int(max_concurrency), prune_schema=prune_schema,
+                                        gazetteer=plan_gazetteer)
+            st.markdown("#### 🧮 试运行预估")
+            display_build_plan(build_plan)
 
     # 创建动态更新容器
     progress_container = st.empty()
@@ -333,17 +603,67 @@ with main_col:
             st.error(f"⚠️ 请完成以下配置: {', '.join(missing_items)}")
             st.stop()
 
+        # 每次构建使用新的路由器，路由统计只包含本次构建
+        router = None
+        if use_cascade:
+            router = CascadeRouter([
+                {"model": selected_model_name},
+                {"model": escalation_choice["model_name"], "api_key": escalation_api_key or None}
+            ], min_accept_ratio=min_accept_ratio, route_complex=route_complex, max_chunk_size=int(max_chunk_size))
+
+        gazetteer = None
+        if use_gazetteer:
+            gazetteer = load_gazetteer(ontology_content, skip_policy,
+                                       {"uri": neo4j_uri, "user": neo4j_user, "password": neo4j_pwd})
+
+        resolver = build_resolver(ontology_content) if resolve_entities else None
+
+        exporter = None
+        if export_triples:
+            try:
+                exporter = open_exporter(export_format, export_dir)
+            except (ImportError, OSError) as e:
+                loading_container.empty()
+                st.error(f"❌ 无法导出三元组: {e}")
+                st.stop()
+
+        if run_in_background:
+            # 提交后台任务后立即返回，由下方的任务状态面板轮询进度
+            job_id = get_job_runner().submit_build(
+                chunk_records, ontology_content, api_key, selected_model_name,
+                {"uri": neo4j_uri, "user": neo4j_user, "password": neo4j_pwd},
+                max_workers=int(max_concurrency),
+                description=f"{len(st.session_state.get('uploaded_files', []))} 个文档，{len(chunks)} 个文本块",
+                prune_schema=prune_schema, router=router, gazetteer=gazetteer, resolver=resolver,
+                write_batch_size=int(write_batch_size), exporter=exporter)
+            st.session_state.active_job_id = job_id
+            st.query_params["job"] = job_id
+            loading_container.empty()
+            st.rerun()
+
         # 初始化数据库连接
         db_handler = Neo4jHandler(neo4j_uri, neo4j_user, neo4j_pwd)
         conn_success, _ = db_handler.test_connection()
 
         if not conn_success:
+            db_handler.close()
+            if resolver is not None:
+                resolver.close()
+            if exporter is not None:
+                exporter.close()
             loading_container.empty()
             st.error("数据库连接失败，无法继续。")
             st.stop()
 
         total_chunks = len(chunks)
-        total_triples = 0
+        # 点击“停止构建”由按钮回调请求协作式取消；按钮同时触发重新运行，Streamlit 在下一次界面调用时中断本次脚本，
+        # on_progress 捕获中断后同样请求取消，build_graph 写入已抽取的三元组后正常返回，再继续中断
+        control = BuildControl()
+        st.session_state.build_control = control
+        interruption = []
+        stop_container = st.empty()
+        stop_container.button("⏹ 停止构建", key="stop_build_button", on_click=cancel_running_build,
+                              help="不再派发新的文本块，在途的LLM请求最多等待几秒，已抽取的三元组写入数据库")
 
         try:
             # 重置进度状态
@@ -352,38 +672,61 @@ with main_col:
             st.session_state.current_chunk_content = None
             st.session_state.current_triples = None
 
-            # 等待加载条完成动画
-            import time
+            if fast_render:
+                # 快速渲染：不等待动画，进度元素只创建一次并原地更新
+                loading_container.empty()
+                progress_view = BuildProgressView(progress_container, total_chunks,
+                                                  update_interval=render_interval)
+            else:
+                # 等待加载条完成动画
+                time.sleep(1)  # 等待1秒让加载条完成加载动画
 
-            time.sleep(1)  # 等待1秒让加载条完成加载动画
+                # 初始化完成，显示初始处理界面
+                loading_container.empty()
 
-            # 初始化完成，显示初始处理界面
-            loading_container.empty()
+                # 实时更新进度显示
+                with progress_container.container():
+                    st.markdown("---")
+                    # 显示处理进度
+                    progress_col1, progress_col2 = st.columns([1, 3])
+                    with progress_col1:
+                        st.metric("处理进度", f"{st.session_state.processing_progress}%")
+                    with progress_col2:
+                        st.progress(st.session_state.processing_progress / 100)
+                    st.info("📄 准备开始处理文本块...")
+                    st.write("正在初始化处理环境，请稍候...")
 
-            # 实时更新进度显示
-            with progress_container.container():
-                st.markdown("---")
-                # 显示处理进度
-                progress_col1, progress_col2 = st.columns([1, 3])
-                with progress_col1:
-                    st.metric("处理进度", f"{st.session_state.processing_progress}%")
-                with progress_col2:
-                    st.progress(st.session_state.processing_progress / 100)
-                st.info("📄 准备开始处理文本块...")
-                st.write("正在初始化处理环境，请稍候...")
-
-            # 使用智能切分的文本块进行处理
-            for i, chunk in enumerate(chunks):
+            def render_progress(record, triples, processed_chunks, total_triples):
                 # 更新进度信息
-                progress_percent = int((i + 1) / total_chunks * 100)
+                progress_percent = int(processed_chunks / total_chunks * 100)
                 st.session_state.processing_progress = progress_percent
-                st.session_state.current_chunk = f"第 {i + 1}/{total_chunks} 块"
+                st.session_state.current_chunk = f"第 {processed_chunks}/{total_chunks} 块（{record['doc']} #{record['index'] + 1}）"
 
                 # 保存当前文本块内容用于显示
-                st.session_state.current_chunk_content = chunk
+                st.session_state.current_chunk_content = record["text"]
                 st.session_state.current_triples = None
 
-                # 实时更新进度显示（开始处理新块）
+                if fast_render:
+                    # 按固定间隔节流刷新，不额外等待
+                    progress_view.update(processed_chunks, total_triples, record, triples)
+                    return
+
+                if not triples:
+                    # 未抽取到三元组时仅刷新进度
+                    with progress_container.container():
+                        st.markdown("---")
+                        progress_col1, progress_col2 = st.columns([1, 3])
+                        with progress_col1:
+                            st.metric("处理进度", f"{st.session_state.processing_progress}%")
+                        with progress_col2:
+                            st.progress(st.session_state.processing_progress / 100)
+                        st.info(f"📄 已处理文本块: {st.session_state.current_chunk}，未抽取到三元组")
+                    return
+
+                # 保存当前三元组用于显示
+                st.session_state.current_triples = triples
+
+                # 实时更新进度显示（三元组已交给写入器，按写入批量攒批；其余文本块的LLM请求仍在后台并发进行）
                 with progress_container.container():
                     st.markdown("---")
                     # 显示处理进度
@@ -394,7 +737,7 @@ with main_col:
                         st.progress(st.session_state.processing_progress / 100)
 
                     # 显示当前处理的文本块信息
-                    st.info(f"📄 正在处理文本块: {st.session_state.current_chunk}")
+                    st.info(f"📄 已处理文本块: {st.session_state.current_chunk}")
 
                     # 显示当前文本块内容（限制长度）
                     st.subheader("当前处理的文本内容")
@@ -402,91 +745,54 @@ with main_col:
                     if len(chunk_preview) > 300:
                         chunk_preview = chunk_preview[:300] + "..."
                     st.markdown('<div class="chunk-container">', unsafe_allow_html=True)
-                    st.text_area("文本内容预览", chunk_preview, height=100, key=f"chunk_preview_{i}")
+                    st.text_area("文本内容预览", chunk_preview, height=100, key=f"chunk_preview_{processed_chunks}")
                     st.markdown('</div>', unsafe_allow_html=True)
 
-                    # 显示正在进行LLM抽取
-                    st.info("🧠 正在进行知识抽取...")
-                    st.write("请稍候，正在使用LLM分析文本内容并抽取三元组...")
-
-                # 1. LLM 抽取（耗时操作）
-                triples = process_text_with_llm(chunk, ontology_content, api_key, selected_model_name)
-
-                if triples:
-                    total_triples += len(triples)
-                    # 保存当前三元组用于显示
-                    st.session_state.current_triples = triples
-
-                    # 实时更新进度显示（LLM抽取完成）
-                    with progress_container.container():
-                        st.markdown("---")
-                        # 显示处理进度
-                        progress_col1, progress_col2 = st.columns([1, 3])
-                        with progress_col1:
-                            st.metric("处理进度", f"{st.session_state.processing_progress}%")
-                        with progress_col2:
-                            st.progress(st.session_state.processing_progress / 100)
-
-                        # 显示当前处理的文本块信息
-                        st.info(f"📄 正在处理文本块: {st.session_state.current_chunk}")
-
-                        # 显示当前文本块内容（限制长度）
-                        st.subheader("当前处理的文本内容")
-                        chunk_preview = st.session_state.current_chunk_content
-                        if len(chunk_preview) > 300:
-                            chunk_preview = chunk_preview[:300] + "..."
-                        st.markdown('<div class="chunk-container">', unsafe_allow_html=True)
-                        st.text_area("文本内容预览", chunk_preview, height=100, key=f"chunk_preview_{i}_2")
-                        st.markdown('</div>', unsafe_allow_html=True)
-
-                        # 显示抽取的三元组信息
-                        st.subheader("抽取的三元组")
-                        for j, triple in enumerate(triples):
-                            # 美化三元组显示
-                            triple_html = f"""
-                            <div class="triple-card" style="animation-delay: {j * 0.1}s;">
-                                <div class="triple-content">
-                                    <div class="entity">
-                                        <div class="entity-name">{triple.head}</div>
-                                        <div class="entity-type">{triple.head_type}</div>
-                                        <div class="entity-properties">
-                                            {', '.join([f'{k}: {v}' for k, v in triple.head_properties.items()])}
-                                        </div>
-                                    </div>
-                                    <div class="relation">{triple.relation}</div>
-                                    <div class="entity">
-                                        <div class="entity-name">{triple.tail}</div>
-                                        <div class="entity-type">{triple.tail_type}</div>
-                                        <div class="entity-properties">
-                                            {', '.join([f'{k}: {v}' for k, v in triple.tail_properties.items()])}
-                                        </div>
-                                    </div>
-                                </div>
-                            </div>
-                            """
-                            st.markdown(triple_html, unsafe_allow_html=True)
-
-                        # 显示正在执行Cypher
-                        st.info("🗄️ 正在保存到数据库...")
-                        st.write("正在生成并执行Cypher查询，将知识图谱保存到Neo4j数据库...")
-
-                    # 2. 生成并执行 Cypher（耗时操作）
-                    cypher_queries = generate_cypher(triples)
-                    db_handler.execute_cypher(cypher_queries)
-
-                    # 添加短暂延迟以便用户能看到处理内容
-                    import time
-
-                    time.sleep(0.5)
+                    # 显示抽取的三元组信息
+                    st.subheader("抽取的三元组")
+                    for j, triple in enumerate(triples):
+                        # 美化三元组显示
+                        st.markdown(render_triple_card_html(triple, j), unsafe_allow_html=True)
+
+                    # 显示正在执行Cypher
+                    st.info("🗄️ 正在保存到数据库...")
+                    st.write("正在生成并执行Cypher查询，将知识图谱保存到Neo4j数据库...")
+
+                # 添加短暂延迟以便用户能看到处理内容
+                time.sleep(0.5)
+
+            def on_progress(record, triples, processed_chunks, total_triples):
+                if interruption:
+                    # 脚本已被中断，不再更新界面，等待 build_graph 写入剩余结果后返回
+                    return
+                try:
+                    render_progress(record, triples, processed_chunks, total_triples)
+                except BaseException as e:
+                    control.cancel()
+                    interruption.append(e)
+
+            # 在整个语料上调度抽取，按完成顺序写入（与命令行和后台任务使用同一构建流程）
+            usage_tracker = UsageTracker()
+            build_stats = build_graph(chunk_records, ontology_content, api_key, selected_model_name, db_handler,
+                                      max_workers=int(max_concurrency), on_progress=on_progress, router=router,
+                                      gazetteer=gazetteer, resolver=resolver, write_batch_size=int(write_batch_size),
+                                      exporter=exporter, control=control, prune_schema=prune_schema,
+                                      usage_tracker=usage_tracker)
+            build_stats["usage"] = usage_tracker.summary()
+            # 记录本次构建的实际用量和延迟，供试运行预估使用
+            ThroughputStore().record(usage_tracker)
 
             # 保存构建结果到session_state
             st.session_state.build_success = True
             st.session_state.build_error = None
-            st.session_state.build_stats = {
-                "total_chunks": total_chunks,
-                "total_triples": total_triples,
-                "efficiency": round(total_triples / total_chunks, 2) if total_chunks > 0 else 0
-            }
+            st.session_state.build_stats = build_stats
+            if interruption:
+                # 已抽取的部分写入完成，继续 Streamlit 的中断（重新运行后按已取消显示结果）
+                raise interruption[0]
+
+            if fast_render:
+                progress_view.finish()
+            stop_container.empty()
             # 清空当前处理信息
             st.session_state.current_chunk = None
             st.session_state.processing_progress = 0
@@ -498,8 +804,11 @@ with main_col:
 
             # 显示最终结果
             with result_container.container():
-                st.success(
-                    f"✅ 任务完成！共处理 {st.session_state.build_stats['total_chunks']} 个语义块，提取并入库了 {st.session_state.build_stats['total_triples']} 个三元组。")
+                if st.session_state.build_stats.get('cancelled'):
+                    st.warning(cancelled_build_message(st.session_state.build_stats))
+                else:
+                    st.success(
+                        f"✅ 任务完成！共处理 {st.session_state.build_stats['total_chunks']} 个语义块，提取并入库了 {st.session_state.build_stats['total_triples']} 个三元组。")
 
                 # 显示统计信息
                 col1, col2, col3 = st.columns(3)
@@ -510,12 +819,19 @@ with main_col:
                 with col3:
                     st.metric("平均效率", f"{st.session_state.build_stats['efficiency']} 三元组/块")
 
+                # 显示token用量与提示词前缀缓存命中率
+                display_usage_stats(st.session_state.build_stats.get('usage'))
+                display_routing_stats(st.session_state.build_stats.get('routing'))
+                display_gazetteer_stats(st.session_state.build_stats.get('gazetteer'))
+                display_resolution_stats(st.session_state.build_stats.get('entity_resolution'))
+                display_normalization_stats(st.session_state.build_stats.get('normalization'))
+                display_export_stats(st.session_state.build_stats.get('export'))
+                display_write_failures(st.session_state.build_stats.get('write_failures'))
+
         except Exception as e:
             st.session_state.build_success = False
             st.session_state.build_error = str(e)
             st.session_state.build_stats = None
-            import traceback
-
             st.session_state.build_traceback = traceback.format_exc()
             # 清空当前处理信息
             st.session_state.current_chunk = None
@@ -532,7 +848,14 @@ with main_col:
                 if st.session_state.build_traceback:
                     st.code(st.session_state.build_traceback)
         finally:
+            if st.session_state.get("build_control") is control:
+                st.session_state.build_control = None
             db_handler.close()
+            # 构建中途失败或被中断时也要保存别名表、结束导出文件
+            if resolver is not None:
+                resolver.close()
+            if exporter is not None:
+                exporter.close()
             # 重置进度状态
             st.session_state.current_chunk = None
             st.session_state.processing_progress = 0
@@ -543,8 +866,11 @@ with main_col:
         with result_container.container():
             if st.session_state.build_success is not None:
                 if st.session_state.build_success:
-                    st.success(
-                        f"✅ 任务完成！共处理 {st.session_state.build_stats['total_chunks']} 个语义块，提取并入库了 {st.session_state.build_stats['total_triples']} 个三元组。")
+                    if st.session_state.build_stats.get('cancelled'):
+                        st.warning(cancelled_build_message(st.session_state.build_stats))
+                    else:
+                        st.success(
+                            f"✅ 任务完成！共处理 {st.session_state.build_stats['total_chunks']} 个语义块，提取并入库了 {st.session_state.build_stats['total_triples']} 个三元组。")
 
                     # 显示统计信息
                     col1, col2, col3 = st.columns(3)
@@ -554,7 +880,53 @@ with main_col:
                         st.metric("总三元组数", st.session_state.build_stats['total_triples'])
                     with col3:
                         st.metric("平均效率", f"{st.session_state.build_stats['efficiency']} 三元组/块")
+
+                    # 显示token用量与提示词前缀缓存命中率
+                    display_usage_stats(st.session_state.build_stats.get('usage'))
+                    display_routing_stats(st.session_state.build_stats.get('routing'))
+                    display_gazetteer_stats(st.session_state.build_stats.get('gazetteer'))
+                    display_resolution_stats(st.session_state.build_stats.get('entity_resolution'))
+                    display_normalization_stats(st.session_state.build_stats.get('normalization'))
+                    display_export_stats(st.session_state.build_stats.get('export'))
+                    display_write_failures(st.session_state.build_stats.get('write_failures'))
                 else:
                     st.error(f"❌ 处理过程中发生错误: {st.session_state.build_error}")
                     if st.session_state.build_traceback:
-                        st.code(st.session_state.build_traceback)
\ No newline at end of file
+                        st.code(st.session_state.build_traceback)
+
+    # 最近的后台任务列表放在任务状态之前，任务运行期间同样可见
+    with st.expander("📋 最近的后台任务", expanded=False):
+        display_job_list(get_job_runner().store.list_jobs())
+
+    # 后台任务状态：读取任务表，页面刷新后通过URL中的任务ID恢复
+    active_job_id = st.session_state.get('active_job_id') or st.query_params.get("job")
+    if active_job_id:
+        job = get_job_runner().store.get_job(active_job_id)
+        if job:
+            display_job_status(job)
+            if job["status"] in ACTIVE_STATUSES:
+                # 暂停/恢复保留任务在语料中的位置；取消后已抽取的三元组照常写入，任务状态变为已取消
+                job_runner = get_job_runner()
+                pause_col, cancel_col, refresh_col, auto_col = st.columns([1, 1, 1, 2])
+                with pause_col:
+                    if job["status"] == JOB_PAUSED:
+                        if st.button("▶ 继续", key="resume_job_button", use_container_width=True):
+                            job_runner.resume_job(active_job_id)
+                            st.rerun()
+                    elif st.button("⏸ 暂停", key="pause_job_button", use_container_width=True):
+                        job_runner.pause_job(active_job_id)
+                        st.rerun()
+                with cancel_col:
+                    if st.button("⏹ 取消", key="cancel_job_button", use_container_width=True):
+                        job_runner.cancel_job(active_job_id)
+                        st.rerun()
+                with refresh_col:
+                    # 点击按钮即重新运行脚本，读取最新进度
+                    st.button("🔄 刷新", key="refresh_job_button", use_container_width=True)
+                with auto_col:
+                    auto_refresh = st.checkbox(f"每 {JOB_REFRESH_INTERVAL} 秒自动刷新", value=False,
+                                               key="job_auto_refresh_checkbox")
+                if auto_refresh:
+                    # 自动刷新会重新运行整个脚本，放在页面最后并使用较长的间隔
+                    time.sleep(JOB_REFRESH_INTERVAL)
+                    st.rerun()
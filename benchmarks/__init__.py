@@ -0,0 +1 @@
+"""离线压测工具：模拟 LLM 服务、合成文档生成和内存写入端（python -m benchmarks.run_pipeline）"""
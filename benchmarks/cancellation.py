@@ -0,0 +1,124 @@
+import json
+import time
+import argparse
+import threading
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.run_pipeline import DEFAULT_ONTOLOGY
+from benchmarks.sinks import RecordingSink
+from benchmarks.synthetic_docs import synthetic_paragraphs
+from utils.build_control import BuildControl, DEFAULT_CANCEL_TIMEOUT
+from utils.pipeline import build_graph
+
+
+def synthetic_records(count, seed=0):
+    """生成内存中的文本块记录（格式与 iter_corpus_records 相同），不经过文档加载"""
+    for i, text in enumerate(synthetic_paragraphs(count, seed)):
+        yield {"chunk_id": f"0-{i}", "doc": "synthetic.txt", "index": i, "text": text}
+
+
+def measure_cancellation(concurrency, chunks=2000, cancel_after=2.0, pause_for=0.0, latency=0.5, jitter=1.0,
+                         cancel_timeout=DEFAULT_CANCEL_TIMEOUT, seed=0):
+    """
+    在后台线程中运行构建，cancel_after 秒后取消，测量从请求取消到 build_graph 返回（含写入已抽取三元组）的耗时
+
+    Args:
+        concurrency: 并发 LLM 请求数
+        chunks: 语料文本块数（应足够多，保证取消时构建仍在进行）
+        cancel_after: 开始后多少秒取消
+        pause_for: 大于 0 时在取消前先暂停这么多秒，检查暂停期间不再派发新请求
+        latency, jitter: 模拟 LLM 的延迟和抖动（抖动大于 cancel_timeout 时会出现被放弃的在途请求）
+        cancel_timeout: 取消后等待在途请求的秒数
+
+    Returns:
+        报告字典
+    """
+    sink = RecordingSink()
+    control = BuildControl(cancel_timeout)
+    result = {}
+
+    with FakeLLMServer(DEFAULT_ONTOLOGY, latency=latency, jitter=jitter, seed=seed) as server:
+        def run():
+            try:
+                result["stats"] = build_graph(synthetic_records(chunks, seed), DEFAULT_ONTOLOGY, "fake-api-key",
+                                              "fake-model", sink, max_workers=concurrency, control=control,
+                                              api_base=server.url)
+            except Exception as e:
+                result["error"] = str(e)
+
+        thread = threading.Thread(target=run, name="kg-cancel-bench")
+        start = time.perf_counter()
+        thread.start()
+
+        paused_requests = None
+        if pause_for > 0:
+            time.sleep(cancel_after / 2)
+            control.pause()
+            # 等在途请求完成后统计服务端请求数，暂停期间该数字不应再增加
+            time.sleep(latency + jitter)
+            requests_at_pause = server.stats["requests"]
+            time.sleep(pause_for)
+            paused_requests = server.stats["requests"] - requests_at_pause
+            control.resume()
+            time.sleep(cancel_after / 2)
+        else:
+            time.sleep(cancel_after)
+
+        cancel_at = time.perf_counter()
+        control.cancel()
+        thread.join()
+        stopped_at = time.perf_counter()
+        requests = server.stats["requests"]
+
+    stats = result.get("stats") or {}
+    control_stats = control.summary()
+    return {
+        "concurrency": concurrency,
+        "chunks_processed": stats.get("total_chunks"),
+        "triples_written": stats.get("total_triples"),
+        "write_batches": sink.batches,
+        "llm_requests": requests,
+        "requests_during_pause": paused_requests,
+        "paused_seconds": control_stats["paused_seconds"],
+        "cancel_latency_seconds": round(stopped_at - cancel_at, 3),
+        "dispatch_stop_seconds": control_stats["cancel_latency_seconds"],
+        "abandoned_requests": control_stats["abandoned_requests"],
+        "elapsed_seconds": round(stopped_at - start, 3),
+        "error": result.get("error")
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="构建取消延迟压测（模拟 LLM 服务 + 内存写入端）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128], help="逐个测量的并发数")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--cancel-after", type=float, default=2.0, help="开始后多少秒取消")
+    parser.add_argument("--pause-for", type=float, default=0.0, help="取消前先暂停的秒数（0 表示不测暂停）")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟 LLM 延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=1.0, help="模拟 LLM 延迟抖动上限（秒）")
+    parser.add_argument("--cancel-timeout", type=float, default=DEFAULT_CANCEL_TIMEOUT,
+                        help="取消后等待在途请求的秒数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="保存 JSON 报告")
+    args = parser.parse_args(argv)
+
+    reports = []
+    for concurrency in args.concurrency:
+        report = measure_cancellation(concurrency, args.chunks, args.cancel_after, args.pause_for, args.latency,
+                                      args.jitter, args.cancel_timeout, args.seed)
+        reports.append(report)
+        line = (f"并发 {concurrency}: 取消延迟 {report['cancel_latency_seconds']} s"
+                f"（停止调度 {report['dispatch_stop_seconds']} s），放弃在途请求 {report['abandoned_requests']}，"
+                f"已处理 {report['chunks_processed']} 块 / {report['triples_written']} 个三元组已写入")
+        if report["requests_during_pause"] is not None:
+            line += f"，暂停期间新请求 {report['requests_during_pause']}"
+        if report["error"]:
+            line += f"，错误: {report['error']}"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import os
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from utils.entity_resolution import EntityResolver, AliasStore
+
+
+_SYLLABLES = "华中国科技信息网络数据智能电子电气能源材料医药生物环境交通建设金融证券保险投资发展创新"
+_SUFFIXES = ["", "", "有限公司", "股份有限公司", "集团", "公司"]
+_TYPES = ["公司", "机构", "产品"]
+
+
+def synthetic_entity_names(count, distinct=None, variant_rate=0.5, seed=0):
+    """
+    生成带变体的实体名称：每个基础名称随机加上组织形式后缀、空格、全角字母、大小写变化或重复字（近似匹配）
+
+    Args:
+        count: 生成的名称数量
+        distinct: 基础名称数量（默认 count 的一半）
+        variant_rate: 使用变体写法的比例
+
+    Yields:
+        (名称, 实体类型, 基础名称编号)
+    """
+    rng = random.Random(seed)
+    distinct = distinct or max(1, count // 2)
+    for _ in range(count):
+        base_id = rng.randrange(distinct)
+        base_rng = random.Random(base_id)
+        base = "".join(base_rng.choice(_SYLLABLES) for _ in range(base_rng.randint(3, 6)))
+        letter = chr(ord("A") + base_id % 26)
+        number = base_id // 26
+        entity_type = _TYPES[base_id % len(_TYPES)]
+        name = f"{base}{letter}{number}"
+        if rng.random() < variant_rate:
+            variant = rng.randrange(5)
+            if variant == 0:
+                name = name + rng.choice(_SUFFIXES[2:])
+            elif variant == 1:
+                name = f"{base} {letter.lower()}{number}"
+            elif variant == 2:
+                # 全角字母
+                name = f"{base}{chr(ord(letter) + 0xFEE0)}{number}"
+            elif variant == 3:
+                name = f"{base}{letter}-{number}有限公司"
+            else:
+                # 重复一个字（录入错误），只能由 n-gram 近似匹配归并
+                position = rng.randrange(len(base))
+                name = f"{base[:position + 1]}{base[position:]}{letter}{number}"
+        yield name, entity_type, base_id
+
+
+def run_resolution_benchmark(count=1000000, distinct=None, seed=0, alias_db=None, measure_memory=True):
+    """
+    测量实体消解的吞吐量、内存占用（内存索引部分）和归并准确度
+
+    Args:
+        count: 处理的名称数量
+        distinct: 基础实体数量（默认 count 的一半）
+        alias_db: 可选别名表路径；指定时同时测量持久化别名表的开销
+        measure_memory: 是否用 tracemalloc 额外运行一遍测量内存（百万级名称需要数分钟）
+
+    Returns:
+        报告字典
+    """
+    names = list(synthetic_entity_names(count, distinct, seed=seed))
+    store = AliasStore(alias_db) if alias_db else None
+    resolver = EntityResolver(alias_store=store)
+    canonical_by_base = {}
+    wrong_merges = 0
+    split_names = 0
+
+    start = time.perf_counter()
+    for name, entity_type, base_id in names:
+        canonical = resolver.resolve(name, entity_type)
+        expected = canonical_by_base.setdefault(base_id, canonical)
+        if canonical != expected:
+            # 与同一基础名称的首个规范名称不同：要么拆分（漏归并），要么错误归并到其他实体
+            split_names += 1
+    resolver.flush()
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc 会显著拖慢执行，内存在不带别名表的第二遍中单独测量
+    current = peak = None
+    if measure_memory:
+        tracemalloc.start()
+        memory_resolver = EntityResolver()
+        for name, entity_type, _ in names:
+            memory_resolver.resolve(name, entity_type)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del memory_resolver
+
+    # 不同基础名称被归并到同一个规范名称
+    owners = {}
+    for base_id, canonical in canonical_by_base.items():
+        if canonical in owners and owners[canonical] != base_id:
+            wrong_merges += 1
+        owners.setdefault(canonical, base_id)
+
+    summary = resolver.summary()
+    report = {
+        "names": count,
+        "distinct_entities": len(canonical_by_base),
+        "canonical_names": summary["canonical"],
+        "names_per_second": round(count / elapsed) if elapsed else None,
+        "seconds": round(elapsed, 2),
+        "memory_mb": round(current / 1024 / 1024, 1) if current is not None else None,
+        "peak_memory_mb": round(peak / 1024 / 1024, 1) if peak is not None else None,
+        "bytes_per_entity": round(current / max(1, summary["canonical"]), 1) if current is not None else None,
+        "comparisons_per_name": round(summary["comparisons"] / count, 2),
+        "split_names": split_names,
+        "wrong_merges": wrong_merges,
+        "resolution": summary
+    }
+    if store is not None:
+        report["alias_rows"] = store.count()
+        store.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="实体消解吞吐量与内存压测")
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--distinct", type=int, default=None, help="基础实体数量（默认为名称数量的一半）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--alias-db", default=None, help="同时测量持久化别名表；'tmp' 表示使用临时文件")
+    parser.add_argument("--skip-memory", action="store_true", help="不测量内存（省去 tracemalloc 的第二遍运行）")
+    args = parser.parse_args(argv)
+
+    alias_db = args.alias_db
+    if alias_db == "tmp":
+        alias_db = os.path.join(tempfile.mkdtemp(prefix="kg_alias_"), "aliases.db")
+    report = run_resolution_benchmark(args.count, args.distinct, args.seed, alias_db,
+                                      measure_memory=not args.skip_memory)
+    print(f"名称: {report['names']}，基础实体: {report['distinct_entities']}，规范名称: {report['canonical_names']}")
+    print(f"吞吐: {report['names_per_second']} 名称/秒（{report['seconds']} 秒）")
+    if report["memory_mb"] is not None:
+        print(f"内存: {report['memory_mb']} MB（峰值 {report['peak_memory_mb']} MB，"
+              f"{report['bytes_per_entity']} B/实体）")
+    print(f"每个名称的候选比较次数: {report['comparisons_per_name']}")
+    print(f"漏归并/错归并: {report['split_names']} / {report['wrong_merges']}")
+    if "alias_rows" in report:
+        print(f"别名表行数: {report['alias_rows']}")
+
+
+if __name__ == "__main__":
+    main()
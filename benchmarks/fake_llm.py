@@ -0,0 +1,223 @@
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from utils.dedup import estimate_tokens
+from utils.ontology import compile_ontology
+
+
+# 提示词中待分析文本的起始标记（与 utils/llm_extractor.py 一致）
+TEXT_MARKER = "【待分析文本】:\n"
+
+
+class FakeLLMServer:
+    """
+    本地 OpenAI 兼容的模拟 LLM 服务（/v1/chat/completions），用于离线压测
+
+    响应由提示词确定性地生成：同一提示词的第 N 次请求总是得到相同的结果，
+    可配置延迟、错误率和格式错误的 JSON 比例；也可以回放录制的响应。
+    """
+
+    def __init__(self, ontology=None, host="127.0.0.1", port=0, latency=0.2, jitter=0.0, error_rate=0.0,
+                 malformed_rate=0.0, triples_per_chunk=3, responses_path=None, seed=0):
+        """
+        Args:
+            ontology: YAML 本体定义字符串，用于合成符合本体的三元组
+            host, port: 监听地址，port=0 时自动选择空闲端口
+            latency: 每个请求的基础延迟（秒）
+            jitter: 延迟的随机抖动上限（秒）
+            error_rate: 返回 HTTP 500 的概率
+            malformed_rate: 返回格式错误 JSON 的概率（一半可被修复，一半被截断）
+            triples_per_chunk: 每个文本块合成的三元组数量上限
+            responses_path: 可选的录制响应 JSONL 文件（每行 {"content": ...}），指定后按提示词哈希回放
+            seed: 随机种子
+        """
+        self.compiled = compile_ontology(ontology) if ontology else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.triples_per_chunk = triples_per_chunk
+        self.seed = seed
+        self.recorded = []
+        if responses_path:
+            with open(responses_path, 'r', encoding='utf-8') as f:
+                self.recorded = [json.loads(line)["content"] for line in f if line.strip()]
+
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self._seen_prefixes = set()
+        self.stats = {"requests": 0, "errors": 0, "malformed": 0}
+
+        handler = type("FakeLLMHandler", (_FakeLLMHandler,), {"fake": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def respond(self, body):
+        """
+        根据请求体生成响应
+
+        Returns:
+            (HTTP 状态码, 响应字典)
+        """
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        prefix, _, text = prompt.partition(TEXT_MARKER)
+        key = zlib.crc32(prompt.encode('utf-8'))
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+            cached = prefix in self._seen_prefixes
+            self._seen_prefixes.add(prefix)
+            self.stats["requests"] += 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+
+        time.sleep(self.latency + rng.random() * self.jitter)
+
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            return 500, {"error": {"message": "simulated server error", "type": "server_error"}}
+
+        if self.recorded:
+            content = self.recorded[key % len(self.recorded)]
+        else:
+            content = json.dumps({"triples": self._synthesize_triples(text or prompt, rng)}, ensure_ascii=False)
+            if rng.random() < self.malformed_rate:
+                with self._lock:
+                    self.stats["malformed"] += 1
+                content = _malform(content, rng)
+
+        prompt_tokens = estimate_tokens(prompt)
+        return 200, {
+            "id": f"chatcmpl-fake-{key:x}-{attempt}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": estimate_tokens(content),
+                "total_tokens": prompt_tokens + estimate_tokens(content),
+                # 模拟前缀缓存：静态前缀第二次出现起计为缓存命中
+                "prompt_tokens_details": {"cached_tokens": estimate_tokens(prefix) if cached else 0}
+            }
+        }
+
+    def _synthesize_triples(self, text, rng):
+        """从文本中取词作为实体名，按本体的关系约束合成三元组"""
+        words = [word.strip(".,;:()\"'") for word in text.split()]
+        words = [word for word in words if len(word) > 2] or ["Entity"]
+        if self.compiled is None or not self.compiled.relation_constraints:
+            return []
+
+        constraints = sorted(self.compiled.relation_constraints.items())
+        triples = []
+        for _ in range(rng.randint(0, self.triples_per_chunk)):
+            relation, constraint = rng.choice(constraints)
+            triples.append({
+                "head": rng.choice(words),
+                "head_type": constraint["head"],
+                "head_properties": {},
+                "relation": relation,
+                "tail": rng.choice(words),
+                "tail_type": constraint["tail"],
+                "tail_properties": {}
+            })
+        return triples
+
+
+def _malform(content, rng):
+    """生成格式错误的 JSON：可修复的（注释、尾随逗号、代码块）或截断的"""
+    if rng.random() < 0.5:
+        fixed = content.replace("}]", "},]").replace('"triples"', '// 抽取结果\n"triples"')
+        return f"```json\n{fixed}\n```"
+    return content[:max(1, len(content) // 2)]
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    fake = None
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith("chat/completions"):
+            self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"error": {"message": "invalid request body"}})
+            return
+        status, payload = self.fake.respond(body)
+        self._send(status, payload)
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容的模拟 LLM 服务")
+    parser.add_argument("--schema", default=None, help="YAML 本体定义文件")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--responses", default=None, help="录制的响应 JSONL 文件")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    ontology = None
+    if args.schema:
+        with open(args.schema, 'r', encoding='utf-8') as f:
+            ontology = f.read()
+    server = FakeLLMServer(ontology, args.host, args.port, args.latency, args.jitter, args.error_rate,
+                           args.malformed_rate, responses_path=args.responses, seed=args.seed)
+    print(f"模拟 LLM 服务已启动: {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
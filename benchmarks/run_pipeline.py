@@ -0,0 +1,182 @@
+import sys
+import json
+import time
+import tempfile
+import argparse
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.sinks import RecordingSink
+from benchmarks.synthetic_docs import SIZES, SYNTHETIC_FORMATS, generate_corpus
+from utils.batch_loader import collect_path_sources, iter_corpus_records
+from utils.pipeline import build_graph
+from utils.tracing import tracer
+from utils.usage import UsageTracker
+
+
+# 与合成文档内容对应的默认本体
+DEFAULT_ONTOLOGY = """
+entities:
+  - name: Person
+    properties: [name]
+  - name: Organization
+    properties: [name, industry]
+  - name: Location
+    properties: [name]
+relationships:
+  - head: Person
+    relation: worksAt
+    tail: Organization
+  - head: Person
+    relation: livesIn
+    tail: Location
+  - head: Organization
+    relation: locatedIn
+    tail: Location
+  - head: Person
+    relation: founded
+    tail: Organization
+  - head: Organization
+    relation: acquired
+    tail: Organization
+"""
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _stage_seconds(stages, *names):
+    return round(sum(stages[name]["total_ms"] for name in names if name in stages) / 1000, 3)
+
+
+def run_benchmark(paths, ontology=DEFAULT_ONTOLOGY, concurrency=4, latency=0.2, jitter=0.0, error_rate=0.0,
+                  malformed_rate=0.0, max_chunk_size=2000, min_chunk_size=500, dedup=False, sink=None,
+                  model_name="fake-model", responses_path=None, seed=0):
+    """
+    使用模拟 LLM 服务和写入端运行完整构建流程，返回性能报告
+
+    Args:
+        paths: 文档、压缩包或目录路径列表
+        ontology: YAML 本体定义字符串
+        concurrency: 并发 LLM 请求数
+        latency, jitter, error_rate, malformed_rate, responses_path, seed: 模拟 LLM 服务参数
+        sink: 写入端（默认 RecordingSink，也可传入 Neo4jHandler 测量真实写入）
+        model_name: 请求中使用的模型名称
+
+    Returns:
+        报告字典；各阶段耗时为所有线程的累计时间，可能大于总耗时
+    """
+    sink = sink or RecordingSink()
+    tracer.reset()
+    tracer.enabled = True
+    usage_tracker = UsageTracker()
+    load_errors = []
+
+    with FakeLLMServer(ontology, latency=latency, jitter=jitter, error_rate=error_rate,
+                       malformed_rate=malformed_rate, responses_path=responses_path, seed=seed) as server:
+        sources, errors = collect_path_sources(paths)
+        start = time.perf_counter()
+        records = iter_corpus_records(sources, max_chunk_size, min_chunk_size, errors=load_errors, dedup=dedup)
+        stats = build_graph(records, ontology, "fake-api-key", model_name, sink, max_workers=concurrency,
+                            usage_tracker=usage_tracker, api_base=server.url)
+        elapsed = time.perf_counter() - start
+        server_stats = dict(server.stats)
+    tracer.enabled = False
+
+    stages = {stage["stage"]: stage for stage in tracer.summary()}
+    return {
+        "documents": len(sources),
+        "chunks": stats["total_chunks"],
+        "triples": stats["total_triples"],
+        "elapsed_seconds": round(elapsed, 3),
+        "chunks_per_second": round(stats["total_chunks"] / elapsed, 2) if elapsed > 0 else 0,
+        "triples_per_second": round(stats["total_triples"] / elapsed, 2) if elapsed > 0 else 0,
+        "load_seconds": _stage_seconds(stages, "load_document"),
+        "llm_seconds": _stage_seconds(stages, "llm_invoke"),
+        "parse_seconds": _stage_seconds(stages, "json_repair", "validation"),
+        "write_seconds": _stage_seconds(stages, "generate_cypher", "execute_cypher"),
+        "peak_rss_mb": peak_rss_mb(),
+        "fake_llm": server_stats,
+        "usage": usage_tracker.summary(),
+        "stages": list(stages.values()),
+        "errors": errors + load_errors
+    }
+
+
+def format_report(report):
+    lines = [
+        f"文档: {report['documents']}  文本块: {report['chunks']}  三元组: {report['triples']}",
+        f"总耗时: {report['elapsed_seconds']} s  "
+        f"吞吐: {report['chunks_per_second']} chunks/s, {report['triples_per_second']} triples/s",
+        f"加载: {report['load_seconds']} s  LLM: {report['llm_seconds']} s  "
+        f"解析: {report['parse_seconds']} s  写入: {report['write_seconds']} s  （各线程累计）",
+        f"峰值内存: {report['peak_rss_mb']} MB",
+        f"模拟 LLM: {report['fake_llm']}"
+    ]
+    lines += [f"警告: {err}" for err in report["errors"]]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线构建流程压测（模拟 LLM 服务 + 内存写入端）")
+    parser.add_argument("--input", nargs="+", default=None, help="使用已有文档（默认生成合成文档）")
+    parser.add_argument("--formats", nargs="+", choices=SYNTHETIC_FORMATS, default=SYNTHETIC_FORMATS)
+    parser.add_argument("--size", choices=list(SIZES), default="small", help="合成文档档位")
+    parser.add_argument("--schema", default=None, help="YAML 本体定义文件（默认使用内置本体）")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟 LLM 延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟 LLM 延迟抖动上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟 HTTP 500 的概率")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="模拟格式错误 JSON 的概率")
+    parser.add_argument("--responses", default=None, help="回放录制的响应 JSONL 文件")
+    parser.add_argument("--max-chunk-size", type=int, default=2000)
+    parser.add_argument("--min-chunk-size", type=int, default=500)
+    parser.add_argument("--dedup", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--neo4j-uri", default=None, help="指定时写入真实 Neo4j，测量实际写入耗时")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default="")
+    parser.add_argument("--trace", default=None, help="导出 Chrome trace JSON 文件")
+    parser.add_argument("--output", default=None, help="保存 JSON 报告")
+    args = parser.parse_args(argv)
+
+    ontology = DEFAULT_ONTOLOGY
+    if args.schema:
+        with open(args.schema, 'r', encoding='utf-8') as f:
+            ontology = f.read()
+
+    sink = None
+    if args.neo4j_uri:
+        from utils.graph_db import Neo4jHandler
+        sink = Neo4jHandler(args.neo4j_uri, args.neo4j_user, args.neo4j_password)
+
+    with tempfile.TemporaryDirectory(prefix="kg_bench_") as tmp_dir:
+        paths = args.input
+        if not paths:
+            paths, errors = generate_corpus(tmp_dir, args.formats, [args.size], args.seed)
+            for err in errors:
+                print(f"警告: {err}", file=sys.stderr)
+        try:
+            report = run_benchmark(paths, ontology, args.concurrency, args.latency, args.jitter, args.error_rate,
+                                   args.malformed_rate, args.max_chunk_size, args.min_chunk_size, args.dedup,
+                                   sink, responses_path=args.responses, seed=args.seed)
+        finally:
+            if sink is not None:
+                sink.close()
+
+    print(format_report(report))
+    if args.trace:
+        tracer.export_chrome_trace(args.trace)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import time
+import threading
+from utils.tracing import tracer
+
+
+class RecordingSink:
+    """
+    替代 Neo4jHandler 的内存写入端：接口与 Neo4jHandler 相同，
+    只统计写入批次、语句数和耗时，可选保留全部 Cypher 语句
+    """
+
+    def __init__(self, keep_queries=False):
+        self.keep_queries = keep_queries
+        self.queries = []
+        self.batches = 0
+        self.query_count = 0
+        self.write_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def test_connection(self):
+        return True, "连接成功"
+
+    def execute_cypher(self, queries):
+        if not queries:
+            return 0
+        start = time.perf_counter()
+        with tracer.span("execute_cypher", queries=len(queries)), self._lock:
+            self.batches += 1
+            self.query_count += len(queries)
+            if self.keep_queries:
+                self.queries.extend(queries)
+            self.write_seconds += time.perf_counter() - start
+        return 0
+
+    def close(self):
+        pass
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+
+# 仓库根目录（app.py 和 styles/ 所在目录）
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# app.py 和命令行在启动时导入的项目模块（不含 streamlit 界面本身）
+STARTUP_MODULES = [
+    "utils.doc_loader", "utils.batch_loader", "utils.graph_db", "utils.llm_extractor", "utils.pipeline",
+    "utils.usage", "utils.token_accounting", "utils.model_router", "utils.gazetteer", "utils.entity_resolution",
+    "utils.triple_normalizer", "utils.provider_registry", "utils.job_runner", "utils.logging_utils",
+    "kgbuilder.cli"
+]
+
+# 应当只在对应代码路径运行时才加载的重量级依赖
+HEAVY_MODULES = ["pandas", "pypdf", "docx", "langchain", "langchain_core", "langchain_openai", "neo4j"]
+
+_IMPORT_SCRIPT = """
+import sys, json, time, importlib
+modules = json.loads(sys.argv[1])
+heavy = json.loads(sys.argv[2])
+start = time.perf_counter()
+errors = {}
+for name in modules:
+    try:
+        importlib.import_module(name)
+    except Exception as e:
+        errors[name] = f"{type(e).__name__}: {e}"
+elapsed = time.perf_counter() - start
+loaded = [name for name in heavy if name in sys.modules]
+print(json.dumps({"seconds": elapsed, "heavy_loaded": loaded, "errors": errors}))
+"""
+
+
+def measure_cold_import(modules=None, repeat=5):
+    """
+    在全新的子进程中导入启动模块，测量冷启动导入耗时，并检查哪些重量级依赖被提前加载
+
+    Returns:
+        {"median_ms", "min_ms", "max_ms", "heavy_loaded", "errors"}
+    """
+    modules = modules or STARTUP_MODULES
+    timings = []
+    result = {}
+    for _ in range(max(1, repeat)):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_SCRIPT, json.dumps(modules), json.dumps(HEAVY_MODULES)],
+                                cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"] * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "heavy_loaded": result["heavy_loaded"],
+        "errors": result["errors"]
+    }
+
+
+def measure_app_reruns(reruns=10, timeout=60):
+    """
+    用 streamlit 的 AppTest 在进程内运行 app.py：首次运行（含导入和缓存填充）和后续重新运行的耗时
+
+    Returns:
+        {"first_run_ms", "rerun_median_ms", "rerun_max_ms"}，未安装 streamlit 时返回 None
+    """
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+
+    cwd = os.getcwd()
+    # app.py 按相对路径读取 styles/ 下的静态资源
+    os.chdir(REPO_ROOT)
+    try:
+        app = AppTest.from_file("app.py", default_timeout=timeout)
+        start = time.perf_counter()
+        app.run()
+        first_run = time.perf_counter() - start
+        timings = []
+        for _ in range(max(1, reruns)):
+            start = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - start)
+    finally:
+        os.chdir(cwd)
+    return {
+        "first_run_ms": round(first_run * 1000, 1),
+        "rerun_median_ms": round(statistics.median(timings) * 1000, 1),
+        "rerun_max_ms": round(max(timings) * 1000, 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="界面与命令行启动耗时、重新运行延迟压测")
+    parser.add_argument("--repeat", type=int, default=5, help="冷启动导入的测量次数")
+    parser.add_argument("--reruns", type=int, default=10, help="界面重新运行的测量次数")
+    parser.add_argument("--skip-app", action="store_true", help="不测量 app.py 的运行耗时")
+    parser.add_argument("--output", default=None, help="保存 JSON 报告")
+    args = parser.parse_args(argv)
+
+    report = {"cold_import": measure_cold_import(repeat=args.repeat)}
+    cold = report["cold_import"]
+    print(f"冷启动导入: 中位数 {cold['median_ms']} ms（{cold['min_ms']} ~ {cold['max_ms']} ms）")
+    print(f"启动时加载的重量级依赖: {', '.join(cold['heavy_loaded']) or '无'}")
+    for name, error in cold["errors"].items():
+        print(f"警告: 导入 {name} 失败: {error}", file=sys.stderr)
+
+    if not args.skip_app:
+        report["app"] = measure_app_reruns(args.reruns)
+        if report["app"] is None:
+            print("未安装 streamlit，跳过界面重新运行测量", file=sys.stderr)
+        else:
+            app = report["app"]
+            print(f"界面首次运行: {app['first_run_ms']} ms，重新运行: 中位数 {app['rerun_median_ms']} ms"
+                  f"（最大 {app['rerun_max_ms']} ms）")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import random
+import argparse
+import textwrap
+
+
+# 各档位的段落数量
+SIZES = {
+    "small": 20,
+    "medium": 200,
+    "large": 2000
+}
+
+SYNTHETIC_FORMATS = ['pdf', 'docx', 'xlsx']
+
+_NAMES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne", "Tyrell", "Cyberdyne"]
+_PEOPLE = ["Alice", "Bob", "Carol", "David", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy"]
+_CITIES = ["Beijing", "Shanghai", "Shenzhen", "Hangzhou", "Chengdu", "Wuhan", "Nanjing", "Suzhou"]
+_TEMPLATES = [
+    "{person} works at {org} Group as a senior engineer since {year}.",
+    "{org} Group is headquartered in {city} and employs {number} people.",
+    "{person} lives in {city} and joined {org} Group in {year}.",
+    "In {year}, {org} Group acquired {org2} Inc. for {number} million dollars.",
+    "{person} and {person2} founded {org2} Inc. in {city}.",
+    "The annual report of {org} Group lists revenue growth of {number} percent."
+]
+
+
+def synthetic_paragraphs(count, seed=0, sentences_per_paragraph=6):
+    """生成确定性的英文合成段落（包含人物、组织和城市，便于模拟抽取）"""
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(sentences_per_paragraph):
+            sentences.append(rng.choice(_TEMPLATES).format(
+                person=rng.choice(_PEOPLE), person2=rng.choice(_PEOPLE),
+                org=rng.choice(_NAMES), org2=rng.choice(_NAMES),
+                city=rng.choice(_CITIES), year=rng.randint(1990, 2024), number=rng.randint(10, 9000)))
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, paragraphs, lines_per_page=48, line_width=90):
+    """不依赖第三方库写出最简 PDF（Helvetica 字体，每页若干行文本）"""
+    lines = []
+    for paragraph in paragraphs:
+        lines.extend(textwrap.wrap(paragraph, line_width))
+        lines.append("")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # 对象编号：1 Catalog，2 Pages，3 Font，之后每页两个对象（Page + Contents）
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    }
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_id, content_id = 4 + i * 2, 5 + i * 2
+        kids.append(f"{page_id} 0 R")
+        stream = "BT /F1 10 Tf 14 TL 50 800 Td\n" + "".join(
+            f"({_pdf_escape(line)}) Tj T*\n" for line in page_lines) + "ET"
+        stream_bytes = stream.encode('latin-1', errors='replace')
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        objects[content_id] = (f"<< /Length {len(stream_bytes)} >>\nstream\n".encode()
+                               + stream_bytes + b"\nendstream")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for obj_id in sorted(objects):
+            offsets[obj_id] = f.tell()
+            f.write(f"{obj_id} 0 obj\n".encode() + objects[obj_id] + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for obj_id in sorted(objects):
+            f.write(f"{offsets[obj_id]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def write_docx(path, paragraphs):
+    from docx import Document
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_xlsx(path, paragraphs):
+    """每个段落拆成一行多列写入 Excel（需要 pandas 和 openpyxl）"""
+    import pandas as pd
+    rows = [paragraph.split(". ", 2) for paragraph in paragraphs]
+    pd.DataFrame(rows).to_excel(path, index=False)
+
+
+_WRITERS = {
+    'pdf': write_pdf,
+    'docx': write_docx,
+    'xlsx': write_xlsx
+}
+
+
+def generate_corpus(output_dir, formats=SYNTHETIC_FORMATS, sizes=("small",), seed=0):
+    """
+    在 output_dir 中生成各格式、各档位的合成文档
+
+    Returns:
+        (生成的文件路径列表, 错误信息列表)，缺少可选依赖的格式会被跳过并记录错误
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    errors = []
+    for size in sizes:
+        paragraphs = synthetic_paragraphs(SIZES[size], seed=seed)
+        for file_type in formats:
+            path = os.path.join(output_dir, f"synthetic_{size}.{file_type}")
+            try:
+                _WRITERS[file_type](path, paragraphs)
+                paths.append(path)
+            except ImportError as e:
+                errors.append(f"{file_type}: 缺少依赖 {e.name}，已跳过")
+    return paths, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成压测用的合成 PDF / Word / Excel 文档")
+    parser.add_argument("--output", required=True, help="输出目录")
+    parser.add_argument("--formats", nargs="+", choices=SYNTHETIC_FORMATS, default=SYNTHETIC_FORMATS)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    paths, errors = generate_corpus(args.output, args.formats, args.sizes, args.seed)
+    for path in paths:
+        print(path)
+    for err in errors:
+        print(f"警告: {err}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import time
+import random
+import argparse
+import tracemalloc
+from utils.triple_store import TripleStore
+
+
+def synthetic_triple_dicts(count, entities=50000, seed=0):
+    """生成与真实抽取结果分布相近的三元组字典：实体名有限重复，类型和关系名高度重复"""
+    rng = random.Random(seed)
+    types = ["Person", "Organization", "Location", "Product", "Event", "Technology"]
+    relations = ["worksAt", "livesIn", "locatedIn", "founded", "acquired", "produces", "participatesIn", "uses"]
+    properties = [{}, {}, {"industry": "software"}, {"role": "engineer"}, {"country": "China"}]
+    for _ in range(count):
+        # 每个三元组都新建字符串，模拟从 JSON 解析得到的、未驻留的对象
+        yield {
+            "head": "entity_%d" % rng.randrange(entities),
+            "head_type": "%s" % rng.choice(types),
+            "head_properties": dict(rng.choice(properties)),
+            "relation": "%s" % rng.choice(relations),
+            "tail": "entity_%d" % rng.randrange(entities),
+            "tail_type": "%s" % rng.choice(types),
+            "tail_properties": dict(rng.choice(properties))
+        }
+
+
+def _measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    container = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return container, current, elapsed
+
+
+def run_memory_benchmark(count=1000000, seed=0):
+    """比较 pydantic 模型列表、字典列表和 TripleStore 保存 count 个三元组的内存占用和构建耗时"""
+    results = {}
+
+    candidates = {
+        "dict": lambda: list(synthetic_triple_dicts(count, seed=seed)),
+        "triple_store": lambda: _fill_store(count, seed)
+    }
+    try:
+        from utils.llm_extractor import KnowledgeGraphTriple
+        candidates["pydantic"] = lambda: [KnowledgeGraphTriple(**data)
+                                          for data in synthetic_triple_dicts(count, seed=seed)]
+    except ImportError as e:
+        results["pydantic"] = {"error": f"无法导入 KnowledgeGraphTriple: {e}"}
+
+    for name, build in candidates.items():
+        container, current, elapsed = _measure(build)
+        results[name] = {
+            "bytes": current,
+            "bytes_per_triple": round(current / count, 1),
+            "build_seconds": round(elapsed, 2)
+        }
+        del container
+    return results
+
+
+def _fill_store(count, seed):
+    store = TripleStore()
+    for data in synthetic_triple_dicts(count, seed=seed):
+        store.add_triple(data)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="三元组内存占用对比")
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for name, result in run_memory_benchmark(args.count, args.seed).items():
+        if "error" in result:
+            print(f"{name:>12}: {result['error']}")
+        else:
+            print(f"{name:>12}: {result['bytes'] / 1024 / 1024:8.1f} MB  "
+                  f"{result['bytes_per_triple']:7.1f} B/triple  构建 {result['build_seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
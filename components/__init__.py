@@ -4,7 +4,21 @@ from .ui_components import (
     display_loading_status,
     display_triple_cards,
     display_neo4j_config,
-    display_build_button
+    display_build_button,
+    display_usage_stats,
+    display_routing_stats,
+    display_gazetteer_stats,
+    display_resolution_stats,
+    display_normalization_stats,
+    display_export_stats,
+    display_control_stats,
+    display_write_failures,
+    display_build_plan,
+    display_autotune_profile,
+    display_job_status,
+    display_job_list,
+    render_triple_card_html,
+    BuildProgressView
 )
 
 __all__ = [
@@ -13,5 +27,19 @@ __all__ = [
     "display_loading_status",
     "display_triple_cards",
     "display_neo4j_config",
-    "display_build_button"
+    "display_build_button",
+    "display_usage_stats",
+    "display_routing_stats",
+    "display_gazetteer_stats",
+    "display_resolution_stats",
+    "display_normalization_stats",
+    "display_export_stats",
+    "display_control_stats",
+    "display_write_failures",
+    "display_build_plan",
+    "display_autotune_profile",
+    "display_job_status",
+    "display_job_list",
+    "render_triple_card_html",
+    "BuildProgressView"
 ]
\ No newline at end of file
@@ -1,3 +1,6 @@
+import html
+import time
+from collections import deque
 import streamlit as st
 
 
@@ -110,4 +113,310 @@ def display_build_button():
             key="build_graph_button",
             type="primary"
         )
-    return build_button
\ No newline at end of file
+    return build_button
+
+
+
+def display_usage_stats(usage):
+    """显示构建的token用量和提示词前缀缓存命中率"""
+    if not usage or not usage.get("requests"):
+        return
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("LLM请求数", usage["requests"])
+    with col2:
+        st.metric("输入tokens", usage["prompt_tokens"])
+    with col3:
+        st.metric("输出tokens", usage["completion_tokens"])
+    with col4:
+        if usage.get("cache_hit_rate") is None:
+            st.metric("前缀缓存命中率", "未报告")
+        else:
+            st.metric("前缀缓存命中率", f"{usage['cache_hit_rate'] * 100:.1f}%",
+                      help=f"缓存命中 {usage['cached_tokens']} tokens")
+    with col5:
+        cost = usage.get("estimated_cost")
+        st.metric("估算费用", "未知" if cost is None else f"${cost:.4f}", help="按参考价格估算，仅供参考")
+
+
+def display_routing_stats(routing):
+    """显示级联路由中各级模型的请求数、接受数和升级原因"""
+    if not routing or not routing.get("chunks"):
+        return
+
+    st.markdown(f"**级联路由**：{routing['chunks']} 个文本块，其中 {routing['complex_chunks']} 个判定为复杂，"
+                f"{routing['escalated_chunks']} 个发生升级（{routing['escalation_rate'] * 100:.1f}%）"
+                + (f"，{routing['fallback_chunks']} 个各级均未通过检查、采用三元组最多的结果"
+                   if routing.get("fallback_chunks") else ""))
+    rows = [{
+        "模型": tier["model"],
+        "请求数": tier["requests"],
+        "接受数": tier["accepted"],
+        "三元组": tier["triples"],
+        "解析失败升级": tier["escalated"]["parse_failure"],
+        "低通过率升级": tier["escalated"]["low_yield"],
+        "调用出错升级": tier["escalated"]["error"],
+        "平均延迟(秒)": tier["avg_latency_seconds"]
+    } for tier in routing["tiers"]]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
+def display_gazetteer_stats(gazetteer):
+    """显示已知实体索引的扫描和跳过统计"""
+    if not gazetteer or not gazetteer.get("chunks"):
+        return
+
+    st.markdown(f"**已知实体索引**：{gazetteer['entities']} 个实体名称/别名，{gazetteer['keywords']} 个触发关键词；"
+                f"{gazetteer['chunks_with_entities']}/{gazetteer['chunks']} 个文本块命中已知实体（共 "
+                f"{gazetteer['mentions']} 处），跳过 {gazetteer['skipped_chunks']} 个文本块"
+                f"（{gazetteer['skip_rate'] * 100:.1f}%，约 {gazetteer['skipped_tokens']} tokens）")
+
+
+def display_resolution_stats(resolution):
+    """显示实体消解的归并统计"""
+    if not resolution or not resolution.get("names"):
+        return
+
+    st.markdown(f"**实体消解**：处理 {resolution['names']} 个实体名称，规范化键相同归并 {resolution['exact_merges']} 个，"
+                f"近似匹配归并 {resolution['fuzzy_merges']} 个，别名表命中 {resolution['store_hits']} 个，"
+                f"新增规范名称 {resolution['canonical']} 个（归并率 {resolution['merge_rate'] * 100:.1f}%）")
+
+
+def display_normalization_stats(normalization):
+    """显示三元组规范化的修复和拒绝统计"""
+    if not normalization or not normalization.get("input"):
+        return
+
+    st.markdown(f"**三元组规范化**：解析出 {normalization['input']} 个三元组，通过校验 {normalization['accepted']} 个"
+                f"（通过率 {normalization['acceptance_rate'] * 100:.1f}%），其中经修复后通过 {normalization['repaired']} 个")
+    st.caption(f"类型映射 {normalization['entity_type_normalized']} 次，关系映射 {normalization['relation_normalized']} 次，"
+               f"方向交换 {normalization['reversed']} 次，属性重命名/删除 {normalization['property_renamed']}/"
+               f"{normalization['property_dropped']} 次，属性类型转换/转换失败删除 {normalization.get('property_coerced', 0)}/"
+               f"{normalization.get('property_uncoercible', 0)} 次；拒绝：类型 {normalization['rejected_entity_type']}、"
+               f"关系 {normalization['rejected_relation']}、约束 {normalization['rejected_constraint']}、"
+               f"空名称 {normalization['rejected_empty_name']}")
+
+
+def display_export_stats(export):
+    """显示三元组导出的文件和行数"""
+    if not export:
+        return
+
+    st.markdown(f"**三元组导出**：{export['rows']} 行，{len(export['files'])} 个 {export['format']} 文件，"
+                f"目录 `{export['directory']}`")
+
+
+def display_write_failures(write_failures):
+    """写入 Neo4j 失败的行数大于 0 时显示警告"""
+    if write_failures:
+        st.warning(f"⚠️ {write_failures} 行三元组写入 Neo4j 失败（已逐行重试，其余行已写入），详见错误日志")
+
+
+def display_control_stats(control):
+    """显示构建的暂停时长和取消延迟"""
+    if not control:
+        return
+
+    parts = []
+    if control.get("paused_seconds"):
+        parts.append(f"累计暂停 {control['paused_seconds']:.1f} 秒")
+    if control.get("cancel_latency_seconds") is not None:
+        parts.append(f"取消后 {control['cancel_latency_seconds']:.2f} 秒内停止")
+        if control.get("abandoned_requests"):
+            parts.append(f"放弃 {control['abandoned_requests']} 个超时的在途请求")
+    if parts:
+        st.caption("构建控制：" + "，".join(parts))
+
+
+def display_build_plan(plan):
+    """显示试运行的 token、费用和耗时预估"""
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("文本块数", plan["chunks"],
+                  help=f"已知实体索引跳过 {plan['skipped_chunks']} 个文本块" if plan.get("skipped_chunks") else None)
+    with col2:
+        st.metric("输入tokens", plan["input_tokens"], help=f"单个提示词最多 {plan['max_prompt_tokens']} tokens")
+    with col3:
+        st.metric("预估输出tokens", plan["output_tokens"])
+    with col4:
+        cost = plan["estimated_cost"]
+        st.metric("预估费用", "未知" if cost is None else f"${cost:.4f}")
+    with col5:
+        minutes, seconds = divmod(int(plan["estimated_seconds"]), 60)
+        st.metric("预估耗时", f"{minutes}分{seconds}秒")
+
+    if not plan["profile_observed"]:
+        st.caption("尚无该模型的历史构建数据，输出tokens和耗时按默认假设估算；完成一次构建后预估会更准确。")
+    if len(plan["documents"]) > 1:
+        st.dataframe(plan["documents"], use_container_width=True, hide_index=True)
+    if plan["sample_prompts"]:
+        with st.expander("查看第一个文本块的完整提示词"):
+            st.code(plan["sample_prompts"][0], language=None)
+
+
+def display_autotune_profile(profile):
+    """显示自动调优选择的参数和各项校准测量"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("文本块大小", f"{profile['chunk_size']} 字符")
+    with col2:
+        st.metric("并发数", profile["concurrency"])
+    with col3:
+        st.metric("写入批量", profile["write_batch_size"])
+
+    measurements = profile.get("measurements") or {}
+    if measurements.get("chunk_sizes"):
+        st.caption("文本块大小：平均延迟、可解析比例与三元组产出")
+        st.dataframe(measurements["chunk_sizes"], use_container_width=True, hide_index=True)
+    if measurements.get("concurrency"):
+        st.caption("并发：错误率与请求吞吐")
+        st.dataframe(measurements["concurrency"], use_container_width=True, hide_index=True)
+    if measurements.get("write_batches"):
+        st.caption("Neo4j写入批量：每个三元组的写入耗时")
+        st.dataframe(measurements["write_batches"], use_container_width=True, hide_index=True)
+    else:
+        st.caption("未连接数据库，写入批量使用当前设置")
+
+
+def display_job_status(job):
+    """显示后台构建任务的状态和进度"""
+    status_labels = {
+        "queued": "⏳ 排队中",
+        "running": "🔄 运行中",
+        "paused": "⏸ 已暂停",
+        "succeeded": "✅ 已完成",
+        "failed": "❌ 失败",
+        "cancelled": "⏹ 已取消"
+    }
+    st.markdown("---")
+    st.markdown(f"**后台任务 `{job['id']}`**：{status_labels.get(job['status'], job['status'])}"
+                f"（{job.get('description') or ''}）")
+
+    total = job.get("total_chunks") or 0
+    processed = job.get("processed_chunks") or 0
+    progress_col1, progress_col2 = st.columns([1, 3])
+    with progress_col1:
+        st.metric("处理进度", f"{processed}/{total}")
+    with progress_col2:
+        st.progress(min(processed / total, 1.0) if total else 0.0)
+    st.metric("已抽取三元组", job.get("total_triples") or 0)
+
+    if job["status"] in ("succeeded", "cancelled") and job.get("stats"):
+        display_control_stats(job["stats"].get("control"))
+        display_write_failures(job["stats"].get("write_failures"))
+        display_usage_stats(job["stats"].get("usage"))
+        display_routing_stats(job["stats"].get("routing"))
+        display_gazetteer_stats(job["stats"].get("gazetteer"))
+        display_resolution_stats(job["stats"].get("entity_resolution"))
+        display_normalization_stats(job["stats"].get("normalization"))
+        display_export_stats(job["stats"].get("export"))
+    elif job["status"] == "failed" and job.get("error"):
+        st.error("❌ 任务失败")
+        st.code(job["error"])
+
+
+def display_job_list(jobs):
+    """以表格显示最近的后台任务"""
+    if not jobs:
+        st.write("暂无后台任务")
+        return
+    rows = [{
+        "任务ID": job["id"],
+        "状态": job["status"],
+        "描述": job.get("description") or "",
+        "模型": job.get("model") or "",
+        "进度": f"{job.get('processed_chunks') or 0}/{job.get('total_chunks') or 0}",
+        "三元组": job.get("total_triples") or 0
+    } for job in jobs]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
+
+def render_triple_card_html(triple, index=0):
+    """生成单个三元组卡片的HTML"""
+    head_props = html.escape(', '.join([f'{k}: {v}' for k, v in triple.head_properties.items()]))
+    tail_props = html.escape(', '.join([f'{k}: {v}' for k, v in triple.tail_properties.items()]))
+    return f"""
+    <div class="triple-card" style="animation-delay: {index * 0.1}s;">
+        <div class="triple-content">
+            <div class="entity">
+                <div class="entity-name">{html.escape(triple.head)}</div>
+                <div class="entity-type">{html.escape(triple.head_type)}</div>
+                <div class="entity-properties">{head_props}</div>
+            </div>
+            <div class="relation">{html.escape(triple.relation)}</div>
+            <div class="entity">
+                <div class="entity-name">{html.escape(triple.tail)}</div>
+                <div class="entity-type">{html.escape(triple.tail_type)}</div>
+                <div class="entity-properties">{tail_props}</div>
+            </div>
+        </div>
+    </div>
+    """
+
+
+class BuildProgressView:
+    """
+    快速渲染模式的构建进度视图：
+    所有元素只创建一次并原地更新，刷新按固定时间间隔节流，只显示最近的若干个三元组
+    """
+
+    def __init__(self, container, total_chunks, update_interval=0.5, recent_limit=12):
+        self.total_chunks = total_chunks
+        self.update_interval = update_interval
+        self.recent_triples = deque(maxlen=recent_limit)
+        self.start_time = time.time()
+        self._last_render = 0.0
+        self._processed = 0
+        self._total_triples = 0
+        self._current = None
+
+        with container.container():
+            st.markdown("---")
+            progress_col1, progress_col2 = st.columns([1, 3])
+            with progress_col1:
+                self.progress_metric = st.empty()
+            with progress_col2:
+                self.progress_bar = st.progress(0.0)
+            stat_col1, stat_col2, stat_col3 = st.columns(3)
+            with stat_col1:
+                self.chunks_metric = st.empty()
+            with stat_col2:
+                self.triples_metric = st.empty()
+            with stat_col3:
+                self.rate_metric = st.empty()
+            self.status_slot = st.empty()
+            st.subheader("最近抽取的三元组")
+            self.triples_slot = st.empty()
+
+    def update(self, processed, total_triples, record, triples, force=False):
+        """记录一个文本块的结果；距上次刷新不足 update_interval 时只更新内部状态"""
+        self._processed = processed
+        self._total_triples = total_triples
+        self._current = record
+        self.recent_triples.extend(triples)
+
+        now = time.time()
+        if force or now - self._last_render >= self.update_interval:
+            self._last_render = now
+            self._render(now)
+
+    def finish(self):
+        """构建结束时强制刷新一次，保证最终数字准确"""
+        self._render(time.time())
+
+    def _render(self, now):
+        percent = int(self._processed / self.total_chunks * 100) if self.total_chunks else 100
+        elapsed = max(now - self.start_time, 1e-6)
+        self.progress_metric.metric("处理进度", f"{percent}%")
+        self.progress_bar.progress(min(percent, 100) / 100)
+        self.chunks_metric.metric("已处理文本块", f"{self._processed}/{self.total_chunks}")
+        self.triples_metric.metric("已抽取三元组", self._total_triples)
+        self.rate_metric.metric("处理速度", f"{self._processed / elapsed:.2f} 块/秒")
+        if self._current:
+            self.status_slot.info(
+                f"📄 最近完成: {self._current['doc']} #{self._current['index'] + 1}")
+        # 所有三元组卡片合并为一个元素，一次刷新只发送一个增量
+        cards = "".join(render_triple_card_html(triple) for triple in reversed(self.recent_triples))
+        self.triples_slot.markdown(cards, unsafe_allow_html=True)
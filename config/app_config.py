@@ -31,4 +31,7 @@ SESSION_STATE_KEYS = {
 
 
 # 日志级别
-LOG_LEVEL = "INFO"
\ No newline at end of file
+LOG_LEVEL = "INFO"
+# 大段载荷（LLM 原始响应、解析出的 JSON）在 DEBUG 级别的采样率和最大记录长度
+LOG_PAYLOAD_SAMPLE_RATE = 1.0
+LOG_PAYLOAD_MAX_CHARS = 2000
@@ -0,0 +1 @@
+"""Knowledge Graph Builder 无界面入口：python -m kgbuilder build --schema x.yaml --input docs/"""
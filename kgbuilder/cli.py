@@ -0,0 +1,717 @@
+import os
+import sys
+import json
+import time
+import signal
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+import yaml
+from contextlib import nullcontext, contextmanager
+from utils.batch_loader import collect_path_sources, iter_corpus_records
+from utils.build_control import BuildControl, DEFAULT_CANCEL_TIMEOUT
+from utils.graph_db import Neo4jHandler
+from utils.llm_extractor import generate_cypher, generate_index_cypher
+from utils.model_router import CascadeRouter
+from utils.gazetteer import build_gazetteer, SKIP_POLICIES, SKIP_NEVER
+from utils.entity_resolution import build_resolver, DEFAULT_ALIAS_DB
+from utils.pipeline import build_graph
+from utils.provider_registry import get_registry
+from utils.triple_store import CompactTriple
+from utils.triple_normalizer import get_normalizer
+from utils.ontology import compile_ontology
+from utils.triple_exporter import open_exporter, EXPORT_FORMATS, EXPORT_FORMAT_JSONL, DEFAULT_MAX_ROWS_PER_FILE
+from utils.token_accounting import ThroughputStore, plan_build
+from utils.tracing import tracer, profile_build
+from utils.logging_utils import configure_logging, chunk_log
+from utils.autotune import autotune
+from utils.config_manager import config_manager
+from utils.usage import UsageTracker
+from utils.work_queue import ChunkQueue, run_worker, default_worker_id
+
+
+# 退出码
+EXIT_OK = 0
+EXIT_BUILD_ERROR = 1
+EXIT_CONFIG_ERROR = 2
+EXIT_DB_ERROR = 3
+# 被信号取消（与 shell 中 Ctrl+C 终止的退出码一致），已抽取的三元组已写入
+EXIT_CANCELLED = 130
+
+
+class ProgressReporter:
+    """命令行进度输出：默认输出可读文本到 stderr，也可输出 JSON Lines 事件日志"""
+
+    def __init__(self, json_log=None, quiet=False):
+        self.quiet = quiet
+        self._json_file = None
+        if json_log == '-':
+            self._json_file = sys.stderr
+        elif json_log:
+            self._json_file = open(json_log, 'a', encoding='utf-8')
+
+    def event(self, event, message=None, **fields):
+        if self._json_file is not None:
+            record = {"ts": round(time.time(), 3), "event": event}
+            record.update(fields)
+            self._json_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._json_file.flush()
+            if self._json_file is sys.stderr:
+                return
+        if message and not self.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    def close(self):
+        if self._json_file is not None and self._json_file is not sys.stderr:
+            self._json_file.close()
+
+
+def load_ontology_file(path):
+    """读取 YAML 本体文件，并与界面上传时一样规范化为 YAML 字符串"""
+    with open(path, 'r', encoding='utf-8') as f:
+        ontology_data = yaml.safe_load(f)
+    if not ontology_data:
+        raise ValueError("本体定义为空")
+    ontology = yaml.dump(ontology_data, allow_unicode=True)
+    # 提前检查属性类型和索引声明，避免每个文本块都因同一个错误失败
+    compile_ontology(ontology)
+    return ontology
+
+
+def load_gazetteer(args, ontology, db_handler=None):
+    """
+    按命令行参数构建已知实体索引，未指定 --gazetteer 时返回 None
+
+    没有传入 db_handler 时尝试按 --neo4j-uri 连接图数据库读取实体名称，失败时只使用 YAML 中的声明
+
+    Returns:
+        (Gazetteer 或 None, 警告信息或 None)
+    """
+    if not args.gazetteer:
+        return None, None
+    gazetteer = build_gazetteer(ontology, skip_policy=args.skip_policy)
+    try:
+        if db_handler is not None:
+            gazetteer.add_graph_names(db_handler)
+        else:
+            name_handler = Neo4jHandler(args.neo4j_uri, args.neo4j_user,
+                                        args.neo4j_password or os.environ.get("NEO4J_PASSWORD", ""))
+            try:
+                gazetteer.add_graph_names(name_handler)
+            finally:
+                name_handler.close()
+    except Exception as e:
+        return gazetteer, f"读取图谱实体名称失败，仅使用 YAML 中声明的实体和关键词: {e}"
+    return gazetteer, None
+
+
+def connect_neo4j(args, reporter):
+    """
+    按命令行参数连接 Neo4j 并检查连接
+
+    URI 格式错误时驱动在创建时即抛出异常（ConfigurationError / ValueError），与连接失败一样作为错误事件报告
+
+    Returns:
+        Neo4jHandler，失败时返回 None
+    """
+    try:
+        db_handler = Neo4jHandler(args.neo4j_uri, args.neo4j_user,
+                                  args.neo4j_password or os.environ.get("NEO4J_PASSWORD", ""))
+    except Exception as e:
+        reporter.event("error", f"数据库连接失败: {e}", stage="neo4j", error=str(e))
+        return None
+    conn_success, conn_message = db_handler.test_connection()
+    if not conn_success:
+        reporter.event("error", f"数据库连接失败: {conn_message}", stage="neo4j", error=conn_message)
+        db_handler.close()
+        return None
+    return db_handler
+
+
+@contextmanager
+def build_signals(control, reporter):
+    """
+    构建期间的信号处理：SIGINT（Ctrl+C）/ SIGTERM 请求协作式取消，再次收到 SIGINT 时立即中断；
+    支持的平台上 SIGUSR1 暂停、SIGUSR2 恢复。只能在主线程中安装，其他线程中调用时不做处理
+    """
+    def on_cancel(signum, frame):
+        if control.cancelled:
+            raise KeyboardInterrupt
+        reporter.event("cancel", f"收到 {signal.Signals(signum).name}：停止派发新的文本块，最多等待 "
+                                 f"{control.cancel_timeout:g} 秒在途请求后写入已抽取的三元组（再次 Ctrl+C 立即退出）",
+                       signal=signal.Signals(signum).name)
+        control.cancel()
+
+    def on_pause(signum, frame):
+        if control.pause():
+            reporter.event("pause", "已暂停：在途请求完成后不再派发新的文本块（SIGUSR2 恢复）")
+
+    def on_resume(signum, frame):
+        if control.resume():
+            reporter.event("resume", "已恢复")
+
+    handlers = {signal.SIGINT: on_cancel, signal.SIGTERM: on_cancel}
+    if hasattr(signal, "SIGUSR1"):
+        handlers[signal.SIGUSR1] = on_pause
+        handlers[signal.SIGUSR2] = on_resume
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = {signum: signal.signal(signum, handler) for signum, handler in handlers.items()}
+    try:
+        yield
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def run_build(args):
+    """执行一次无界面构建，返回退出码"""
+    reporter = ProgressReporter(args.json_log, args.quiet)
+    try:
+        try:
+            ontology = load_ontology_file(args.schema)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            reporter.event("error", f"本体文件读取失败: {e}", stage="schema", error=str(e))
+            return EXIT_CONFIG_ERROR
+
+        api_key = args.api_key or os.environ.get("KG_API_KEY", "")
+        if not api_key:
+            reporter.event("error", "缺少 API Key（使用 --api-key 或环境变量 KG_API_KEY）", stage="config")
+            return EXIT_CONFIG_ERROR
+
+        try:
+            for model_name in [args.model] + (args.cascade or []):
+                get_registry().get(model_name)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            reporter.event("error", f"模型配置错误: {e}", stage="config", error=str(e))
+            return EXIT_CONFIG_ERROR
+
+        sources, errors = collect_path_sources(args.input)
+        for err in errors:
+            reporter.event("warning", f"警告: {err}", stage="load", error=err)
+        if not sources:
+            reporter.event("error", "没有可处理的文档", stage="load")
+            return EXIT_CONFIG_ERROR
+        reporter.event("start", f"开始构建：{len(sources)} 个文档，模型 {args.model}，并发 {args.concurrency}",
+                       documents=len(sources), model=args.model, concurrency=args.concurrency)
+
+        db_handler = connect_neo4j(args, reporter)
+        if db_handler is None:
+            return EXIT_DB_ERROR
+
+        # 导出文件在文档和数据库检查通过后才创建，提前返回时不会留下未关闭的空导出文件
+        try:
+            exporter = open_cli_exporter(args)
+        except (ImportError, OSError) as e:
+            reporter.event("error", f"三元组导出配置错误: {e}", stage="export", error=str(e))
+            db_handler.close()
+            return EXIT_CONFIG_ERROR
+
+        start_time = time.time()
+        usage_tracker = UsageTracker()
+        load_errors = []
+
+        def on_progress(record, triples, processed_chunks, total_triples):
+            reporter.event("chunk",
+                           f"[{processed_chunks}] {record['doc']} #{record['index'] + 1}: {len(triples)} 个三元组",
+                           chunk_id=record["chunk_id"], doc=record["doc"], triples=len(triples))
+
+        if args.trace or args.metrics:
+            tracer.reset()
+            tracer.enabled = True
+        profiler = profile_build(args.profile, args.profiler) if args.profile else nullcontext()
+        if args.autotune:
+            try:
+                sample_records = iter_corpus_records(sources, args.max_chunk_size, args.min_chunk_size,
+                                                     dedup=args.dedup)
+                profile, calibrated = autotune(sample_records, ontology, api_key, args.model, db_handler,
+                                               recalibrate=args.recalibrate, default_chunk_size=args.max_chunk_size,
+                                               default_write_batch_size=args.write_batch_size)
+            except Exception as e:
+                reporter.event("warning", f"警告: 自动调优失败，使用命令行参数: {e}", stage="autotune", error=str(e))
+            else:
+                args.max_chunk_size = profile["chunk_size"]
+                args.min_chunk_size = min(args.min_chunk_size, profile["min_chunk_size"])
+                args.concurrency = profile["concurrency"]
+                args.write_batch_size = profile["write_batch_size"]
+                reporter.event("autotune", f"自动调优（{'新校准' if calibrated else '复用已保存配置'}）：文本块 "
+                                           f"{args.max_chunk_size} 字符，并发 {args.concurrency}，"
+                                           f"写入批量 {args.write_batch_size}",
+                               calibrated=calibrated, chunk_size=args.max_chunk_size, concurrency=args.concurrency,
+                               write_batch_size=args.write_batch_size, measurements=profile.get("measurements"))
+        # 路由器在自动调优之后创建，长文本判断使用最终的文本块大小
+        router = None
+        if args.cascade:
+            router = CascadeRouter([args.model] + args.cascade, min_accept_ratio=args.min_accept_ratio,
+                                   route_complex=args.route_complex, max_chunk_size=args.max_chunk_size)
+
+        gazetteer, gazetteer_warning = load_gazetteer(args, ontology, db_handler)
+        if gazetteer_warning:
+            reporter.event("warning", f"警告: {gazetteer_warning}", stage="gazetteer", error=gazetteer_warning)
+        resolver = build_resolver(ontology, args.alias_db) if args.resolve_entities else None
+        if gazetteer is not None:
+            reporter.event("gazetteer", f"已知实体索引：{gazetteer.size['entities']} 个实体名称/别名，"
+                                        f"{gazetteer.size['keywords']} 个关键词，跳过策略 {args.skip_policy}",
+                           **gazetteer.size)
+
+        control = BuildControl(args.cancel_timeout)
+        try:
+            with profiler, build_signals(control, reporter):
+                records = iter_corpus_records(sources, args.max_chunk_size, args.min_chunk_size,
+                                              errors=load_errors, dedup=args.dedup)
+                stats = build_graph(records, ontology, api_key, args.model, db_handler,
+                                    max_workers=args.concurrency, on_progress=on_progress, router=router,
+                                    gazetteer=gazetteer, resolver=resolver, write_batch_size=args.write_batch_size,
+                                    exporter=exporter, control=control, prune_schema=args.prune_schema,
+                                    usage_tracker=usage_tracker)
+        except Exception as e:
+            reporter.event("error", f"构建失败: {e}", stage="build", error=str(e))
+            return EXIT_BUILD_ERROR
+        finally:
+            db_handler.close()
+            if resolver is not None:
+                resolver.close()
+            if exporter is not None:
+                exporter.close()
+            if args.trace:
+                tracer.export_chrome_trace(args.trace)
+            if args.metrics:
+                tracer.export_prometheus(args.metrics)
+
+        for err in load_errors:
+            reporter.event("warning", f"警告: {err}", stage="load", error=err)
+
+        elapsed = time.time() - start_time
+        usage = usage_tracker.summary()
+        ThroughputStore().record(usage_tracker)
+        cancelled = stats["cancelled"]
+        reporter.event("done",
+                       f"{'构建已取消' if cancelled else '构建完成'}：{stats['total_chunks']} 个文本块，"
+                       f"{stats['total_triples']} 个三元组，耗时 {elapsed:.1f} 秒",
+                       chunks=stats["total_chunks"], triples=stats["total_triples"], elapsed=round(elapsed, 3),
+                       usage=usage, routing=stats.get("routing"), gazetteer=stats.get("gazetteer"),
+                       entity_resolution=stats.get("entity_resolution"), normalization=stats.get("normalization"),
+                       export=stats.get("export"), cancelled=cancelled, control=stats["control"],
+                       write_failures=stats["write_failures"])
+        if stats["write_failures"]:
+            reporter.event("warning", f"警告: {stats['write_failures']} 行写入 Neo4j 失败（详见错误日志）",
+                           stage="write", write_failures=stats["write_failures"])
+        if cancelled:
+            control_stats = stats["control"]
+            reporter.event("cancelled", f"取消后 {control_stats['cancel_latency_seconds']:.2f} 秒停止，"
+                                        f"放弃 {control_stats['abandoned_requests']} 个超时的在途请求",
+                           **control_stats)
+        _report_export(reporter, stats.get("export"))
+        if router is not None:
+            routing = stats["routing"]
+            reporter.event("routing", "\n".join(
+                [f"级联路由：{routing['escalated_chunks']}/{routing['chunks']} 个文本块升级"] +
+                [f"  {tier['model']}: 请求 {tier['requests']}，接受 {tier['accepted']}，升级 {tier['escalated']}"
+                 for tier in routing["tiers"]]))
+        if tracer.enabled:
+            reporter.event("stages", "\n".join(
+                f"  {stage['stage']}: {stage['count']} 次，共 {stage['total_ms']:.0f} ms，平均 {stage['avg_ms']:.1f} ms"
+                for stage in tracer.summary()), stages=tracer.summary())
+        return EXIT_CANCELLED if cancelled else EXIT_OK
+    finally:
+        reporter.close()
+
+
+def run_plan(args):
+    """试运行：加载并切分文档、渲染提示词，本地统计 token 并预估费用和耗时（不调用 LLM）"""
+    try:
+        ontology = load_ontology_file(args.schema)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        print(f"本体文件读取失败: {e}", file=sys.stderr)
+        return EXIT_CONFIG_ERROR
+
+    sources, errors = collect_path_sources(args.input)
+    for err in errors:
+        print(f"警告: {err}", file=sys.stderr)
+    if not sources:
+        print("没有可处理的文档", file=sys.stderr)
+        return EXIT_CONFIG_ERROR
+
+    gazetteer, gazetteer_warning = load_gazetteer(args, ontology)
+    if gazetteer_warning:
+        print(f"警告: {gazetteer_warning}", file=sys.stderr)
+
+    load_errors = []
+    records = iter_corpus_records(sources, args.max_chunk_size, args.min_chunk_size, errors=load_errors,
+                                  dedup=args.dedup)
+    plan = plan_build(records, ontology, args.model, max_workers=args.concurrency, prune_schema=args.prune_schema,
+                      sample_prompts=0, gazetteer=gazetteer)
+    for err in load_errors:
+        print(f"警告: {err}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(plan, ensure_ascii=False, indent=2))
+        return EXIT_OK
+
+    cost = "未知" if plan["estimated_cost"] is None else f"${plan['estimated_cost']:.4f}"
+    print(f"模型: {plan['model']}")
+    print(f"文本块: {plan['chunks']}" + (f"（已知实体索引跳过 {plan['skipped_chunks']} 个）"
+                                        if gazetteer is not None else ""))
+    print(f"输入 tokens: {plan['input_tokens']}（平均 {plan['avg_prompt_tokens']}，最大 {plan['max_prompt_tokens']}）")
+    print(f"预估输出 tokens: {plan['output_tokens']}")
+    print(f"预估费用: {cost}")
+    print(f"预估耗时: {plan['estimated_seconds']} 秒（并发 {args.concurrency}）")
+    if not plan["profile_observed"]:
+        print("提示: 尚无该模型的历史构建数据，输出 tokens 和耗时按默认假设估算")
+    for doc in plan["documents"]:
+        print(f"  {doc['doc']}: {doc['chunks']} 个文本块，{doc['input_tokens']} tokens")
+    return EXIT_OK
+
+
+def run_models(args):
+    """列出服务商注册表中声明的模型"""
+    try:
+        registry = get_registry(args.providers)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        print(f"服务商注册表读取失败: {e}", file=sys.stderr)
+        return EXIT_CONFIG_ERROR
+    for model in registry.models():
+        provider = model.provider
+        limits = ", ".join(f"{name}={value}" for name, value in (("rpm", provider.rpm), ("tpm", provider.tpm))
+                           if value)
+        print(f"{model.name:<28} {provider.name:<12} {provider.base_url}  并发上限 {provider.max_concurrency}  "
+              f"上下文 {model.context_window or '-'}  JSON模式 {'是' if model.json_mode else '否'}"
+              + (f"  {limits}" if limits else ""))
+    return EXIT_OK
+
+
+def run_enqueue(args):
+    """协调者：切分文档并把文本块发布到持久化工作队列"""
+    reporter = ProgressReporter(args.json_log, args.quiet)
+    try:
+        try:
+            ontology = load_ontology_file(args.schema)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            reporter.event("error", f"本体文件读取失败: {e}", stage="schema", error=str(e))
+            return EXIT_CONFIG_ERROR
+
+        sources, errors = collect_path_sources(args.input)
+        for err in errors:
+            reporter.event("warning", f"警告: {err}", stage="load", error=err)
+        if not sources:
+            reporter.event("error", "没有可处理的文档", stage="load")
+            return EXIT_CONFIG_ERROR
+
+        try:
+            get_registry().get(args.model)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            reporter.event("error", f"模型配置错误: {e}", stage="config", error=str(e))
+            return EXIT_CONFIG_ERROR
+
+        load_errors = []
+        try:
+            queue = ChunkQueue(args.queue)
+            queue.set_meta(ontology=ontology, model=args.model,
+                           extract_options={"prune_schema": args.prune_schema})
+            records = iter_corpus_records(sources, args.max_chunk_size, args.min_chunk_size, errors=load_errors,
+                                          dedup=args.dedup)
+            published = queue.publish(records)
+        except (OSError, sqlite3.Error) as e:
+            reporter.event("error", f"发布到队列失败: {e}", stage="enqueue", error=str(e))
+            return EXIT_BUILD_ERROR
+        for err in load_errors:
+            reporter.event("warning", f"警告: {err}", stage="load", error=err)
+        reporter.event("enqueued", f"已发布 {published} 个文本块到队列 {args.queue}",
+                       queue=args.queue, chunks=published)
+        return EXIT_OK
+    finally:
+        reporter.close()
+
+
+def _worker_main(queue_path, api_key, worker_id, args):
+    """单个工作进程的入口（供多进程模式使用）"""
+    if args.processes > 1:
+        # 子进程重新配置日志，逐块日志以追加模式写入同一文件
+        setup_logging(args)
+    queue = ChunkQueue(queue_path)
+    reporter = ProgressReporter(None, args.quiet)
+
+    def on_task(task, triples_count, error):
+        if error:
+            reporter.event("task_failed", f"[{worker_id}] {task['chunk_id']} 失败: {error}")
+        else:
+            reporter.event("task_done", f"[{worker_id}] {task['doc']} #{task['index'] + 1}: {triples_count} 个三元组")
+
+    return run_worker(queue, api_key, worker_id, concurrency=args.concurrency,
+                      visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts,
+                      exit_when_empty=not args.keep_alive, on_task=on_task)
+
+
+def run_queue_worker(args):
+    """工作进程：从队列租用文本块并抽取三元组，可在同一台机器上启动多个"""
+    api_key = args.api_key or os.environ.get("KG_API_KEY", "")
+    if not api_key:
+        print("缺少 API Key（使用 --api-key 或环境变量 KG_API_KEY）", file=sys.stderr)
+        return EXIT_CONFIG_ERROR
+    if not os.path.exists(args.queue):
+        print(f"队列不存在: {args.queue}", file=sys.stderr)
+        return EXIT_CONFIG_ERROR
+
+    base_id = args.worker_id or default_worker_id()
+    try:
+        if args.processes <= 1:
+            processed = _worker_main(args.queue, api_key, base_id, args)
+            print(f"[{base_id}] 工作进程退出，共处理 {processed} 个文本块", file=sys.stderr)
+            return EXIT_OK
+
+        processes = [multiprocessing.Process(target=_worker_main,
+                                             args=(args.queue, api_key, f"{base_id}-{i}", args))
+                     for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return EXIT_OK if all(process.exitcode == 0 for process in processes) else EXIT_BUILD_ERROR
+    except Exception as e:
+        print(f"工作进程失败: {e}", file=sys.stderr)
+        return EXIT_BUILD_ERROR
+
+
+def run_collect(args):
+    """协调者：收集工作进程返回的三元组并写入 Neo4j，直到队列处理完毕"""
+    reporter = ProgressReporter(args.json_log, args.quiet)
+    try:
+        if not os.path.exists(args.queue):
+            reporter.event("error", f"队列不存在: {args.queue}", stage="config")
+            return EXIT_CONFIG_ERROR
+        queue = ChunkQueue(args.queue)
+
+        db_handler = connect_neo4j(args, reporter)
+        if db_handler is None:
+            return EXIT_DB_ERROR
+
+        meta = queue.get_meta()
+        try:
+            exporter = open_cli_exporter(args)
+        except (ImportError, OSError) as e:
+            reporter.event("error", f"三元组导出配置错误: {e}", stage="export", error=str(e))
+            db_handler.close()
+            return EXIT_CONFIG_ERROR
+        resolver = build_resolver(meta["ontology"], args.alias_db) if args.resolve_entities else None
+        normalizer = get_normalizer(compile_ontology(meta["ontology"]))
+        total_chunks = 0
+        total_triples = 0
+        write_failures = 0
+        try:
+            db_handler.execute_cypher(generate_index_cypher(meta["ontology"]))
+            while True:
+                results = queue.fetch_done()
+                for result in results:
+                    # 队列中的结果已在工作进程校验过，直接构建轻量三元组，不再经过 pydantic；
+                    # 日期等属性经过 JSON 序列化变成了字符串，按本体重新转换类型
+                    triples = normalizer.coerce_triples(
+                        [CompactTriple.from_dict(triple) for triple in result["triples"]])
+                    if triples:
+                        if resolver is not None:
+                            resolver.resolve_triples(triples)
+                        write_failures += db_handler.execute_cypher(generate_cypher(triples))
+                        if exporter is not None:
+                            exporter.write(triples, result, meta.get("model"))
+                    # 写入成功后才确认，中途失败的结果在下次运行 collect 时重新收集
+                    queue.ack([result["task_id"]])
+                    total_chunks += 1
+                    total_triples += len(triples)
+                    reporter.event("chunk",
+                                   f"[{total_chunks}] {result['doc']} #{result['index'] + 1}: {len(triples)} 个三元组",
+                                   chunk_id=result["chunk_id"], doc=result["doc"], triples=len(triples))
+                if not results:
+                    if queue.is_finished() or args.once:
+                        break
+                    time.sleep(args.poll_interval)
+        except Exception as e:
+            reporter.event("error", f"收集失败: {e}", stage="collect", error=str(e))
+            return EXIT_BUILD_ERROR
+        finally:
+            db_handler.close()
+            if resolver is not None:
+                resolver.close()
+            if exporter is not None:
+                exporter.close()
+
+        counts = queue.counts()
+        reporter.event("done", f"收集完成：{total_chunks} 个文本块，{total_triples} 个三元组，"
+                               f"失败 {counts['failed']} 个文本块，写入失败 {write_failures} 行",
+                       chunks=total_chunks, triples=total_triples, failed=counts["failed"],
+                       write_failures=write_failures,
+                       entity_resolution=resolver.summary() if resolver is not None else None,
+                       export=exporter.summary() if exporter is not None else None)
+        if exporter is not None:
+            _report_export(reporter, exporter.summary())
+        return EXIT_OK if counts["failed"] == 0 and write_failures == 0 else EXIT_BUILD_ERROR
+    finally:
+        reporter.close()
+
+
+def _add_neo4j_arguments(parser):
+    parser.add_argument("--neo4j-uri", default="bolt://localhost:7687")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default=None, help="默认读取环境变量 NEO4J_PASSWORD")
+
+
+def _add_resolution_arguments(parser):
+    parser.add_argument("--resolve-entities", action="store_true",
+                        help="写入前按实体类型把名称归并到规范名称（规范化键 + n-gram LSH + 持久化别名表）")
+    parser.add_argument("--alias-db", default=DEFAULT_ALIAS_DB, help="实体别名表路径（跨构建复用）")
+
+
+def _add_export_arguments(parser):
+    parser.add_argument("--export", default=None, metavar="DIR",
+                        help="把通过校验的三元组（含 chunk_id、文档和模型）流式导出到该目录")
+    parser.add_argument("--export-format", choices=EXPORT_FORMATS, default=EXPORT_FORMAT_JSONL,
+                        help="导出格式（parquet 需要安装 pyarrow）")
+    parser.add_argument("--export-max-rows", type=int, default=DEFAULT_MAX_ROWS_PER_FILE,
+                        help="单个导出文件的最大行数，超过后轮转到新文件")
+
+
+def open_cli_exporter(args):
+    """按命令行参数创建三元组导出器，未指定 --export 时返回 None"""
+    if not args.export:
+        return None
+    return open_exporter(args.export_format, args.export, max_rows_per_file=args.export_max_rows)
+
+
+def _report_export(reporter, export):
+    if export:
+        reporter.event("export", f"三元组已导出：{export['rows']} 行，{len(export['files'])} 个文件，"
+                                 f"目录 {export['directory']}", **export)
+
+
+def _add_logging_arguments(parser, chunk_log_option=True):
+    parser.add_argument("--log-level", default=None, choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="日志级别（默认读取环境变量 KG_LOG_LEVEL 或 config/app_config.py 中的 LOG_LEVEL）")
+    parser.add_argument("--log-sample", type=float, default=None,
+                        help="DEBUG 级别记录 LLM 原始响应等大段载荷的采样率（0~1）")
+    if chunk_log_option:
+        parser.add_argument("--chunk-log", default=None,
+                            help="逐块结果的 JSON Lines 日志路径（解析是否成功、候选/通过三元组数、耗时、错误）")
+
+
+def setup_logging(args):
+    """按命令行参数配置日志级别、载荷采样率和逐块日志"""
+    configure_logging(getattr(args, "log_level", None), getattr(args, "log_sample", None))
+    if getattr(args, "chunk_log", None):
+        chunk_log.open(args.chunk_log)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="kgbuilder", description="Knowledge Graph Builder 命令行工具")
+    subparsers = parser.add_subparsers(dest="command")
+
+    build = subparsers.add_parser("build", help="从文档构建知识图谱并写入 Neo4j")
+    build.add_argument("--schema", required=True, help="YAML 本体定义文件")
+    build.add_argument("--input", required=True, nargs="+", help="文档、压缩包或目录路径")
+    build.add_argument("--model", default="glm-4-flash", help="LLM 模型名称")
+    build.add_argument("--api-key", default=None, help="LLM API Key（默认读取环境变量 KG_API_KEY）")
+    _add_neo4j_arguments(build)
+    build.add_argument("--max-chunk-size", type=int, default=2000)
+    build.add_argument("--min-chunk-size", type=int, default=500)
+    build.add_argument("--concurrency", type=int, default=4, help="并发 LLM 请求数")
+    build.add_argument("--dedup", action="store_true", help="去除样板内容与重复文本块")
+    build.add_argument("--prune-schema", action="store_true", help="按文本块裁剪本体")
+    build.add_argument("--cascade", nargs="+", default=None, metavar="MODEL",
+                       help="级联路由的升级模型（按顺序），--model 作为第一级")
+    build.add_argument("--min-accept-ratio", type=float, default=0.5, help="本体校验通过率低于该值时升级")
+    build.add_argument("--no-route-complex", dest="route_complex", action="store_false",
+                       help="级联路由时不按本地启发式（超过最大文本块大小、表格、数据密集）让复杂文本块跳过第一级")
+    build.add_argument("--gazetteer", action="store_true",
+                       help="使用已知实体索引（图谱实体名称 + YAML 别名和关键词）预扫描文本块并附加提示")
+    build.add_argument("--skip-policy", choices=SKIP_POLICIES, default=SKIP_NEVER,
+                       help="已知实体索引的跳过策略：never 不跳过，no_match 跳过既无已知实体也无关键词的文本块，"
+                            "no_entities 跳过没有已知实体的文本块")
+    _add_resolution_arguments(build)
+    _add_export_arguments(build)
+    build.add_argument("--write-batch-size", type=int, default=config_manager.get("processing.batch_size", 1),
+                       help="每次写入 Neo4j 的三元组数（默认取配置文件中的 processing.batch_size）")
+    build.add_argument("--autotune", action="store_true",
+                       help="按 模型@接口地址 复用已保存的调优配置，没有时先在语料样本上校准文本块大小、并发数和写入批量")
+    build.add_argument("--recalibrate", action="store_true", help="与 --autotune 一起使用，忽略已保存的配置重新校准")
+    build.add_argument("--cancel-timeout", type=float, default=DEFAULT_CANCEL_TIMEOUT,
+                       help="Ctrl+C / SIGTERM 取消后等待在途 LLM 请求的秒数，超时的请求被放弃")
+    build.add_argument("--json-log", default=None, help="JSON Lines 事件日志路径，'-' 表示输出到 stderr")
+    build.add_argument("--quiet", action="store_true", help="不输出文本进度")
+    _add_logging_arguments(build)
+    build.add_argument("--trace", default=None, help="导出各阶段耗时的 Chrome trace JSON 文件")
+    build.add_argument("--metrics", default=None, help="导出 Prometheus 文本格式的阶段耗时指标")
+    build.add_argument("--profile", default=None, help="对本次构建进行性能分析并保存结果")
+    build.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile",
+                       help="性能分析器（pyinstrument 需单独安装）")
+    build.set_defaults(func=run_build)
+
+    plan = subparsers.add_parser("plan", help="试运行：统计 token 并预估费用和耗时（不调用 LLM）")
+    plan.add_argument("--schema", required=True, help="YAML 本体定义文件")
+    plan.add_argument("--input", required=True, nargs="+", help="文档、压缩包或目录路径")
+    plan.add_argument("--model", default="glm-4-flash", help="LLM 模型名称")
+    plan.add_argument("--max-chunk-size", type=int, default=2000)
+    plan.add_argument("--min-chunk-size", type=int, default=500)
+    plan.add_argument("--concurrency", type=int, default=4, help="计划使用的并发 LLM 请求数")
+    plan.add_argument("--dedup", action="store_true", help="去除样板内容与重复文本块")
+    plan.add_argument("--prune-schema", action="store_true", help="按文本块裁剪本体")
+    plan.add_argument("--gazetteer", action="store_true", help="按已知实体索引排除会被跳过的文本块")
+    plan.add_argument("--skip-policy", choices=SKIP_POLICIES, default=SKIP_NEVER, help="已知实体索引的跳过策略")
+    plan.add_argument("--json", action="store_true", help="以 JSON 输出预估结果")
+    _add_neo4j_arguments(plan)
+    plan.set_defaults(func=run_plan)
+
+    models = subparsers.add_parser("models", help="列出服务商注册表中的模型")
+    models.add_argument("--providers", default=None, help="服务商注册表文件（默认 config/providers.yaml）")
+    models.set_defaults(func=run_models)
+
+    enqueue = subparsers.add_parser("enqueue", help="切分文档并发布到工作队列（多进程模式）")
+    enqueue.add_argument("--queue", required=True, help="队列数据库路径（本机磁盘上的 SQLite 文件，不支持网络文件系统）")
+    enqueue.add_argument("--schema", required=True, help="YAML 本体定义文件")
+    enqueue.add_argument("--input", required=True, nargs="+", help="文档、压缩包或目录路径")
+    enqueue.add_argument("--model", default="glm-4-flash", help="LLM 模型名称")
+    enqueue.add_argument("--max-chunk-size", type=int, default=2000)
+    enqueue.add_argument("--min-chunk-size", type=int, default=500)
+    enqueue.add_argument("--dedup", action="store_true", help="去除样板内容与重复文本块")
+    enqueue.add_argument("--prune-schema", action="store_true", help="按文本块裁剪本体")
+    enqueue.add_argument("--json-log", default=None, help="JSON Lines 事件日志路径，'-' 表示输出到 stderr")
+    enqueue.add_argument("--quiet", action="store_true", help="不输出文本进度")
+    enqueue.set_defaults(func=run_enqueue)
+
+    worker = subparsers.add_parser("worker", help="从工作队列租用文本块并抽取三元组")
+    worker.add_argument("--queue", required=True, help="队列数据库路径")
+    worker.add_argument("--api-key", default=None, help="LLM API Key（默认读取环境变量 KG_API_KEY）")
+    worker.add_argument("--worker-id", default=None, help="工作进程标识（默认 主机名-进程号）")
+    worker.add_argument("--processes", type=int, default=1, help="本机启动的工作进程数")
+    worker.add_argument("--concurrency", type=int, default=4, help="每个工作进程的并发 LLM 请求数")
+    worker.add_argument("--visibility-timeout", type=float, default=300, help="租约可见性超时（秒）")
+    worker.add_argument("--max-attempts", type=int, default=3, help="单个文本块的最大尝试次数")
+    worker.add_argument("--keep-alive", action="store_true", help="队列为空时继续等待新文本块")
+    worker.add_argument("--quiet", action="store_true", help="不输出文本进度")
+    _add_logging_arguments(worker)
+    worker.set_defaults(func=run_queue_worker)
+
+    collect = subparsers.add_parser("collect", help="收集工作队列的抽取结果并写入 Neo4j")
+    collect.add_argument("--queue", required=True, help="队列数据库路径")
+    _add_neo4j_arguments(collect)
+    _add_resolution_arguments(collect)
+    _add_export_arguments(collect)
+    collect.add_argument("--poll-interval", type=float, default=2.0, help="等待结果的轮询间隔（秒）")
+    collect.add_argument("--once", action="store_true", help="只收集当前已完成的结果后退出")
+    collect.add_argument("--json-log", default=None, help="JSON Lines 事件日志路径，'-' 表示输出到 stderr")
+    collect.add_argument("--quiet", action="store_true", help="不输出文本进度")
+    _add_logging_arguments(collect, chunk_log_option=False)
+    collect.set_defaults(func=run_collect)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, "func", None):
+        parser.print_help(sys.stderr)
+        return EXIT_CONFIG_ERROR
+    setup_logging(args)
+    try:
+        return args.func(args)
+    finally:
+        chunk_log.close()
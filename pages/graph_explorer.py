@@ -0,0 +1,161 @@
+import streamlit as st
+from utils.graph_db import Neo4jHandler
+from utils.graph_explorer import (GraphExplorer, QueryCache, Subgraph, DEFAULT_NODE_BUDGET, DEFAULT_DEGREE_CAP,
+                                  DEFAULT_PAGE_SIZE)
+from utils.logging_utils import configure_logging
+
+# 页面配置
+st.set_page_config(page_title="图谱浏览 - KG AI Builder", layout="wide", page_icon="🔭")
+
+configure_logging()
+
+
+@st.cache_resource
+def get_explorer(uri, user, password):
+    """按连接参数缓存浏览器（含查询结果缓存），重新运行脚本时复用连接和缓存"""
+    return GraphExplorer(Neo4jHandler(uri, user, password), QueryCache())
+
+
+def render_subgraph(subgraph, highlight=None):
+    """渲染子图（节点数已受预算限制）和节点、关系列表"""
+    if not subgraph.nodes:
+        st.info("没有可显示的节点")
+        return
+    st.graphviz_chart(subgraph.to_dot(highlight), use_container_width=True)
+    st.caption(f"显示 {len(subgraph.nodes)} 个节点、{len(subgraph.edges)} 条关系")
+    if subgraph.truncated:
+        st.warning(f"⚠️ 已达到节点预算（{subgraph.node_budget}），超出的节点和关系未显示")
+    with st.expander("节点与关系列表"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.dataframe(subgraph.node_rows(), use_container_width=True, hide_index=True)
+        with col2:
+            st.dataframe(subgraph.edge_rows(), use_container_width=True, hide_index=True)
+
+
+st.title("🔭 图谱浏览")
+st.markdown("所有查询都在服务端分页并限制度数，只把一页节点和有限的邻居取到界面中，适合浏览大规模图谱")
+
+with st.sidebar:
+    st.markdown("### 🗄️ Neo4j 连接")
+    neo4j_uri = st.text_input("Neo4j URI", value="bolt://localhost:7687", key="explorer_uri")
+    neo4j_user = st.text_input("Neo4j Username", value="neo4j", key="explorer_user")
+    neo4j_pwd = st.text_input("Neo4j Password", value="", type="password", key="explorer_pwd")
+
+    st.markdown("### ⚙️ 浏览设置")
+    node_budget = st.slider("节点预算", 20, 1000, DEFAULT_NODE_BUDGET, 10,
+                            help="单次渲染的节点上限，超出的节点不显示，保证大图上界面保持流畅")
+    degree_cap = st.slider("每个节点的邻居上限", 5, 200, DEFAULT_DEGREE_CAP, 5,
+                           help="展开节点或抽样概览时每个节点最多读取的关系数，高度数节点可翻页继续读取")
+    page_size = st.slider("每页节点数", 10, 200, DEFAULT_PAGE_SIZE, 10)
+
+if not neo4j_pwd:
+    st.info("请在侧边栏填写 Neo4j 连接信息")
+    st.stop()
+
+explorer = get_explorer(neo4j_uri, neo4j_user, neo4j_pwd)
+connected, message = explorer.db_handler.test_connection()
+if not connected:
+    st.error(f"❌ 连接 Neo4j 失败: {message}")
+    st.stop()
+
+with st.sidebar:
+    cache_stats = explorer.cache.summary()
+    st.caption(f"查询缓存: {cache_stats['entries']} 条，命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
+    if st.button("🔄 清空查询缓存", use_container_width=True):
+        explorer.cache.clear()
+        st.rerun()
+
+try:
+    label_counts = explorer.label_counts()
+    relationship_counts = explorer.relationship_counts()
+except Exception as e:
+    st.error(f"❌ 读取图谱统计失败: {e}")
+    st.stop()
+
+col1, col2 = st.columns(2)
+with col1:
+    st.markdown("#### 节点标签")
+    st.dataframe(label_counts, use_container_width=True, hide_index=True)
+with col2:
+    st.markdown("#### 关系类型")
+    st.dataframe(relationship_counts, use_container_width=True, hide_index=True)
+
+overview_tab, expand_tab = st.tabs(["📊 按标签抽样概览", "🔍 搜索与邻域展开"])
+
+with overview_tab:
+    label_options = ["全部"] + [row["label"] for row in label_counts]
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        overview_label = st.selectbox("节点标签", label_options, key="overview_label")
+    with col2:
+        overview_page = st.number_input("页码", min_value=1, value=1, step=1, key="overview_page")
+    label = None if overview_label == "全部" else overview_label
+    try:
+        overview = explorer.sample_overview(label, skip=(overview_page - 1) * page_size, limit=page_size,
+                                            degree_cap=degree_cap, node_budget=node_budget)
+        render_subgraph(overview)
+    except Exception as e:
+        st.error(f"❌ 查询失败: {e}")
+
+with expand_tab:
+    # 画布上累积展开的子图，expand_offsets 记录每个节点已读取的邻居数，用于继续翻页
+    if "explorer_subgraph" not in st.session_state:
+        st.session_state.explorer_subgraph = Subgraph(node_budget)
+        st.session_state.expand_offsets = {}
+    subgraph = st.session_state.explorer_subgraph
+    subgraph.node_budget = node_budget
+
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        search_text = st.text_input("节点名称", key="explorer_search", placeholder="输入名称前缀")
+    with col2:
+        search_label = st.selectbox("标签", label_options, key="explorer_search_label")
+    with col3:
+        search_page = st.number_input("页码", min_value=1, value=1, step=1, key="explorer_search_page")
+    contains = st.checkbox("包含匹配（无法使用索引，大图上较慢）", key="explorer_contains")
+
+    if search_text:
+        try:
+            results = explorer.search(search_text, None if search_label == "全部" else search_label,
+                                      skip=(search_page - 1) * page_size, limit=page_size, contains=contains)
+        except Exception as e:
+            results = []
+            st.error(f"❌ 搜索失败: {e}")
+        if results:
+            st.dataframe([{"name": row["name"], "labels": ", ".join(row["labels"]), "degree": row["degree"]}
+                          for row in results], use_container_width=True, hide_index=True)
+            choices = {f"{row['name']}（{', '.join(row['labels'])}，度数 {row['degree']}）": row["id"]
+                       for row in results}
+            selected = st.selectbox("选择要展开的节点", list(choices), key="explorer_selected")
+            if st.button("➕ 展开邻域", key="explorer_expand_selected"):
+                node_id = choices[selected]
+                offset = st.session_state.expand_offsets.get(node_id, 0)
+                added, degree = explorer.expand(subgraph, node_id, skip=offset, degree_cap=degree_cap)
+                st.session_state.expand_offsets[node_id] = offset + degree_cap
+                st.session_state.explorer_focus = node_id
+                st.toast(f"新增 {added} 个节点（该节点共 {degree} 条关系）")
+        else:
+            st.info("没有匹配的节点")
+
+    if subgraph.nodes:
+        node_choices = {f"{node['name']}（{node['label']}）": node_id for node_id, node in subgraph.nodes.items()}
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            canvas_selected = st.selectbox("画布中的节点", list(node_choices), key="explorer_canvas_selected")
+        node_id = node_choices[canvas_selected]
+        offset = st.session_state.expand_offsets.get(node_id, 0)
+        with col2:
+            if st.button("➕ 展开" if offset == 0 else "⏭️ 更多邻居", key="explorer_expand_canvas",
+                         use_container_width=True):
+                added, degree = explorer.expand(subgraph, node_id, skip=offset, degree_cap=degree_cap)
+                st.session_state.expand_offsets[node_id] = offset + degree_cap
+                st.session_state.explorer_focus = node_id
+                st.toast(f"新增 {added} 个节点（该节点共 {degree} 条关系）")
+                st.rerun()
+        with col3:
+            if st.button("🗑️ 清空画布", key="explorer_clear", use_container_width=True):
+                st.session_state.explorer_subgraph = Subgraph(node_budget)
+                st.session_state.expand_offsets = {}
+                st.rerun()
+    render_subgraph(subgraph, st.session_state.get("explorer_focus"))
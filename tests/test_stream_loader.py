@@ -0,0 +1,31 @@
+import io
+from utils.stream_loader import MAX_RECORD_BYTES, _LINE_BREAK, _PARAGRAPH_BREAK, iter_record_spans, iter_text_records
+
+
+def _covered(spans):
+    return sum(end - start for start, end in spans)
+
+
+def test_invalid_utf8_run_does_not_loop_forever():
+    buffer = b'a' + b'\x80' * 70 * 1024
+    spans = []
+    for span in iter_record_spans(buffer, _LINE_BREAK):
+        spans.append(span)
+        assert len(spans) < 10, "切分位置没有前进"
+    assert all(end > start for start, end in spans)
+    assert _covered(spans) == len(buffer)
+
+
+def test_long_record_is_split_without_breaking_utf8():
+    buffer = ("中" * (MAX_RECORD_BYTES // 2)).encode("utf-8")
+    spans = list(iter_record_spans(buffer, _PARAGRAPH_BREAK))
+    assert len(spans) > 1
+    assert _covered(spans) == len(buffer)
+    for start, end in spans:
+        buffer[start:end].decode("utf-8")
+
+
+def test_csv_quoted_field_with_newline_stays_in_one_record():
+    data = 'name,note\n张三,"第一行\n第二行"\n李四,普通\n'.encode("utf-8")
+    records = list(iter_text_records(io.BytesIO(data), "csv"))
+    assert records == ["name note", "张三 第一行\n第二行", "李四 普通"]
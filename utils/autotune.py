@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.doc_loader import smart_text_segmentation
+from utils.llm_extractor import process_text_with_llm, generate_cypher
+from utils.graph_db import quote_identifier
+from utils.triple_store import CompactTriple
+from utils.provider_registry import get_registry
+from utils.token_accounting import count_tokens
+from utils.logging_utils import get_logger
+
+
+logger = get_logger("autotune")
+
+# 调优配置的默认保存位置（按 模型@接口地址 保存）
+DEFAULT_PROFILE_PATH = os.path.join(".kgbuilder", "autotune.json")
+
+# 校准时尝试的文本块大小、并发级别和 Neo4j 写入批量（三元组数）
+DEFAULT_CHUNK_SIZES = (1000, 2000, 3000)
+DEFAULT_CONCURRENCY_LEVELS = (1, 2, 4, 8, 16)
+DEFAULT_WRITE_BATCH_SIZES = (1, 20, 100, 500)
+
+# 校准抽样的语料长度（字符数）和每种文本块大小的样本数
+DEFAULT_SAMPLE_CHARS = 20000
+DEFAULT_SAMPLES_PER_SIZE = 3
+
+# 响应可解析比例低于该值的文本块大小不予采用
+MIN_PARSE_RATE = 0.8
+# 错误率超过该值时停止提高并发
+MAX_ERROR_RATE = 0.05
+# 提高并发后吞吐提升不足该比例时停止
+MIN_THROUGHPUT_GAIN = 0.1
+# 写入批量在最快批量耗时的该比例以内时取较小的批量
+WRITE_LATENCY_TOLERANCE = 0.1
+# 写入批量校准使用的临时标签前缀：校准三元组只写入这些标签下的节点，测量后删除，不进入真实图谱
+CALIBRATION_LABEL_PREFIX = "_KGAutotune_"
+
+# 同一进程内的多个构建可能同时写调优文件
+_PROFILE_LOCK = threading.Lock()
+
+
+def profile_key(model_name, api_base=None):
+    """调优配置的键：模型名称@接口地址（同一模型在不同接口上的延迟和限流不同）"""
+    return f"{model_name}@{get_registry().resolve(model_name, api_base).base_url}"
+
+
+class TuningStore:
+    """
+    按 模型@接口地址 保存校准得到的文本块大小、并发数和写入批量，后续构建直接复用
+
+    文件格式: {"model@endpoint": {"chunk_size", "min_chunk_size", "concurrency", "write_batch_size",
+                                  "measurements", "calibrated_at"}}
+    """
+
+    def __init__(self, path=DEFAULT_PROFILE_PATH):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        return self.load().get(key)
+
+    def save(self, key, profile):
+        with _PROFILE_LOCK:
+            data = self.load()
+            data[key] = profile
+            path_dir = os.path.dirname(self.path)
+            if path_dir:
+                os.makedirs(path_dir, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def sample_corpus_text(records, max_chars=DEFAULT_SAMPLE_CHARS):
+    """从文本块记录中取前 max_chars 个字符的文本，用于按不同大小重新切分"""
+    parts = []
+    total = 0
+    for record in records:
+        parts.append(record["text"])
+        total += len(record["text"])
+        if total >= max_chars:
+            break
+    return "\n".join(parts)[:max_chars]
+
+
+def _extract_sample(chunk, ontology, api_key, model_name, api_base):
+    report = {}
+    start = time.perf_counter()
+    try:
+        triples = process_text_with_llm(chunk, ontology, api_key, model_name, api_base=api_base, report=report)
+    except Exception as e:
+        triples = []
+        report = {"error": str(e)}
+    return {
+        "latency": time.perf_counter() - start,
+        "text_tokens": count_tokens(chunk, model_name),
+        "triples": triples,
+        "parse_ok": bool(report.get("parse_ok")),
+        "error": report.get("error")
+    }
+
+
+def calibrate_chunk_size(text, ontology, api_key, model_name, api_base=None, chunk_sizes=DEFAULT_CHUNK_SIZES,
+                         samples_per_size=DEFAULT_SAMPLES_PER_SIZE, objective="throughput"):
+    """
+    按不同大小切分样本文本并抽取，测量延迟、可解析比例和每 token 的三元组产出
+
+    Args:
+        objective: throughput 按每秒 LLM 时间产出的三元组数选择，yield 按每千 token 产出的三元组数选择
+
+    Returns:
+        (选择的文本块大小或 None, 各大小的测量结果, 抽取到的三元组列表)
+    """
+    results = []
+    all_triples = []
+    for chunk_size in chunk_sizes:
+        chunks = smart_text_segmentation(text, chunk_size, min(500, chunk_size // 2))[:samples_per_size]
+        if not chunks:
+            continue
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            samples = list(executor.map(lambda chunk: _extract_sample(chunk, ontology, api_key, model_name,
+                                                                      api_base), chunks))
+        latency = sum(sample["latency"] for sample in samples)
+        text_tokens = sum(sample["text_tokens"] for sample in samples)
+        triples = sum(len(sample["triples"]) for sample in samples)
+        for sample in samples:
+            all_triples.extend(sample["triples"])
+        results.append({
+            "chunk_size": chunk_size,
+            "samples": len(samples),
+            "avg_latency_seconds": round(latency / len(samples), 3),
+            "parse_rate": round(sum(sample["parse_ok"] for sample in samples) / len(samples), 3),
+            "triples": triples,
+            "text_tokens": text_tokens,
+            "triples_per_1k_tokens": round(triples * 1000 / text_tokens, 3) if text_tokens else 0,
+            "triples_per_second": round(triples / latency, 3) if latency else 0
+        })
+        logger.info("校准文本块大小 %d: 平均延迟 %.2f 秒，%d 个三元组", chunk_size, latency / len(samples), triples)
+
+    if not results:
+        return None, results, all_triples
+    candidates = [result for result in results if result["parse_rate"] >= MIN_PARSE_RATE] or results
+    metric = "triples_per_1k_tokens" if objective == "yield" else "triples_per_second"
+    best = max(candidates, key=lambda result: (result[metric], -result["avg_latency_seconds"]))
+    return best["chunk_size"], results, all_triples
+
+
+def calibrate_concurrency(chunks, ontology, api_key, model_name, api_base=None, max_concurrency=None,
+                          levels=DEFAULT_CONCURRENCY_LEVELS):
+    """
+    逐级提高并发，测量服务商的错误率和请求吞吐：错误率超过 MAX_ERROR_RATE 或吞吐不再明显提升时停止
+
+    Returns:
+        (选择的并发数, 各级别的测量结果)
+    """
+    if max_concurrency is None:
+        max_concurrency = get_registry().resolve(model_name, api_base).provider.max_concurrency
+    levels = [level for level in levels if level <= max_concurrency] or [1]
+    results = []
+    best_level = 1
+    best_throughput = 0
+    for level in levels:
+        # 每级至少发出 2 个请求，按轮转使用样本文本块
+        requests = [chunks[i % len(chunks)] for i in range(max(2, level))]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            samples = list(executor.map(lambda chunk: _extract_sample(chunk, ontology, api_key, model_name,
+                                                                      api_base), requests))
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for sample in samples if sample["error"])
+        throughput = len(samples) / elapsed if elapsed else 0
+        result = {
+            "concurrency": level,
+            "requests": len(samples),
+            "error_rate": round(errors / len(samples), 3),
+            "requests_per_second": round(throughput, 3),
+            "avg_latency_seconds": round(sum(sample["latency"] for sample in samples) / len(samples), 3)
+        }
+        results.append(result)
+        logger.info("校准并发 %d: 错误率 %.1f%%，%.2f 请求/秒", level, result["error_rate"] * 100, throughput)
+        if result["error_rate"] > MAX_ERROR_RATE:
+            break
+        gained = throughput > best_throughput * (1 + MIN_THROUGHPUT_GAIN)
+        if gained:
+            best_level, best_throughput = level, throughput
+        else:
+            break
+    return best_level, results
+
+
+def _calibration_triples(triples):
+    """把实体类型换成临时标签（带 name 索引），语句按类型分组的结构与真实写入相同"""
+    return [CompactTriple(t.head, CALIBRATION_LABEL_PREFIX + t.head_type, t.relation, t.tail,
+                          CALIBRATION_LABEL_PREFIX + t.tail_type, t.head_properties, t.tail_properties)
+            for t in triples]
+
+
+def _calibration_index_name(label):
+    return quote_identifier(f"kg_{label}_name_range")
+
+
+def calibrate_write_batch(db_handler, triples, batch_sizes=DEFAULT_WRITE_BATCH_SIZES):
+    """
+    用校准中抽取到的三元组测量不同批量下每个三元组的写入耗时
+
+    三元组写入临时标签（CALIBRATION_LABEL_PREFIX + 实体类型）下的节点，测量结束后连同临时索引一起删除，
+    未经实体消解的名称不会留在真实图谱中
+
+    Returns:
+        (选择的写入批量或 None, 各批量的测量结果)
+    """
+    if db_handler is None or not triples:
+        return None, []
+    triples = _calibration_triples(triples)
+    labels = sorted({t.head_type for t in triples} | {t.tail_type for t in triples})
+    results = []
+    try:
+        db_handler.execute_cypher([f"CREATE RANGE INDEX {_calibration_index_name(label)} IF NOT EXISTS "
+                                   f"FOR (n:{quote_identifier(label)}) ON (n.name)" for label in labels])
+        for batch_size in batch_sizes:
+            if batch_size > 1 and batch_size > len(triples):
+                break
+            start = time.perf_counter()
+            for offset in range(0, len(triples), batch_size):
+                db_handler.execute_cypher(generate_cypher(triples[offset:offset + batch_size]))
+            elapsed = time.perf_counter() - start
+            results.append({
+                "batch_size": batch_size,
+                "triples": len(triples),
+                "ms_per_triple": round(elapsed * 1000 / len(triples), 3)
+            })
+    finally:
+        db_handler.execute_cypher([query for label in labels for query in (
+            f"MATCH (n:{quote_identifier(label)}) DETACH DELETE n",
+            f"DROP INDEX {_calibration_index_name(label)} IF EXISTS")])
+    fastest = min(result["ms_per_triple"] for result in results)
+    chosen = next(result["batch_size"] for result in results
+                  if result["ms_per_triple"] <= fastest * (1 + WRITE_LATENCY_TOLERANCE))
+    return chosen, results
+
+
+def run_calibration(records, ontology, api_key, model_name, db_handler=None, api_base=None,
+                    sample_chars=DEFAULT_SAMPLE_CHARS, chunk_sizes=DEFAULT_CHUNK_SIZES,
+                    samples_per_size=DEFAULT_SAMPLES_PER_SIZE, objective="throughput", default_chunk_size=2000,
+                    default_write_batch_size=1):
+    """
+    在语料样本上运行一次简短的校准，选择文本块大小、并发数和 Neo4j 写入批量
+
+    Args:
+        records: 文本块记录的列表或迭代器（只读取前 sample_chars 个字符）
+        ontology: YAML 本体定义字符串
+        api_key: LLM API Key
+        model_name: 模型名称
+        db_handler: 可选 Neo4jHandler，指定时测量写入批量（写入临时标签，测量后删除）
+        api_base: 可选接口地址
+        objective: 文本块大小的选择目标，throughput 或 yield
+        default_chunk_size: 样本不足以校准时使用的文本块大小
+        default_write_batch_size: 没有数据库或三元组时使用的写入批量
+
+    Returns:
+        调优配置字典
+    """
+    text = sample_corpus_text(records, sample_chars)
+    chunk_size, chunk_results, triples = calibrate_chunk_size(text, ontology, api_key, model_name, api_base,
+                                                              chunk_sizes, samples_per_size, objective)
+    chunk_size = chunk_size or default_chunk_size
+    sample_chunks = smart_text_segmentation(text, chunk_size, min(500, chunk_size // 2)) if text else []
+    concurrency, concurrency_results = (calibrate_concurrency(sample_chunks, ontology, api_key, model_name, api_base)
+                                        if sample_chunks else (1, []))
+    write_batch_size, write_results = calibrate_write_batch(db_handler, triples)
+    return {
+        "model": model_name,
+        "endpoint": get_registry().resolve(model_name, api_base).base_url,
+        "chunk_size": chunk_size,
+        "min_chunk_size": min(500, chunk_size // 2),
+        "concurrency": concurrency,
+        "write_batch_size": write_batch_size or default_write_batch_size,
+        "objective": objective,
+        "measurements": {
+            "chunk_sizes": chunk_results,
+            "concurrency": concurrency_results,
+            "write_batches": write_results
+        },
+        "calibrated_at": round(time.time(), 3)
+    }
+
+
+def autotune(records, ontology, api_key, model_name, db_handler=None, api_base=None, recalibrate=False,
+             store=None, **calibration_options):
+    """
+    获取调优配置：已有该 模型@接口地址 的配置时直接复用，否则（或 recalibrate=True 时）运行校准并保存
+
+    Returns:
+        (调优配置字典, 是否新运行了校准)
+    """
+    store = store or TuningStore()
+    key = profile_key(model_name, api_base)
+    if not recalibrate:
+        profile = store.get(key)
+        if profile:
+            return profile, False
+    profile = run_calibration(records, ontology, api_key, model_name, db_handler, api_base, **calibration_options)
+    store.save(key, profile)
+    return profile, True
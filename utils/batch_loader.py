@@ -0,0 +1,241 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from utils.doc_loader import load_document, SUPPORTED_FILE_TYPES
+
+
+class DocumentSource:
+    """待解析的文档来源（上传文件、压缩包成员或本地路径），解析时才打开文件"""
+
+    def __init__(self, name, opener):
+        self.name = name
+        self._opener = opener
+
+    def open(self):
+        """返回带 name 属性的可读文件对象，可直接传给 load_document"""
+        file_obj = self._opener()
+        if not hasattr(file_obj, 'name') or file_obj.name != self.name:
+            try:
+                file_obj.name = self.name
+            except AttributeError:
+                pass
+        return file_obj
+
+
+def _file_type(name):
+    return name.split('.')[-1].lower() if '.' in name else ''
+
+
+def _open_zip(archive):
+    return zipfile.ZipFile(archive if isinstance(archive, str) else io.BytesIO(archive))
+
+
+def _read_zip_member(archive, member_name):
+    with _open_zip(archive) as archive_file:
+        return io.BytesIO(archive_file.read(member_name))
+
+
+def _sources_from_zip(archive_name, archive):
+    """
+    列出压缩包中所有受支持格式的文件，成员在解析时才解压，内存中只保留正在解析的成员
+
+    Args:
+        archive_name: 压缩包名称，作为成员文档名称的前缀
+        archive: 本地压缩包路径（不读入内存），或上传压缩包的字节内容
+    """
+    sources = []
+    with _open_zip(archive) as archive_file:
+        for member in archive_file.infolist():
+            if member.is_dir() or _file_type(member.filename) not in SUPPORTED_FILE_TYPES:
+                continue
+            name = f"{archive_name}/{member.filename}"
+            sources.append(DocumentSource(name, lambda m=member.filename: _read_zip_member(archive, m)))
+    return sources
+
+
+def collect_sources(uploaded_files=None, directory=None):
+    """
+    收集批量导入的文档来源
+
+    Args:
+        uploaded_files: 上传文件对象列表（可包含 .zip 压缩包）
+        directory: 本地目录路径，递归收集其中受支持格式的文件
+
+    Returns:
+        (文档来源列表, 错误信息列表)
+    """
+    sources = []
+    errors = []
+
+    for uploaded_file in uploaded_files or []:
+        file_type = _file_type(uploaded_file.name)
+        if file_type == 'zip':
+            try:
+                sources.extend(_sources_from_zip(uploaded_file.name, uploaded_file.getvalue()))
+            except zipfile.BadZipFile as e:
+                errors.append(f"{uploaded_file.name}: 压缩包解析失败: {str(e)}")
+        elif file_type in SUPPORTED_FILE_TYPES:
+            data = uploaded_file.getvalue()
+            sources.append(DocumentSource(uploaded_file.name, lambda b=data: io.BytesIO(b)))
+        else:
+            errors.append(f"{uploaded_file.name}: 不支持的文件格式")
+
+    if directory:
+        if not os.path.isdir(directory):
+            errors.append(f"{directory}: 目录不存在")
+        else:
+            dir_sources, dir_errors = collect_path_sources([directory])
+            sources.extend(dir_sources)
+            errors.extend(dir_errors)
+
+    return sources, errors
+
+
+def _sources_from_file(path, sources, errors, explicit=False):
+    file_type = _file_type(path)
+    if file_type == 'zip':
+        try:
+            sources.extend(_sources_from_zip(path, path))
+        except zipfile.BadZipFile as e:
+            errors.append(f"{path}: 压缩包解析失败: {str(e)}")
+    elif file_type in SUPPORTED_FILE_TYPES:
+        sources.append(DocumentSource(path, lambda p=path: open(p, 'rb')))
+    elif explicit:
+        # 只对显式指定的文件报告格式错误，目录中的其他文件静默跳过
+        errors.append(f"{path}: 不支持的文件格式")
+
+
+def collect_path_sources(paths):
+    """
+    从本地路径收集文档来源：文件、压缩包或目录（递归）
+
+    Args:
+        paths: 本地路径列表
+
+    Returns:
+        (文档来源列表, 错误信息列表)
+    """
+    sources = []
+    errors = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for file_name in sorted(files):
+                    _sources_from_file(os.path.join(root, file_name), sources, errors)
+        elif os.path.isfile(path):
+            _sources_from_file(path, sources, errors, explicit=True)
+        else:
+            errors.append(f"{path}: 文件或目录不存在")
+    return sources, errors
+
+
+def _load_source(source, max_chunk_size, min_chunk_size, dedup):
+    dedup_report = {}
+    file_obj = source.open()
+    try:
+        chunks, err = load_document(file_obj, max_chunk_size, min_chunk_size,
+                                    dedup=dedup, dedup_report=dedup_report)
+    finally:
+        file_obj.close()
+    return chunks, err, dedup_report
+
+
+def load_corpus(sources, max_chunk_size=2000, min_chunk_size=500, dedup=False, max_workers=4):
+    """
+    并发解析多个文档，生成带文档来源信息的全局文本块队列
+
+    Args:
+        sources: DocumentSource 列表
+        max_chunk_size: 最大块大小（字符数）
+        min_chunk_size: 最小块大小（字符数）
+        dedup: 是否对每个文档执行样板内容与重复块去除
+        max_workers: 并发解析的线程数
+
+    Returns:
+        (文本块记录列表, 文档统计列表, 错误信息列表)
+        文本块记录格式: {"chunk_id": "文档序号-块序号", "doc": 文档名, "index": 块序号, "text": 文本}
+    """
+    records = []
+    documents = []
+    errors = []
+    if not sources:
+        return records, documents, errors
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(_load_source, source, max_chunk_size, min_chunk_size, dedup)
+                   for source in sources]
+
+        # 按文档顺序汇总，保证文本块编号稳定
+        for doc_index, (source, future) in enumerate(zip(sources, futures)):
+            try:
+                chunks, err, dedup_report = future.result()
+            except Exception as e:
+                chunks, err, dedup_report = None, f"解析失败: {str(e)}", {}
+            if err:
+                errors.append(f"{source.name}: {err}")
+                continue
+
+            for i, chunk in enumerate(chunks):
+                records.append({
+                    "chunk_id": f"{doc_index}-{i}",
+                    "doc": source.name,
+                    "index": i,
+                    "text": chunk
+                })
+            documents.append({
+                "name": source.name,
+                "chunks_count": len(chunks),
+                "chars": sum(len(chunk) for chunk in chunks),
+                "tokens_saved": dedup_report.get("tokens_saved", 0)
+            })
+
+    return records, documents, errors
+
+
+def iter_corpus_records(sources, max_chunk_size=2000, min_chunk_size=500, errors=None, dedup=False):
+    """
+    惰性产出语料的文本块记录：纯文本类文档按内存映射流式切分，
+    适合无需预先知道总块数的超大语料（如命令行批量构建）
+
+    Args:
+        sources: DocumentSource 列表
+        max_chunk_size: 最大块大小（字符数）
+        min_chunk_size: 最小块大小（字符数）
+        errors: 可选列表，用于收集解析失败的文档信息
+        dedup: 是否去除样板内容与重复文本块（流式文档逐块增量去重）
+
+    Yields:
+        文本块记录，格式同 load_corpus
+    """
+    from utils.stream_loader import iter_document_chunks, STREAMABLE_FILE_TYPES
+    from utils.dedup import ChunkDeduplicator
+
+    for doc_index, source in enumerate(sources):
+        file_type = _file_type(source.name)
+        file_obj = source.open()
+        try:
+            if file_type in STREAMABLE_FILE_TYPES:
+                chunks = iter_document_chunks(file_obj, file_type, max_chunk_size, min_chunk_size)
+                if dedup:
+                    deduplicator = ChunkDeduplicator()
+                    chunks = (chunk for chunk in chunks if not deduplicator.is_duplicate(chunk))
+            else:
+                chunks, err = load_document(file_obj, max_chunk_size, min_chunk_size, dedup=dedup)
+                if err:
+                    if errors is not None:
+                        errors.append(f"{source.name}: {err}")
+                    continue
+            for i, chunk in enumerate(chunks):
+                yield {
+                    "chunk_id": f"{doc_index}-{i}",
+                    "doc": source.name,
+                    "index": i,
+                    "text": chunk
+                }
+        except Exception as e:
+            if errors is not None:
+                errors.append(f"{source.name}: 解析失败: {str(e)}")
+        finally:
+            file_obj.close()
@@ -0,0 +1,115 @@
+import time
+import threading
+
+
+# 取消后等待在途 LLM 请求完成的默认期限（秒），超过后放弃等待
+DEFAULT_CANCEL_TIMEOUT = 5.0
+# 调度循环检查取消和暂停的间隔（秒），取消延迟不超过 cancel_timeout + POLL_INTERVAL
+POLL_INTERVAL = 0.1
+
+# 控制状态
+CONTROL_RUNNING = "running"
+CONTROL_PAUSED = "paused"
+CONTROL_CANCELLED = "cancelled"
+
+
+class BuildControl:
+    """
+    构建的协作式取消与暂停/恢复，由界面、信号处理或任务执行器在其他线程中调用
+
+    - pause(): 停止派发新的文本块，在途请求照常完成并写入；语料迭代位置保留，resume() 后从原位置继续
+    - cancel(): 停止派发新的文本块，最多等待 cancel_timeout 秒让在途请求完成，超时的请求被放弃（结果丢弃）；
+      已抽取的三元组照常写入，构建以部分结果正常结束
+    """
+
+    def __init__(self, cancel_timeout=DEFAULT_CANCEL_TIMEOUT):
+        self.cancel_timeout = cancel_timeout
+        self._changed = threading.Condition()
+        self._state = CONTROL_RUNNING
+        self._paused_at = None
+        self._paused_seconds = 0.0
+        self._cancel_requested_at = None
+        self._stopped_at = None
+        self._abandoned = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def paused(self):
+        return self._state == CONTROL_PAUSED
+
+    @property
+    def cancelled(self):
+        return self._state == CONTROL_CANCELLED
+
+    def _end_pause(self):
+        if self._paused_at is not None:
+            self._paused_seconds += time.monotonic() - self._paused_at
+            self._paused_at = None
+
+    def pause(self):
+        """暂停派发新的文本块，已取消时返回 False"""
+        with self._changed:
+            if self._state != CONTROL_RUNNING:
+                return self._state == CONTROL_PAUSED
+            self._state = CONTROL_PAUSED
+            self._paused_at = time.monotonic()
+            self._changed.notify_all()
+            return True
+
+    def resume(self):
+        """恢复派发，已取消时返回 False"""
+        with self._changed:
+            if self._state != CONTROL_PAUSED:
+                return self._state == CONTROL_RUNNING
+            self._end_pause()
+            self._state = CONTROL_RUNNING
+            self._changed.notify_all()
+            return True
+
+    def cancel(self):
+        """请求取消（可重复调用，暂停中的构建也会被唤醒并结束）"""
+        with self._changed:
+            if self._state == CONTROL_CANCELLED:
+                return
+            self._end_pause()
+            self._state = CONTROL_CANCELLED
+            self._cancel_requested_at = time.monotonic()
+            self._changed.notify_all()
+
+    def cancel_deadline(self):
+        """放弃等待在途请求的时刻（time.monotonic()），未取消时返回 None"""
+        if self._cancel_requested_at is None:
+            return None
+        return self._cancel_requested_at + self.cancel_timeout
+
+    def wait_while_paused(self, timeout=None):
+        """暂停期间阻塞，直到恢复、取消或超时，返回当前状态"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._state != CONTROL_PAUSED, timeout)
+            return self._state
+
+    def mark_stopped(self, abandoned=0):
+        """调度循环结束时调用，记录取消延迟和放弃的在途请求数"""
+        with self._changed:
+            if self._cancel_requested_at is not None and self._stopped_at is None:
+                self._stopped_at = time.monotonic()
+                self._abandoned = abandoned
+
+    def summary(self):
+        """控制状态、取消延迟（从请求取消到调度循环结束）、放弃的在途请求数和累计暂停时长"""
+        with self._changed:
+            paused_seconds = self._paused_seconds
+            if self._paused_at is not None:
+                paused_seconds += time.monotonic() - self._paused_at
+            latency = None
+            if self._stopped_at is not None:
+                latency = round(self._stopped_at - self._cancel_requested_at, 3)
+            return {
+                "state": self._state,
+                "cancel_latency_seconds": latency,
+                "abandoned_requests": self._abandoned,
+                "paused_seconds": round(paused_seconds, 3)
+            }
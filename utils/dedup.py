@@ -0,0 +1,241 @@
+import re
+import zlib
+from collections import Counter
+
+
+_MAX_HASH = (1 << 32) - 1
+
+# 增量去重最多保留的签名数（每个约 2 KB）：超过后淘汰最早保留的块，近重复只在最近这么多个保留块中查找，
+# 流式加载超大文档时内存占用有上限
+DEFAULT_MAX_SIGNATURES = 20000
+
+
+def estimate_tokens(text):
+    """
+    粗略估算文本的 token 数（本地计算，不依赖分词器）
+
+    中日韩字符按 1 个 token 计，其余字符按 4 个字符约 1 个 token 计
+    """
+    if not text:
+        return 0
+    cjk_count = len(re.findall(r'[\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]', text))
+    other_count = len(text) - cjk_count
+    return cjk_count + (other_count + 3) // 4
+
+
+def _normalize_line(line, digit_mask_length=40):
+    """规范化行内容：合并空白；较短的行把数字替换为占位符（页码、日期等会随页变化）"""
+    line = re.sub(r'\s+', ' ', line.strip())
+    if len(line) <= digit_mask_length:
+        line = re.sub(r'\d+', '#', line)
+    return line
+
+
+def remove_repeated_lines(pages, min_page_ratio=0.5, min_pages=3, max_line_length=300):
+    """
+    删除在多页中重复出现的行（页眉、页脚、免责声明等样板内容）
+
+    Args:
+        pages: 每页文本组成的列表
+        min_page_ratio: 某行至少出现在该比例的页面中才视为样板行
+        min_pages: 页数少于该值时不做处理（无法可靠判断重复）
+        max_line_length: 超过该长度的行视为正文，不参与判断
+
+    Returns:
+        (清理后的页面列表, 被删除的文本列表)
+    """
+    if len(pages) < min_pages:
+        return pages, []
+
+    # 统计每个规范化行出现在多少个不同页面中
+    page_counter = Counter()
+    for page in pages:
+        keys = set()
+        for line in page.split('\n'):
+            if line.strip() and len(line) <= max_line_length:
+                keys.add(_normalize_line(line))
+        page_counter.update(keys)
+
+    threshold = max(2, int(len(pages) * min_page_ratio))
+    boilerplate = {key for key, count in page_counter.items() if count >= threshold}
+    if not boilerplate:
+        return pages, []
+
+    cleaned_pages = []
+    removed = []
+    for page in pages:
+        kept_lines = []
+        for line in page.split('\n'):
+            if line.strip() and len(line) <= max_line_length and _normalize_line(line) in boilerplate:
+                removed.append(line)
+            else:
+                kept_lines.append(line)
+        cleaned_pages.append('\n'.join(kept_lines))
+
+    return cleaned_pages, removed
+
+
+def _shingles(text, k=5):
+    """生成字符级 k-gram 的哈希集合（对中文同样适用）"""
+    text = re.sub(r'\s+', ' ', text.strip().lower())
+    if len(text) <= k:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + k].encode('utf-8')) for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    """
+    单置换 MinHash (one permutation hashing) 签名计算器
+
+    每个 shingle 只哈希一次并按哈希值分配到 num_perm 个桶中，每个桶取最小值，
+    相比 num_perm 次独立置换大幅降低纯 Python 下的计算量
+    """
+
+    def __init__(self, num_perm=32):
+        self.num_perm = num_perm
+
+    def signature(self, shingles):
+        """计算一个 shingle 哈希集合的 MinHash 签名"""
+        num_perm = self.num_perm
+        mins = [_MAX_HASH] * num_perm
+        for h in shingles:
+            # 混合哈希位，避免 crc32 低位分布不均
+            h = (h * 0x9E3779B1) & _MAX_HASH
+            slot = h % num_perm
+            if h < mins[slot]:
+                mins[slot] = h
+        return tuple(mins)
+
+    @staticmethod
+    def similarity(sig1, sig2):
+        """用签名估计 Jaccard 相似度（两侧都为空的桶不计入）"""
+        same = 0
+        total = 0
+        for x, y in zip(sig1, sig2):
+            if x == _MAX_HASH and y == _MAX_HASH:
+                continue
+            total += 1
+            if x == y:
+                same += 1
+        return same / total if total else 1.0
+
+
+class LSHIndex:
+    """MinHash 签名的分带 (banding) 局部敏感哈希索引，用于亚二次复杂度地查找候选近重复项"""
+
+    def __init__(self, num_perm=32, bands=8):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets = [{} for _ in range(bands)]
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows]
+
+    def query(self, signature):
+        """返回与签名落在同一桶中的候选键集合"""
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self.buckets[band].get(key, ()))
+        return candidates
+
+    def insert(self, item_key, signature):
+        for band, key in self._band_keys(signature):
+            self.buckets[band].setdefault(key, []).append(item_key)
+
+    def remove(self, item_key, signature):
+        for band, key in self._band_keys(signature):
+            bucket = self.buckets[band].get(key)
+            if bucket is None:
+                continue
+            bucket.remove(item_key)
+            if not bucket:
+                del self.buckets[band][key]
+
+
+class ChunkDeduplicator:
+    """
+    增量式文本块去重器：逐块判断是否为完全重复或近重复（MinHash + LSH），
+    只保存已保留块的签名，可用于流式加载的文本块；签名数超过 max_signatures 时按先进先出淘汰，
+    与很久之前的块重复的文本不再被识别（max_signatures 为 None 时不限制）
+    """
+
+    def __init__(self, threshold=0.85, num_perm=32, bands=8, shingle_size=5, max_signatures=DEFAULT_MAX_SIGNATURES):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_signatures = max_signatures
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.index = LSHIndex(num_perm=num_perm, bands=bands)
+        # 键 -> (签名, 完全重复键)，按保留顺序排列，最早的在前
+        self.signatures = {}
+        self.seen_exact = set()
+        self._next_key = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.evicted = 0
+
+    def is_duplicate(self, chunk):
+        """判断文本块是否与之前保留的块重复；不重复时将其加入索引"""
+        # 1. 完全重复（忽略空白差异）
+        exact_key = zlib.crc32(re.sub(r'\s+', ' ', chunk.strip()).encode('utf-8')), len(chunk)
+        if exact_key in self.seen_exact:
+            self.exact_duplicates += 1
+            return True
+
+        # 2. 近重复：先用 LSH 取候选，再用签名估计相似度确认
+        signature = self.hasher.signature(_shingles(chunk, self.shingle_size))
+        for candidate in self.index.query(signature):
+            if MinHasher.similarity(signature, self.signatures[candidate][0]) >= self.threshold:
+                self.near_duplicates += 1
+                return True
+
+        key = self._next_key
+        self._next_key += 1
+        self.seen_exact.add(exact_key)
+        self.index.insert(key, signature)
+        self.signatures[key] = (signature, exact_key)
+        if self.max_signatures is not None and len(self.signatures) > self.max_signatures:
+            self._evict_oldest()
+        return False
+
+    def _evict_oldest(self):
+        oldest = next(iter(self.signatures))
+        signature, exact_key = self.signatures.pop(oldest)
+        self.seen_exact.discard(exact_key)
+        self.index.remove(oldest, signature)
+        self.evicted += 1
+
+
+def deduplicate_chunks(chunks, threshold=0.85, num_perm=32, bands=8, shingle_size=5):
+    """
+    去除完全重复与近重复的文本块（MinHash + LSH，本地 CPU 计算）
+
+    Args:
+        chunks: 文本块列表
+        threshold: 估计 Jaccard 相似度达到该值即视为近重复
+        num_perm: MinHash 置换数量
+        bands: LSH 分带数量
+        shingle_size: 字符 shingle 长度
+
+    Returns:
+        (保留的文本块列表, 被删除的文本块列表, 统计信息字典)
+    """
+    deduplicator = ChunkDeduplicator(threshold, num_perm, bands, shingle_size)
+    kept = []
+    dropped = []
+    for chunk in chunks:
+        if deduplicator.is_duplicate(chunk):
+            dropped.append(chunk)
+        else:
+            kept.append(chunk)
+
+    stats = {
+        "chunks_before": len(chunks),
+        "chunks_after": len(kept),
+        "exact_duplicates": deduplicator.exact_duplicates,
+        "near_duplicates": deduplicator.near_duplicates,
+    }
+    return kept, dropped, stats
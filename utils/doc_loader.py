@@ -1,11 +1,14 @@
-import pandas as pd
-from pypdf import PdfReader
-from docx import Document
 import io
 import re
 import math
+from utils.dedup import remove_repeated_lines, deduplicate_chunks, estimate_tokens
+from utils.tracing import traced
 
+# 支持解析的文件格式（纯文本类格式通过内存映射流式解析，见 utils/stream_loader.py）
+SUPPORTED_FILE_TYPES = ['pdf', 'docx', 'xlsx', 'txt', 'md', 'csv', 'jsonl']
 
+
+@traced("smart_text_segmentation")
 def smart_text_segmentation(text, max_chunk_size=2000, min_chunk_size=500):
     """
     智能文本切分：保持语义完整性，控制处理时间
@@ -117,23 +120,24 @@ def clean_special_characters(text):
     return cleaned.strip()
 
 
-def load_document(uploaded_file, max_chunk_size=2000, min_chunk_size=500):
+def extract_pages(uploaded_file):
     """
-    根据文件类型加载内容，返回智能切分的文本块列表
-    
+    根据文件类型提取原始文本，按页（PDF）、段落集合（Word）或工作表行（Excel）返回
+
     Args:
         uploaded_file: 上传的文件对象
-        max_chunk_size: 最大块大小（字符数）
-        min_chunk_size: 最小块大小（字符数）
-    
+
     Returns:
-        (文本块列表, 错误信息)
+        (页面文本列表, 错误信息)
     """
     file_type = uploaded_file.name.split('.')[-1].lower()
-    text_content = ""
+    pages = []
+
+    # pandas / pypdf / python-docx 导入较慢，只在解析对应格式时加载
 
     try:
         if file_type in ['xlsx', 'xls']:
+            import pandas as pd
             df = pd.read_excel(uploaded_file)
             # 按行处理，保持行间语义关系
             text_list = []
@@ -141,20 +145,24 @@ def load_document(uploaded_file, max_chunk_size=2000, min_chunk_size=500):
                 row_text = " ".join([str(cell) for cell in row if pd.notna(cell)])
                 if row_text.strip():
                     text_list.append(row_text)
-            text_content = "\n".join(text_list)
+            pages.append("\n".join(text_list))
 
         elif file_type == 'pdf':
+            from pypdf import PdfReader
             reader = PdfReader(uploaded_file)
             for page in reader.pages:
                 page_text = page.extract_text()
                 if page_text.strip():
-                    text_content += page_text + "\n"
+                    pages.append(page_text)
 
         elif file_type in ['docx', 'doc']:
+            from docx import Document
             doc = Document(uploaded_file)
+            text_content = ""
             for para in doc.paragraphs:
                 if para.text.strip():
                     text_content += para.text + "\n"
+            pages.append(text_content)
 
         else:
             return None, "不支持的文件格式"
@@ -162,10 +170,88 @@ def load_document(uploaded_file, max_chunk_size=2000, min_chunk_size=500):
     except Exception as e:
         return None, f"解析失败: {str(e)}"
 
+    return pages, None
+
+
+@traced("load_document")
+def load_document(uploaded_file, max_chunk_size=2000, min_chunk_size=500, dedup=False, dedup_report=None):
+    """
+    根据文件类型加载内容，返回智能切分的文本块列表
+
+    Args:
+        uploaded_file: 上传的文件对象
+        max_chunk_size: 最大块大小（字符数）
+        min_chunk_size: 最小块大小（字符数）
+        dedup: 是否去除跨页重复的样板行以及重复/近重复文本块
+        dedup_report: 可选字典，开启去重时写入去重统计（含节省的 token 数）
+
+    Returns:
+        (文本块列表, 错误信息)
+    """
+    file_type = uploaded_file.name.split('.')[-1].lower()
+    if file_type in ['txt', 'md', 'csv', 'jsonl']:
+        return _load_text_document(uploaded_file, file_type, max_chunk_size, min_chunk_size,
+                                   dedup, dedup_report)
+
+    pages, err = extract_pages(uploaded_file)
+    if err:
+        return None, err
+
+    removed_lines = []
+    if dedup:
+        pages, removed_lines = remove_repeated_lines(pages)
+
     # 清理特殊符号并智能切分
-    cleaned_text = clean_special_characters(text_content)
+    cleaned_text = clean_special_characters("\n".join(pages))
     if not cleaned_text:
         return None, "文档内容为空或无法解析"
-    
+
     chunks = smart_text_segmentation(cleaned_text, max_chunk_size, min_chunk_size)
-    return chunks, None
\ No newline at end of file
+
+    if dedup:
+        chunks, dropped_chunks, stats = deduplicate_chunks(chunks)
+        tokens_after = sum(estimate_tokens(chunk) for chunk in chunks)
+        tokens_saved = (sum(estimate_tokens(line) for line in removed_lines)
+                        + sum(estimate_tokens(chunk) for chunk in dropped_chunks))
+        tokens_before = tokens_after + tokens_saved
+        stats.update({
+            "boilerplate_lines_removed": len(removed_lines),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_saved,
+            "saved_ratio": round(tokens_saved / tokens_before, 4) if tokens_before else 0,
+        })
+        if dedup_report is not None:
+            dedup_report.update(stats)
+
+    return chunks, None
+
+
+def _load_text_document(uploaded_file, file_type, max_chunk_size, min_chunk_size, dedup, dedup_report):
+    """纯文本类文档：流式扫描记录边界并逐块切分，不整体读入和清洗全文"""
+    from utils.stream_loader import iter_document_chunks
+
+    try:
+        chunks = list(iter_document_chunks(uploaded_file, file_type, max_chunk_size, min_chunk_size))
+    except Exception as e:
+        return None, f"解析失败: {str(e)}"
+
+    if not chunks:
+        return None, "文档内容为空或无法解析"
+
+    if dedup:
+        chunks, dropped_chunks, stats = deduplicate_chunks(chunks)
+        tokens_after = sum(estimate_tokens(chunk) for chunk in chunks)
+        tokens_saved = sum(estimate_tokens(chunk) for chunk in dropped_chunks)
+        tokens_before = tokens_after + tokens_saved
+        stats.update({
+            "boilerplate_lines_removed": 0,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_saved,
+            "saved_ratio": round(tokens_saved / tokens_before, 4) if tokens_before else 0,
+        })
+        if dedup_report is not None:
+            dedup_report.update(stats)
+
+    return chunks, None
@@ -0,0 +1,364 @@
+import os
+import re
+import zlib
+import sqlite3
+import threading
+import unicodedata
+from utils.dedup import MinHasher, _MAX_HASH
+from utils.ontology import compile_ontology
+
+
+# 持久化别名表的默认位置
+DEFAULT_ALIAS_DB = os.path.join(".kgbuilder", "aliases.db")
+
+# 规范化时去掉的中文组织形式后缀（按长度从长到短匹配，可重复剥离，如 "集团股份有限公司"）
+LEGAL_SUFFIXES = ("股份有限公司", "有限责任公司", "有限公司", "集团公司", "集团", "股份公司", "公司")
+
+# 英文组织形式后缀只在词边界处剥离（避免 "Tesco" 被截成 "Tes"）
+_LATIN_SUFFIX_PATTERN = re.compile(
+    r'(?:[\s,.]*\b(?:co|corp|corporation|inc|incorporated|ltd|limited|llc|plc|gmbh|company|group)\b\.?)+\s*$')
+_PUNCT_PATTERN = re.compile(r'[\s\-_·・.,，。、&＆\'"“”‘’()（）\[\]【】/]+')
+_DISTINGUISHING_PATTERN = re.compile(r'[a-z]+|\d+')
+
+
+def normalize_name(name):
+    """
+    生成实体名称的规范化键：NFKC（全角转半角）、小写、去掉空白和标点、剥离组织形式后缀
+
+    规范化键相同的名称在同一实体类型下视为同一实体，如 "科技公司A"、"科技公司A有限公司"、"科技公司 a"
+    """
+    key = unicodedata.normalize("NFKC", str(name or "")).lower().strip()
+    # 只剩后缀本身时保留（如实体名就是 "集团" 或 "Group"）
+    key = _LATIN_SUFFIX_PATTERN.sub("", key) or key
+    key = _PUNCT_PATTERN.sub("", key)
+    while key.endswith(LEGAL_SUFFIXES):
+        suffix = next(suffix for suffix in LEGAL_SUFFIXES if key.endswith(suffix))
+        if len(key) == len(suffix):
+            break
+        key = key[:-len(suffix)]
+    return key
+
+
+def _name_ngrams(key, n=2):
+    """规范化键的字符 n-gram 集合"""
+    if len(key) <= n:
+        return {key}
+    return {key[i:i + n] for i in range(len(key) - n + 1)}
+
+
+def _jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _distinguishing_tokens(key):
+    """拉丁字母串和数字串（如 "A"、"3号"）往往区分不同实体，n-gram 相似时也必须完全一致"""
+    return _DISTINGUISHING_PATTERN.findall(key)
+
+
+class AliasStore:
+    """
+    SQLite 持久化别名表：保存每个实体类型下 规范化键 → 规范名称 的映射和 LSH 分带键，
+    后续构建先查询别名表，使不同批次中的同一实体合并到同一节点
+
+    可以手工写入跨语言或缩写别名（如 "Tech Co. A" → "科技公司A"），见 add_alias
+    """
+
+    def __init__(self, db_path=DEFAULT_ALIAS_DB):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS aliases (
+                    entity_type TEXT NOT NULL,
+                    norm_key TEXT NOT NULL,
+                    canonical TEXT NOT NULL,
+                    PRIMARY KEY (entity_type, norm_key)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS blocks (
+                    entity_type TEXT NOT NULL,
+                    band_key INTEGER NOT NULL,
+                    norm_key TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blocks ON blocks (entity_type, band_key)")
+
+    def close(self):
+        self._conn.close()
+
+    def lookup(self, entity_type, norm_key):
+        """按规范化键查找规范名称，未找到时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT canonical FROM aliases WHERE entity_type = ? AND norm_key = ?",
+                                     (entity_type, norm_key)).fetchone()
+        return row[0] if row else None
+
+    def candidates(self, entity_type, band_keys, limit=1000):
+        """返回与任一分带键相同的规范化键集合"""
+        if not band_keys:
+            return set()
+        placeholders = ",".join("?" * len(band_keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT norm_key FROM blocks WHERE entity_type = ? AND band_key IN ({placeholders}) "
+                f"LIMIT ?", (entity_type, *band_keys, limit)).fetchall()
+        return {row[0] for row in rows}
+
+    def add_alias(self, entity_type, alias, canonical):
+        """手工登记别名：alias 的规范化键映射到 canonical（已存在时覆盖）"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO aliases (entity_type, norm_key, canonical) VALUES (?, ?, ?)",
+                               (entity_type or "", normalize_name(alias), canonical))
+
+    def write(self, aliases, blocks):
+        """
+        批量写入新的别名和分带键（已存在的别名不覆盖）
+
+        Args:
+            aliases: [(entity_type, norm_key, canonical)]
+            blocks: [(entity_type, band_key, norm_key)]
+        """
+        if not aliases and not blocks:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO aliases (entity_type, norm_key, canonical) VALUES (?, ?, ?)",
+                                   aliases)
+            self._conn.executemany("INSERT INTO blocks (entity_type, band_key, norm_key) VALUES (?, ?, ?)", blocks)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM aliases").fetchone()[0]
+
+
+class EntityResolver:
+    """
+    写入前的实体消解：按实体类型把名称归并到规范名称
+
+    1. 规范化键完全相同（NFKC、大小写、标点、组织形式后缀）直接归并
+    2. 否则用规范化键的字符 n-gram MinHash 分带（LSH）取候选，只比较同一桶中的名称，
+       n-gram Jaccard 相似度达到阈值且字母/数字串一致时归并
+    3. 内存索引未命中时查询持久化别名表，新出现的规范名称和别名在 flush() 时批量写回
+
+    候选比较只发生在 LSH 桶内，且每个桶的容量有上限（高频分带值区分度低），
+    百万级名称下总体复杂度接近线性
+    """
+
+    def __init__(self, alias_store=None, threshold=0.8, num_perm=12, bands=3, ngram=2, max_bucket_size=64,
+                 flush_every=5000):
+        """
+        Args:
+            alias_store: 可选 AliasStore，跨构建持久化别名
+            threshold: n-gram Jaccard 相似度达到该值时归并
+            num_perm: MinHash 桶数（实体名较短，少量桶即可）
+            bands: LSH 分带数（每带 4 个桶时候选数量与召回率较均衡）
+            ngram: 字符 n-gram 长度
+            max_bucket_size: 每个 LSH 桶最多保存的名称数
+            flush_every: 累计多少条新记录后自动写入别名表
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.alias_store = alias_store
+        self.threshold = threshold
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_bucket_size = max_bucket_size
+        self.flush_every = flush_every
+        self.hasher = MinHasher(num_perm=num_perm)
+        # 内存索引: "类型\x1f规范化键" -> 规范名称；分带键 -> 规范化键（或规范化键列表）
+        self._keys = {}
+        self._buckets = {}
+        self._pending_aliases = []
+        self._pending_blocks = []
+        self._lock = threading.Lock()
+        self._stats = {"names": 0, "exact_merges": 0, "fuzzy_merges": 0, "store_hits": 0, "canonical": 0,
+                       "comparisons": 0}
+
+    def _band_keys(self, entity_type, key):
+        """规范化键的 LSH 分带键（稳定哈希，可持久化）；全部为空桶的分带不参与分桶"""
+        signature = self.hasher.signature(zlib.crc32(gram.encode('utf-8'))
+                                          for gram in _name_ngrams(key, self.ngram))
+        band_keys = []
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            if all(value == _MAX_HASH for value in values):
+                continue
+            band_keys.append(zlib.crc32(f"{entity_type}|{band}|{values}".encode('utf-8')))
+        return band_keys
+
+    def _match(self, key, candidates):
+        """在候选规范化键中找到与 key 最相似且通过校验的一个"""
+        grams = _name_ngrams(key, self.ngram)
+        tokens = None
+        best = None
+        best_score = self.threshold
+        for candidate_key in candidates:
+            self._stats["comparisons"] += 1
+            score = _jaccard(grams, _name_ngrams(candidate_key, self.ngram))
+            if score < best_score:
+                continue
+            if tokens is None:
+                tokens = _distinguishing_tokens(key)
+            if _distinguishing_tokens(candidate_key) == tokens:
+                best, best_score = candidate_key, score
+        return best
+
+    def _remember(self, entity_type, key, canonical, band_keys=()):
+        """登记规范化键（band_keys 非空时同时加入分桶），并记录待写入别名表的内容"""
+        self._keys[f"{entity_type}\x1f{key}"] = canonical
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                self._buckets[band_key] = key
+            elif isinstance(bucket, list):
+                if len(bucket) < self.max_bucket_size:
+                    bucket.append(key)
+            else:
+                self._buckets[band_key] = [bucket, key]
+        if self.alias_store is not None:
+            self._pending_aliases.append((entity_type, key, canonical))
+            self._pending_blocks.extend((entity_type, band_key, key) for band_key in band_keys)
+            if len(self._pending_aliases) >= self.flush_every:
+                self._flush_locked()
+
+    def _canonical_for_key(self, entity_type, key):
+        canonical = self._keys.get(f"{entity_type}\x1f{key}")
+        if canonical is None and self.alias_store is not None:
+            canonical = self.alias_store.lookup(entity_type, key)
+        return canonical
+
+    def resolve(self, name, entity_type=None):
+        """
+        返回名称在该实体类型下的规范名称（首次出现的名称成为规范名称）
+
+        Args:
+            name: 实体名称
+            entity_type: 实体类型，不同类型之间不归并
+        """
+        entity_type = entity_type or ""
+        key = normalize_name(name)
+        if not key:
+            return name
+        with self._lock:
+            self._stats["names"] += 1
+            canonical = self._keys.get(f"{entity_type}\x1f{key}")
+            if canonical is not None:
+                if canonical != name:
+                    self._stats["exact_merges"] += 1
+                return canonical
+
+            if self.alias_store is not None:
+                canonical = self.alias_store.lookup(entity_type, key)
+                if canonical is not None:
+                    self._stats["store_hits"] += 1
+                    self._keys[f"{entity_type}\x1f{key}"] = canonical
+                    return canonical
+
+            band_keys = self._band_keys(entity_type, key)
+            candidates = set()
+            for band_key in band_keys:
+                bucket = self._buckets.get(band_key)
+                if bucket is None:
+                    continue
+                if isinstance(bucket, list):
+                    candidates.update(bucket)
+                else:
+                    candidates.add(bucket)
+            if self.alias_store is not None:
+                candidates.update(self.alias_store.candidates(entity_type, band_keys))
+
+            match_key = self._match(key, candidates) if candidates else None
+            canonical = self._canonical_for_key(entity_type, match_key) if match_key is not None else None
+            if canonical is not None:
+                # 近似匹配的名称只登记规范化键，不加入分桶，避免桶随变体数量增长
+                self._stats["fuzzy_merges"] += 1
+                self._remember(entity_type, key, canonical)
+            else:
+                canonical = name
+                self._stats["canonical"] += 1
+                self._remember(entity_type, key, canonical, band_keys)
+            return canonical
+
+    def resolve_triples(self, triples):
+        """
+        把三元组的头尾实体名称替换为规范名称（原地修改三元组；属性字典可能被共享，name 属性通过替换字典更新）
+
+        Returns:
+            传入的三元组列表
+        """
+        for triple in triples:
+            head = self.resolve(triple.head, triple.head_type)
+            if head != triple.head:
+                triple.head = head
+                if isinstance(triple.head_properties, dict) and "name" in triple.head_properties:
+                    triple.head_properties = dict(triple.head_properties, name=head)
+            tail = self.resolve(triple.tail, triple.tail_type)
+            if tail != triple.tail:
+                triple.tail = tail
+                if isinstance(triple.tail_properties, dict) and "name" in triple.tail_properties:
+                    triple.tail_properties = dict(triple.tail_properties, name=tail)
+        return triples
+
+    def seed_known_entities(self, compiled):
+        """把 YAML known_entities 中声明的名称及别名登记为同一实体"""
+        with self._lock:
+            for entity in compiled.known_entities:
+                name = entity["name"]
+                entity_type = entity.get("type") or ""
+                key = normalize_name(name)
+                if f"{entity_type}\x1f{key}" not in self._keys:
+                    self._remember(entity_type, key, name, self._band_keys(entity_type, key))
+                for alias in entity.get("aliases") or []:
+                    alias_key = normalize_name(alias)
+                    if alias_key and f"{entity_type}\x1f{alias_key}" not in self._keys:
+                        self._remember(entity_type, alias_key, name)
+
+    def _flush_locked(self):
+        self.alias_store.write(self._pending_aliases, self._pending_blocks)
+        self._pending_aliases = []
+        self._pending_blocks = []
+
+    def flush(self):
+        """把新登记的规范名称和别名写入别名表"""
+        with self._lock:
+            if self.alias_store is not None:
+                self._flush_locked()
+
+    def close(self):
+        """写入未保存的记录并关闭别名表"""
+        self.flush()
+        if self.alias_store is not None:
+            self.alias_store.close()
+
+    def summary(self):
+        """统计：处理的名称数、精确/近似/别名表归并数、新规范名称数和候选比较次数"""
+        with self._lock:
+            stats = dict(self._stats)
+        merged = stats["exact_merges"] + stats["fuzzy_merges"] + stats["store_hits"]
+        stats["merge_rate"] = round(merged / stats["names"], 4) if stats["names"] else 0
+        return stats
+
+
+def build_resolver(ontology, alias_db=DEFAULT_ALIAS_DB, **options):
+    """
+    创建实体消解器：使用持久化别名表，并登记 YAML known_entities 中声明的别名
+
+    Args:
+        ontology: YAML 本体定义字符串
+        alias_db: 别名表路径，为 None 时只在本次构建内归并
+        options: 传给 EntityResolver 的其他参数
+
+    Returns:
+        EntityResolver
+    """
+    resolver = EntityResolver(alias_store=AliasStore(alias_db) if alias_db else None, **options)
+    resolver.seed_known_entities(compile_ontology(ontology))
+    return resolver
@@ -0,0 +1,303 @@
+import threading
+from collections import deque
+from utils.dedup import estimate_tokens
+from utils.ontology import compile_ontology
+
+
+# 跳过策略
+SKIP_NEVER = "never"                # 从不跳过，只在提示词中附加提示
+SKIP_NO_MATCH = "no_match"          # 既没有已知实体也没有触发关键词时跳过
+SKIP_NO_ENTITIES = "no_entities"    # 没有已知实体时跳过（只补充已有图谱时使用）
+SKIP_POLICIES = (SKIP_NEVER, SKIP_NO_MATCH, SKIP_NO_ENTITIES)
+
+# 词条类别
+KIND_ENTITY = "entity"
+KIND_KEYWORD = "keyword"
+
+# 提示中最多列出的已知实体数量
+DEFAULT_MAX_HINTS = 30
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式匹配自动机：构建后对任意数量的词条只需扫描文本一遍
+
+    节点以列表下标表示，每个节点保存转移字典、失配指针、以该节点结尾的词条，
+    以及编译时合并了失配链的全部输出（添加词条后可以重新编译）
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self._matches = [[]]
+        self._compiled = True
+
+    def add(self, pattern, payload):
+        """添加词条，payload 在匹配时原样返回；同一词条可以对应多个 payload"""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._matches.append([])
+            node = next_node
+        self._outputs[node].append((len(pattern), payload))
+        self._compiled = False
+
+    def compile(self):
+        """按广度优先计算失配指针，并把失配链上的输出合并到每个节点"""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+            self._matches[node] = self._outputs[node]
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._matches[child] = self._outputs[child] + self._matches[self._fail[child]]
+                queue.append(child)
+        self._compiled = True
+
+    @property
+    def compiled(self):
+        return self._compiled
+
+    def __len__(self):
+        return len(self._goto) - 1
+
+    def iter_matches(self, text):
+        """
+        扫描文本，按结束位置产出 (start, end, payload)
+
+        扫描时间与文本长度和匹配数量成线性关系，与词条数量无关
+        """
+        if not self._compiled:
+            self.compile()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._matches
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node]:
+                end = index + 1
+                for length, payload in outputs[node]:
+                    yield end - length, end, payload
+
+
+class Gazetteer:
+    """
+    已知实体索引：把图谱中已有的实体名称、YAML 中声明的实体别名和本体触发关键词编译为一个自动机，
+    在本地扫描文本块，标注候选实体，并按策略跳过不可能抽取出三元组的文本块
+
+    YAML 中可以在 known_entities 下声明已知实体及其别名:
+
+        known_entities:
+          - name: "华为技术有限公司"
+            type: "公司"
+            aliases: ["华为", "Huawei"]
+    """
+
+    def __init__(self, skip_policy=SKIP_NEVER, hints=True, max_hints=DEFAULT_MAX_HINTS, ignore_case=True):
+        """
+        Args:
+            skip_policy: 跳过策略，见 SKIP_POLICIES
+            hints: 是否把命中的已知实体作为提示附加到提示词中
+            max_hints: 提示中最多列出的实体数量
+            ignore_case: 是否忽略大小写（对英文名称有效）
+        """
+        if skip_policy not in SKIP_POLICIES:
+            raise ValueError(f"未知的跳过策略: {skip_policy}，可选: {', '.join(SKIP_POLICIES)}")
+        self.skip_policy = skip_policy
+        self.hints = hints
+        self.max_hints = max_hints
+        self.ignore_case = ignore_case
+        self._automaton = AhoCorasick()
+        self._surfaces = set()
+        self._entity_count = 0
+        self._keyword_count = 0
+        self._lock = threading.Lock()
+        self._stats = {"chunks": 0, "skipped_chunks": 0, "skipped_tokens": 0, "chunks_with_entities": 0,
+                       "mentions": 0}
+
+    def _normalize(self, text):
+        if not self.ignore_case:
+            return text
+        lowered = text.lower()
+        # 极少数字符小写后长度会变化，此时按原文匹配以保证位置对应
+        return lowered if len(lowered) == len(text) else text
+
+    def add_entity(self, surface, entity_type=None, canonical=None):
+        """添加已知实体名称或别名（canonical 为规范名称，默认与 surface 相同）"""
+        surface = str(surface or "").strip()
+        if not surface:
+            return
+        key = (KIND_ENTITY, self._normalize(surface), entity_type, canonical or surface)
+        if key in self._surfaces:
+            return
+        self._surfaces.add(key)
+        self._automaton.add(key[1], (KIND_ENTITY, canonical or surface, entity_type))
+        self._entity_count += 1
+
+    def add_keyword(self, keyword, label):
+        """添加本体触发关键词，label 为关键词所属的实体类型或关系"""
+        keyword = str(keyword or "").strip()
+        if not keyword:
+            return
+        key = (KIND_KEYWORD, self._normalize(keyword), label)
+        if key in self._surfaces:
+            return
+        self._surfaces.add(key)
+        self._automaton.add(key[1], (KIND_KEYWORD, label, None))
+        self._keyword_count += 1
+
+    def add_ontology(self, ontology):
+        """添加 YAML 本体中的触发关键词和 known_entities 中声明的已知实体及别名"""
+        compiled = compile_ontology(ontology)
+        for entity_type, keywords in compiled.entity_keywords.items():
+            for keyword in keywords:
+                self.add_keyword(keyword, entity_type)
+        for relation, keywords in compiled.relation_keywords.items():
+            for keyword in keywords:
+                self.add_keyword(keyword, relation)
+        for entity in compiled.known_entities:
+            name = entity.get("name")
+            self.add_entity(name, entity.get("type"))
+            for alias in entity.get("aliases") or []:
+                self.add_entity(alias, entity.get("type"), canonical=name)
+
+    def add_graph_names(self, db_handler, batch_size=10000):
+        """
+        添加图谱中已有节点的 name 属性
+
+        Returns:
+            添加的名称数量
+        """
+        count = 0
+        for name, labels in db_handler.iter_entity_names(batch_size=batch_size):
+            self.add_entity(name, labels[0] if labels else None)
+            count += 1
+        return count
+
+    @property
+    def size(self):
+        return {"entities": self._entity_count, "keywords": self._keyword_count}
+
+    def scan(self, text):
+        """
+        扫描文本块
+
+        Returns:
+            {"entities": [{"text", "name", "type", "start", "end"}], "keywords": [命中的类型/关系]}，
+            重叠的实体只保留从最左位置开始的最长匹配
+        """
+        # 多个抽取线程共享同一个索引，添加词条后的首次扫描在锁内编译
+        if not self._automaton.compiled:
+            with self._lock:
+                if not self._automaton.compiled:
+                    self._automaton.compile()
+        normalized = self._normalize(text)
+        candidates = []
+        keywords = set()
+        for start, end, (kind, label, entity_type) in self._automaton.iter_matches(normalized):
+            if kind == KIND_KEYWORD:
+                keywords.add(label)
+            else:
+                candidates.append((start, end, label, entity_type))
+
+        entities = []
+        covered_until = 0
+        for start, end, name, entity_type in sorted(candidates, key=lambda c: (c[0], -(c[1] - c[0]))):
+            if start < covered_until:
+                continue
+            covered_until = end
+            entities.append({"text": text[start:end], "name": name, "type": entity_type, "start": start, "end": end})
+        return {"entities": entities, "keywords": sorted(keywords)}
+
+    def should_skip(self, annotation):
+        """按跳过策略判断文本块是否可以不调用 LLM"""
+        if self.skip_policy == SKIP_NO_MATCH:
+            return not annotation["entities"] and not annotation["keywords"]
+        if self.skip_policy == SKIP_NO_ENTITIES:
+            return not annotation["entities"]
+        return False
+
+    def format_hints(self, annotation):
+        """把命中的已知实体格式化为提示文本，没有命中时返回 None"""
+        if not self.hints or not annotation["entities"]:
+            return None
+        lines = []
+        seen = set()
+        for entity in annotation["entities"]:
+            key = (entity["text"], entity["name"], entity["type"])
+            if key in seen:
+                continue
+            seen.add(key)
+            line = f"- {entity['text']}"
+            if entity["name"] != entity["text"]:
+                line += f"（规范名称: {entity['name']}）"
+            if entity["type"]:
+                line += f"，类型: {entity['type']}"
+            lines.append(line)
+            if len(lines) >= self.max_hints:
+                break
+        return "\n".join(lines)
+
+    def annotate(self, text):
+        """
+        扫描文本块并记录统计
+
+        Returns:
+            (是否跳过, 提示文本或 None)
+        """
+        annotation = self.scan(text)
+        skip = self.should_skip(annotation)
+        with self._lock:
+            self._stats["chunks"] += 1
+            self._stats["mentions"] += len(annotation["entities"])
+            self._stats["chunks_with_entities"] += int(bool(annotation["entities"]))
+            if skip:
+                self._stats["skipped_chunks"] += 1
+                self._stats["skipped_tokens"] += estimate_tokens(text)
+        return skip, (None if skip else self.format_hints(annotation))
+
+    def summary(self):
+        """统计：扫描和跳过的文本块数、跳过的文本 token 数和命中的已知实体数"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.size)
+        stats["skip_policy"] = self.skip_policy
+        stats["skip_rate"] = round(stats["skipped_chunks"] / stats["chunks"], 4) if stats["chunks"] else 0
+        return stats
+
+
+def build_gazetteer(ontology, db_handler=None, skip_policy=SKIP_NEVER, hints=True):
+    """
+    根据本体（和可选的图数据库中已有的实体）构建已知实体索引
+
+    Args:
+        ontology: YAML 本体定义字符串
+        db_handler: 可选 Neo4jHandler，指定时加载图谱中已有节点的名称
+        skip_policy: 跳过策略
+        hints: 是否在提示词中附加已知实体提示
+
+    Returns:
+        Gazetteer
+    """
+    gazetteer = Gazetteer(skip_policy=skip_policy, hints=hints)
+    gazetteer.add_ontology(ontology)
+    if db_handler is not None:
+        gazetteer.add_graph_names(db_handler)
+    return gazetteer
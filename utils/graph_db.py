@@ -1,8 +1,19 @@
-from neo4j import GraphDatabase
+from utils.tracing import tracer
+from utils.logging_utils import get_logger, log_payload
+
+
+logger = get_logger("graph_db")
+
+
+def quote_identifier(name):
+    """用反引号转义标签、关系类型或属性名（它们不能作为查询参数传入）"""
+    return "`" + str(name).replace("`", "``") + "`"
 
 
 class Neo4jHandler:
     def __init__(self, uri, user, password):
+        # neo4j 驱动只在真正连接数据库时导入，界面启动和试运行不需要加载
+        from neo4j import GraphDatabase
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
 
     def close(self):
@@ -18,13 +29,69 @@ class Neo4jHandler:
     def execute_cypher(self, queries):
         """
         执行一系列 Cypher 语句
+
+        generate_cypher 把一组三元组合并为一条 UNWIND 语句，其中任意一行出错（如整数超出 int64）都会让整组失败；
+        此时逐行重试，只丢弃真正出错的行，并把失败的行数返回给调用方
+
+        Args:
+            queries: 语句列表，每项为 Cypher 字符串或 (Cypher 字符串, 参数字典)
+
+        Returns:
+            写入失败的行数（没有 rows 参数的语句失败时计为 1）
         """
         if not queries:
-            return
+            return 0
 
-        with self.driver.session() as session:
+        failed = 0
+        with tracer.span("execute_cypher", queries=len(queries)), self.driver.session() as session:
             for query in queries:
+                query, params = query if isinstance(query, tuple) else (query, None)
                 try:
-                    session.run(query)
+                    # consume() 让错误在这里抛出，而不是延迟到下一条语句或会话关闭时
+                    session.run(query, parameters=params).consume()
                 except Exception as e:
-                    print(f"Cypher Error: {e} | Query: {query}")
\ No newline at end of file
+                    rows = (params or {}).get("rows")
+                    if rows and len(rows) > 1:
+                        logger.warning("批量写入失败，逐行重试 %d 行: %s", len(rows), e)
+                        failed += self._run_rows(session, query, params, rows)
+                    else:
+                        failed += len(rows) if rows else 1
+                        logger.error("Cypher Error: %s | Query: %s", e, query)
+                        log_payload(logger, "Cypher 参数", params)
+        return failed
+
+    @staticmethod
+    def _run_rows(session, query, params, rows):
+        """逐行执行 UNWIND 语句，返回失败的行数"""
+        failed = 0
+        for row in rows:
+            try:
+                session.run(query, parameters=dict(params, rows=[row])).consume()
+            except Exception as e:
+                failed += 1
+                logger.error("Cypher Error: %s | Query: %s", e, query)
+                log_payload(logger, "写入失败的行", row)
+        return failed
+
+    def run_query(self, query, **params):
+        """
+        执行只读的参数化查询
+
+        Returns:
+            记录字典列表
+        """
+        with tracer.span("run_query"), self.driver.session() as session:
+            return [record.data() for record in session.run(query, parameters=params)]
+
+    def iter_entity_names(self, batch_size=10000):
+        """
+        流式读取图谱中所有带 name 属性的节点：单个查询按 batch_size 条一批从服务端拉取，
+        不使用 SKIP 分页（每页都要重新扫描并跳过之前的节点，大图上总开销是平方级）
+
+        Yields:
+            (name, labels)
+        """
+        with self.driver.session(fetch_size=batch_size) as session:
+            result = session.run("MATCH (n) WHERE n.name IS NOT NULL RETURN n.name AS name, labels(n) AS labels")
+            for record in result:
+                yield record["name"], list(record["labels"])
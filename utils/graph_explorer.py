@@ -0,0 +1,248 @@
+import json
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from utils.graph_db import quote_identifier
+
+
+# 单次渲染的节点上限、每个节点展开的邻居上限和列表分页大小
+DEFAULT_NODE_BUDGET = 200
+DEFAULT_DEGREE_CAP = 25
+DEFAULT_PAGE_SIZE = 50
+
+# 查询结果缓存的有效期（秒）和条目上限
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_ENTRIES = 256
+
+# 节点名称在图中显示的最大长度
+MAX_LABEL_CHARS = 20
+
+# 按标签着色的调色板
+_PALETTE = ["#8ecae6", "#ffb703", "#90be6d", "#f28482", "#cdb4db", "#f4a261", "#a8dadc", "#e9c46a"]
+
+
+class QueryCache:
+    """按 (查询语句, 参数) 缓存查询结果的 LRU 缓存，超过有效期的条目视为未命中"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES, ttl=DEFAULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(query, params):
+        return query, json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, query, params):
+        key = self._key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query, params, rows):
+        key = self._key(query, params)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class Subgraph:
+    """
+    浏览器中累积展示的子图：节点数不超过 node_budget，超出后新节点和连到它们的边被丢弃并标记 truncated
+    """
+
+    def __init__(self, node_budget=DEFAULT_NODE_BUDGET):
+        self.node_budget = node_budget
+        self.nodes = {}
+        self.edges = {}
+        self.truncated = False
+
+    def add_node(self, node_id, labels, name):
+        """添加节点，预算已满且节点不在子图中时返回 False"""
+        if node_id in self.nodes:
+            return True
+        if len(self.nodes) >= self.node_budget:
+            self.truncated = True
+            return False
+        self.nodes[node_id] = {"id": node_id, "label": labels[0] if labels else "", "name": name}
+        return True
+
+    def add_edge(self, edge_id, rel_type, source, target):
+        if source in self.nodes and target in self.nodes:
+            self.edges[edge_id] = {"id": edge_id, "type": rel_type, "source": source, "target": target}
+
+    def add_rows(self, rows):
+        """
+        添加 (节点, 关系, 邻居) 形式的查询结果行
+
+        Returns:
+            新增的节点数
+        """
+        before = len(self.nodes)
+        for row in rows:
+            if not self.add_node(row["id"], row["labels"], row["name"]):
+                continue
+            if row.get("m_id") is None:
+                continue
+            if self.add_node(row["m_id"], row["m_labels"], row["m_name"]):
+                self.add_edge(row["rel_id"], row["rel_type"], row["source"], row["target"])
+        return len(self.nodes) - before
+
+    def node_rows(self):
+        return list(self.nodes.values())
+
+    def edge_rows(self):
+        nodes = self.nodes
+        return [{"source": nodes[edge["source"]]["name"], "type": edge["type"], "target": nodes[edge["target"]]["name"]}
+                for edge in self.edges.values()]
+
+    def to_dot(self, highlight=None):
+        """生成 Graphviz DOT 文本（st.graphviz_chart 直接渲染，不需要安装 graphviz Python 包）"""
+        def escape(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+        def short(value):
+            value = str(value) if value is not None else ""
+            return value if len(value) <= MAX_LABEL_CHARS else value[:MAX_LABEL_CHARS] + "…"
+
+        lines = ["digraph G {", "  graph [overlap=false, splines=true];",
+                 '  node [shape=ellipse, style=filled, fontsize=10, fontname="sans-serif"];',
+                 '  edge [fontsize=8, fontname="sans-serif"];']
+        for node in self.nodes.values():
+            color = _PALETTE[zlib.crc32(node["label"].encode("utf-8")) % len(_PALETTE)]
+            extra = ", penwidth=3" if node["id"] == highlight else ""
+            lines.append(f'  "{escape(node["id"])}" [label="{escape(short(node["name"]))}\\n({escape(node["label"])})", '
+                         f'fillcolor="{color}"{extra}];')
+        for edge in self.edges.values():
+            lines.append(f'  "{escape(edge["source"])}" -> "{escape(edge["target"])}" '
+                         f'[label="{escape(short(edge["type"]))}"];')
+        lines.append("}")
+        return "\n".join(lines)
+
+
+# 查询结果中节点和邻居的字段（elementId 作为稳定的节点标识）
+_NEIGHBOR_FIELDS = ("elementId(n) AS id, labels(n) AS labels, n.name AS name, "
+                    "elementId(r) AS rel_id, type(r) AS rel_type, "
+                    "elementId(startNode(r)) AS source, elementId(endNode(r)) AS target, "
+                    "elementId(m) AS m_id, labels(m) AS m_labels, m.name AS m_name")
+
+
+class GraphExplorer:
+    """
+    大图浏览：所有查询都是参数化、分页且有上限的 Cypher，不会把整张图拉到界面中
+
+    - 按标签抽样概览：分页取节点，每个节点最多取 degree_cap 个邻居
+    - 邻域展开：分页取指定节点的邻居，先单独查询度数
+    - 按名称搜索：前缀或包含匹配，分页返回
+    标签和关系计数使用 count store，在千万级边的图上也是常数时间
+    """
+
+    def __init__(self, db_handler, cache=None):
+        self.db_handler = db_handler
+        self.cache = cache or QueryCache()
+
+    def _query(self, query, **params):
+        rows = self.cache.get(query, params)
+        if rows is None:
+            rows = self.db_handler.run_query(query, **params)
+            self.cache.put(query, params, rows)
+        return rows
+
+    def label_counts(self):
+        """各节点标签的节点数"""
+        labels = [row["label"] for row in self._query("CALL db.labels() YIELD label RETURN label ORDER BY label")]
+        return [{"label": label,
+                 "count": self._query(f"MATCH (n:{quote_identifier(label)}) RETURN count(n) AS count")[0]["count"]}
+                for label in labels]
+
+    def relationship_counts(self):
+        """各关系类型的关系数"""
+        types = [row["relationshipType"] for row in self._query(
+            "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType ORDER BY relationshipType")]
+        return [{"type": rel_type,
+                 "count": self._query(f"MATCH ()-[r:{quote_identifier(rel_type)}]->() "
+                                      "RETURN count(r) AS count")[0]["count"]}
+                for rel_type in types]
+
+    def search(self, text, label=None, skip=0, limit=DEFAULT_PAGE_SIZE, contains=False):
+        """
+        按名称搜索节点（前缀匹配可使用 name 上的索引，包含匹配需要扫描）
+
+        Returns:
+            [{"id", "labels", "name", "degree"}]
+        """
+        pattern = f"(n:{quote_identifier(label)})" if label else "(n)"
+        operator = "CONTAINS" if contains else "STARTS WITH"
+        return self._query(
+            f"MATCH {pattern} WHERE n.name {operator} $text "
+            "RETURN elementId(n) AS id, labels(n) AS labels, n.name AS name, COUNT { (n)--() } AS degree "
+            "ORDER BY n.name SKIP $skip LIMIT $limit",
+            text=text, skip=skip, limit=limit)
+
+    def degree(self, node_id):
+        """节点的度数（Neo4j 直接读取度数，不展开关系）"""
+        rows = self._query("MATCH (n) WHERE elementId(n) = $node_id RETURN COUNT { (n)--() } AS degree",
+                           node_id=node_id)
+        return rows[0]["degree"] if rows else 0
+
+    def sample_overview(self, label=None, skip=0, limit=DEFAULT_PAGE_SIZE, degree_cap=DEFAULT_DEGREE_CAP,
+                        node_budget=DEFAULT_NODE_BUDGET):
+        """
+        按标签抽样概览：取一页节点，每个节点最多 degree_cap 个邻居，结果不超过 node_budget 个节点
+
+        Returns:
+            Subgraph
+        """
+        pattern = f"(n:{quote_identifier(label)})" if label else "(n)"
+        rows = self._query(
+            f"MATCH {pattern} WITH n SKIP $skip LIMIT $limit "
+            "CALL { WITH n OPTIONAL MATCH (n)-[r]-(m) RETURN r, m LIMIT $degree_cap } "
+            f"RETURN {_NEIGHBOR_FIELDS}",
+            skip=skip, limit=limit, degree_cap=degree_cap)
+        subgraph = Subgraph(node_budget)
+        subgraph.add_rows(rows)
+        return subgraph
+
+    def neighbors(self, node_id, skip=0, limit=DEFAULT_DEGREE_CAP, rel_type=None):
+        """分页读取节点的邻居（高度数节点只取一页，不会展开全部关系）"""
+        rel_pattern = f"[r:{quote_identifier(rel_type)}]" if rel_type else "[r]"
+        return self._query(
+            f"MATCH (n) WHERE elementId(n) = $node_id MATCH (n)-{rel_pattern}-(m) "
+            f"RETURN {_NEIGHBOR_FIELDS} SKIP $skip LIMIT $limit",
+            node_id=node_id, skip=skip, limit=limit)
+
+    def expand(self, subgraph, node_id, skip=0, degree_cap=DEFAULT_DEGREE_CAP, rel_type=None):
+        """
+        把节点的一页邻居加入子图（受子图的节点预算限制）
+
+        Returns:
+            (新增的节点数, 节点总度数)
+        """
+        rows = self.neighbors(node_id, skip=skip, limit=degree_cap, rel_type=rel_type)
+        if not rows:
+            # 孤立节点也加入子图
+            node = self._query("MATCH (n) WHERE elementId(n) = $node_id "
+                               "RETURN elementId(n) AS id, labels(n) AS labels, n.name AS name", node_id=node_id)
+            if node:
+                subgraph.add_node(node[0]["id"], node[0]["labels"], node[0]["name"])
+            return 0, 0
+        return subgraph.add_rows(rows), self.degree(node_id)
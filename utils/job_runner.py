@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from utils.build_control import BuildControl
+from utils.graph_db import Neo4jHandler
+from utils.pipeline import build_graph
+from utils.usage import UsageTracker
+from utils.token_accounting import ThroughputStore
+
+
+# 默认任务数据库位置
+DEFAULT_JOB_DB = os.path.join(".kgbuilder", "jobs.db")
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING, JOB_PAUSED)
+
+
+def _process_alive(pid):
+    """判断本机上的进程是否仍在运行"""
+    if os.name == 'nt':
+        # Windows 上 os.kill 会直接结束进程，无法用信号 0 探测，保守地视为仍在运行
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """基于 SQLite 的构建任务表，页面通过轮询该表获取任务状态和进度"""
+
+    def __init__(self, db_path=DEFAULT_JOB_DB):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    description TEXT,
+                    model TEXT,
+                    total_chunks INTEGER DEFAULT 0,
+                    processed_chunks INTEGER DEFAULT 0,
+                    total_triples INTEGER DEFAULT 0,
+                    stats TEXT,
+                    error TEXT,
+                    created_at REAL,
+                    updated_at REAL,
+                    owner_host TEXT,
+                    owner_pid INTEGER
+                )
+            """)
+            # 旧版本创建的任务表没有执行进程列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner_host", "TEXT"), ("owner_pid", "INTEGER")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def create_job(self, description, model, total_chunks):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, description, model, total_chunks, created_at, updated_at, "
+                "owner_host, owner_pid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, description, model, total_chunks, now, now, socket.gethostname(), os.getpid()))
+        return job_id
+
+    def update(self, job_id, **fields):
+        """更新任务字段，stats 字段自动序列化为 JSON"""
+        if "stats" in fields and fields["stats"] is not None:
+            fields["stats"] = json.dumps(fields["stats"], ensure_ascii=False)
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_jobs(self, limit=20):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def fail_orphaned_jobs(self):
+        """
+        进程重启后，已退出的进程中未完成的任务无法继续，标记为失败
+
+        只处理本机上执行进程已不存在的任务（以及旧版本创建、没有记录执行进程的任务）；
+        共用同一任务表的其他进程（如多个 Streamlit 实例）中仍在运行的任务不受影响
+
+        Returns:
+            标记为失败的任务数
+        """
+        host = socket.gethostname()
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, owner_host, owner_pid FROM jobs WHERE status IN ({placeholders})",
+                ACTIVE_STATUSES).fetchall()
+            orphaned = [job_id for job_id, owner_host, owner_pid in rows
+                        if owner_pid is None or (owner_host == host and owner_pid != os.getpid()
+                                                 and not _process_alive(owner_pid))]
+            conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                [(JOB_FAILED, "服务重启，任务中断", time.time(), job_id) for job_id in orphaned])
+        return len(orphaned)
+
+    @staticmethod
+    def _row_to_dict(row):
+        job = dict(row)
+        job["stats"] = json.loads(job["stats"]) if job.get("stats") else None
+        return job
+
+
+class JobRunner:
+    """
+    进程内后台任务执行器：构建任务在工作线程中运行，不占用 Streamlit 脚本线程，
+    所有会话共享同一个线程池，max_concurrent_jobs 为全局并发上限
+
+    未结束的任务各有一个 BuildControl，pause_job / resume_job / cancel_job 可在任意会话中调用
+    """
+
+    def __init__(self, store=None, max_concurrent_jobs=2, progress_interval=1.0):
+        self.store = store or JobStore()
+        self.store.fail_orphaned_jobs()
+        self.progress_interval = progress_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="kg-job")
+        # 保护 _controls 和任务状态的切换，避免暂停与任务结束交错后把已结束的任务改回 paused
+        self._lock = threading.Lock()
+        self._controls = {}
+
+    def submit_build(self, records, ontology, api_key, model_name, neo4j_config, max_workers=4,
+                     description="", cancel_timeout=None, **extract_options):
+        """
+        提交构建任务，立即返回任务 ID
+
+        Args:
+            records: 文本块记录列表
+            ontology: YAML 本体定义字符串
+            api_key: LLM API Key
+            model_name: 模型名称
+            neo4j_config: {"uri", "user", "password"}
+            max_workers: 任务内的并发 LLM 请求数
+            description: 任务描述
+            cancel_timeout: 取消时等待在途 LLM 请求的秒数，默认见 DEFAULT_CANCEL_TIMEOUT
+            extract_options: 透传给 process_text_with_llm 的其他参数
+        """
+        records = list(records)
+        job_id = self.store.create_job(description, model_name, len(records))
+        control = BuildControl() if cancel_timeout is None else BuildControl(cancel_timeout)
+        with self._lock:
+            self._controls[job_id] = control
+        self._executor.submit(self._run_build, job_id, records, ontology, api_key, model_name,
+                              neo4j_config, max_workers, control, extract_options)
+        return job_id
+
+    def pause_job(self, job_id):
+        """
+        暂停任务：不再派发新的文本块，在途请求完成并写入后任务停在当前位置（排队中的任务开始后立即暂停）
+
+        Returns:
+            任务未结束且已处于暂停状态时返回 True
+        """
+        with self._lock:
+            control = self._controls.get(job_id)
+            if control is None or not control.pause():
+                return False
+            self.store.update(job_id, status=JOB_PAUSED)
+            return True
+
+    def resume_job(self, job_id):
+        """恢复暂停的任务，从暂停时的位置继续派发"""
+        with self._lock:
+            control = self._controls.get(job_id)
+            if control is None or not control.resume():
+                return False
+            job = self.store.get_job(job_id)
+            if job is not None and job["status"] == JOB_PAUSED:
+                self.store.update(job_id, status=JOB_RUNNING)
+            return True
+
+    def cancel_job(self, job_id):
+        """
+        取消任务：排队中的任务直接标记为已取消；运行中的任务停止派发，等待在途请求（最多 cancel_timeout 秒）
+        并写入已抽取的三元组后结束，状态变为 cancelled
+
+        Returns:
+            任务未结束时返回 True
+        """
+        with self._lock:
+            control = self._controls.get(job_id)
+            if control is None:
+                return False
+            control.cancel()
+            job = self.store.get_job(job_id)
+            if job is not None and job["status"] == JOB_QUEUED:
+                self.store.update(job_id, status=JOB_CANCELLED)
+            return True
+
+    def _finish(self, job_id, status, **fields):
+        with self._lock:
+            self._controls.pop(job_id, None)
+            self.store.update(job_id, status=status, **fields)
+
+    def _run_build(self, job_id, records, ontology, api_key, model_name, neo4j_config, max_workers, control,
+                   extract_options):
+        db_handler = None
+        try:
+            with self._lock:
+                if not control.cancelled:
+                    self.store.update(job_id, status=JOB_PAUSED if control.paused else JOB_RUNNING)
+            if control.cancelled:
+                # 排队期间已被取消
+                self._finish(job_id, JOB_CANCELLED)
+                return
+
+            db_handler = Neo4jHandler(neo4j_config["uri"], neo4j_config["user"], neo4j_config["password"])
+            conn_success, conn_message = db_handler.test_connection()
+            if not conn_success:
+                raise ConnectionError(f"数据库连接失败: {conn_message}")
+
+            usage_tracker = UsageTracker()
+            last_update = [0.0]
+
+            def on_progress(record, triples, processed_chunks, total_triples):
+                # 节流写入进度，避免每个文本块都写一次数据库
+                now = time.time()
+                if now - last_update[0] >= self.progress_interval:
+                    last_update[0] = now
+                    self.store.update(job_id, processed_chunks=processed_chunks, total_triples=total_triples)
+
+            stats = build_graph(records, ontology, api_key, model_name, db_handler,
+                                max_workers=max_workers, on_progress=on_progress,
+                                usage_tracker=usage_tracker, control=control, **extract_options)
+            stats["usage"] = usage_tracker.summary()
+            ThroughputStore().record(usage_tracker)
+            self._finish(job_id, JOB_CANCELLED if stats["cancelled"] else JOB_SUCCEEDED,
+                         processed_chunks=stats["total_chunks"], total_triples=stats["total_triples"], stats=stats)
+        except Exception as e:
+            self._finish(job_id, JOB_FAILED, error=f"{e}\n{traceback.format_exc()}")
+        finally:
+            if db_handler is not None:
+                db_handler.close()
+            # 构建中途失败时也要保存别名表、结束导出文件（Parquet 写入文件尾后才能读取）
+            if extract_options.get("resolver") is not None:
+                extract_options["resolver"].close()
+            if extract_options.get("exporter") is not None:
+                extract_options["exporter"].close()
@@ -1,10 +1,30 @@
 import json
 import os
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
+import logging
+import re
+import time
 from pydantic import BaseModel, Field
 from typing import List
+from functools import lru_cache
+from datetime import date, datetime
+from utils.ontology import compile_ontology, select_relevant_ontology
+from utils.usage import parse_token_usage
+from utils.dedup import estimate_tokens
+from utils.provider_registry import get_registry
+from utils.tracing import tracer, traced
+from utils.triple_normalizer import get_normalizer
+from utils.logging_utils import get_logger, log_payload, chunk_log
+from utils.graph_db import quote_identifier
+from utils.property_types import INDEX_RANGE
+
+
+logger = get_logger("llm_extractor")
+
+# demjson3 为可选依赖，用于宽松解析不规范的 JSON
+try:
+    import demjson3
+except ImportError:
+    demjson3 = None
 
 
 # 定义输出结构，强制 LLM 返回 JSON
@@ -22,81 +42,10 @@ class ExtractionResult(BaseModel):
     triples: List[KnowledgeGraphTriple]
 
 
-def process_text_with_llm(text_chunk, ontology, api_key, model_name="glm-4-flash"):
-    """
-    调用指定的LLM模型进行抽取
-    """
-    # 根据模型名称选择合适的API基础URL和参数
-    llm_config = {
-        "temperature": 0.1,
-        "openai_api_key": api_key
-    }
-    
-    # 配置不同模型的API基础URL和参数
-    if model_name in ["glm-4-flash", "glm-4"]:
-        # 智谱AI GLM系列
-        llm_config["model"] = model_name
-        llm_config["openai_api_base"] = "https://open.bigmodel.cn/api/paas/v4/"
-    elif model_name in ["gpt-4", "gpt-4-turbo", "gpt-3.5-turbo", "gpt-3.5-turbo-16k"]:
-        # OpenAI GPT系列
-        llm_config["model"] = model_name
-        llm_config["openai_api_base"] = "https://api.openai.com/v1/"
-    elif model_name in ["qwen-turbo", "qwen-plus", "qwen-max"]:
-        # 阿里云通义千问
-        llm_config["model"] = model_name
-        llm_config["openai_api_base"] = "https://dashscope.aliyuncs.com/compatible-mode/v1/"
-    elif model_name.startswith("claude-3-"):
-        # Anthropic Claude 3系列
-        # 注意：Claude API与OpenAI API不完全兼容
-        # 可以通过Anthropic的OpenAI兼容接口调用
-        llm_config["model"] = model_name
-        llm_config["openai_api_base"] = "https://api.anthropic.com/v1/"
-    elif model_name.startswith("gemini-"):
-        # Google Gemini系列
-        # 使用Gemini的OpenAI兼容接口
-        llm_config["model"] = model_name
-        llm_config["openai_api_base"] = "https://generativelanguage.googleapis.com/v1beta/"
-    elif model_name.startswith("llama3-"):
-        # Meta Llama 3系列
-        # 使用Meta的OpenAI兼容接口或第三方服务
-        llm_config["model"] = model_name
-        llm_config["openai_api_base"] = "https://api.meta.ai/v1/"
-    else:
-        # 默认使用GLM-4-Flash
-        llm_config["model"] = "glm-4-flash"
-        llm_config["openai_api_base"] = "https://open.bigmodel.cn/api/paas/v4/"
-    
-    # 配置LLM并添加错误处理
-    try:
-        llm = ChatOpenAI(**llm_config)
-    except Exception as e:
-        raise ValueError(f"配置LLM失败: {str(e)}")
-
-    parser = PydanticOutputParser(pydantic_object=ExtractionResult)
-
-    # 解析YAML本体定义
-    import yaml
-    ontology_dict = yaml.safe_load(ontology)
-    
-    # 获取允许的实体类型和关系类型
-    allowed_entity_types = [entity['name'] for entity in ontology_dict.get('entities', [])]
-    allowed_relation_types = [rel['relation'] for rel in ontology_dict.get('relationships', [])]
-    
-    # 构建关系约束映射
-    relation_constraints = {}
-    for rel in ontology_dict.get('relationships', []):
-        relation_constraints[rel['relation']] = {
-            'head': rel['head'],
-            'tail': rel['tail']
-        }
-    
-    # 构建实体属性映射
-    entity_properties = {}
-    for entity in ontology_dict.get('entities', []):
-        entity_properties[entity['name']] = entity.get('properties', [])
-    
-    prompt = PromptTemplate(
-        template="""你是一个知识图谱构建专家。请根据以下本体（Ontology）定义，从给定的文本中提取实体和关系。
+# 提示词静态前缀：说明、本体定义、抽取规则和示例。
+# 待分析文本放在提示词最后，同一本体下的所有请求共享逐字节相同的前缀，便于服务商的前缀缓存命中。
+# 模板按 str.format 渲染（与 langchain PromptTemplate 的 f-string 格式一致），不需要为此导入 langchain。
+EXTRACTION_PROMPT_PREFIX = """你是一个知识图谱构建专家。请根据以下本体（Ontology）定义，从给定的文本中提取实体和关系。
 
         【本体定义 - 严格约束】:
         
@@ -112,9 +61,6 @@ def process_text_with_llm(text_chunk, ontology, api_key, model_name="glm-4-flash
         **实体属性约束**:
         {entity_properties}
 
-        【待分析文本】:
-        {text}
-
         【严格抽取规则 - 违反以下任何规则将导致抽取失败】:
         1. **实体类型必须严格匹配**: 只能使用上述允许的实体类型，其他类型一律禁止
         2. **关系类型必须严格匹配**: 只能使用上述允许的关系类型，其他类型一律禁止
@@ -129,6 +75,8 @@ def process_text_with_llm(text_chunk, ontology, api_key, model_name="glm-4-flash
         - ❌ 错误: 使用"是"作为关系类型（不在允许列表中）
         - ❌ 错误: 创建"人物"->"属性"的关系（不符合关系约束）
 
+        【输出格式】: 以 JSON 对象格式输出，顶层只包含 "triples" 数组，不要输出 JSON 以外的任何文字
+
         【正确示例】:
         {{
           "triples": [
@@ -150,262 +98,341 @@ def process_text_with_llm(text_chunk, ontology, api_key, model_name="glm-4-flash
           ]
         }}
 
-        **重要提醒**: 如果文本中的信息不符合本体定义约束，请返回空列表 []，不要尝试创建不符合约束的三元组！
+        **重要提醒**: 如果文本中的信息不符合本体定义约束，请返回 {{"triples": []}}，不要尝试创建不符合约束的三元组！
+
+        """
+
 
-        """,
-        input_variables=["entity_types", "relation_types", "relation_constraints", "entity_properties", "text"]
+@lru_cache(maxsize=256)
+def build_prompt_prefix(prompt_ontology):
+    """按（子）本体缓存渲染好的静态前缀"""
+    return EXTRACTION_PROMPT_PREFIX.format(
+        entity_types=prompt_ontology.format_entity_types(),
+        relation_types=prompt_ontology.format_relation_types(),
+        relation_constraints=prompt_ontology.format_relation_constraints(),
+        entity_properties=prompt_ontology.format_entity_properties()
     )
 
-    chain = prompt | llm | parser
 
+def build_extraction_prompt(text_chunk, prompt_ontology, hints=None):
+    """拼接完整提示词：静态前缀在前，待分析文本在后；已知实体提示随文本块变化，放在文本之后以免破坏前缀缓存"""
+    prompt = f"{build_prompt_prefix(prompt_ontology)}【待分析文本】:\n{text_chunk}\n"
+    if hints:
+        prompt += f"\n【已知实体提示】（文本中出现的图谱已有实体，抽取时请使用规范名称）:\n{hints}\n"
+    return prompt
+
+
+@lru_cache(maxsize=1)
+def _usage_callback_class():
+    """首次调用 LLM 时才导入 langchain 并定义回调类"""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class _UsageCallback(BaseCallbackHandler):
+        """从 LLM 回调中获取响应的 token 用量"""
+
+        def __init__(self):
+            self.usage = None
+
+        def on_llm_end(self, response, **kwargs):
+            llm_output = response.llm_output or {}
+            self.usage = parse_token_usage(llm_output.get('token_usage'))
+
+    return _UsageCallback
+
+
+def _response_usage(raw_response):
+    """回调未提供用量时，尝试从响应元数据中读取"""
+    metadata = getattr(raw_response, 'response_metadata', None) or {}
+    return parse_token_usage(metadata.get('token_usage'))
+
+
+def _triples_from_json(json_data):
+    """根据解析出的 JSON 数据手动构建 ExtractionResult 对象"""
+    triples_list = []
+    if 'triples' in json_data and isinstance(json_data['triples'], list):
+        for triple_data in json_data['triples']:
+            # 创建KnowledgeGraphTriple对象
+            triple = KnowledgeGraphTriple(
+                head=triple_data.get('head', ''),
+                head_type=triple_data.get('head_type', ''),
+                head_properties=triple_data.get('head_properties', {}),
+                relation=triple_data.get('relation', ''),
+                tail=triple_data.get('tail', ''),
+                tail_type=triple_data.get('tail_type', ''),
+                tail_properties=triple_data.get('tail_properties', {})
+            )
+            triples_list.append(triple)
+    return ExtractionResult(triples=triples_list)
+
+
+def _clean_json_string(json_str):
+    """清理JSON字符串：移除注释和尾随逗号"""
+    # 1. 移除单行注释 (// ...)
+    cleaned = re.sub(r'//[^\n]*', '', json_str)
+    # 2. 移除多行注释 (/* ... */)
+    cleaned = re.sub(r'/\*[^*]*\*+(?:[^/*][^*]*\*+)*/', '', cleaned)
+    # 3. 移除尾随逗号（在对象和数组末尾）
+    cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
+    # 4. 清理多余的空格和换行
+    cleaned = re.sub(r'\n\s*\n', '\n', cleaned)
+    cleaned = re.sub(r'^\s+|\s+$', '', cleaned, flags=re.MULTILINE)
+    # 5. 修复可能的问题：确保属性名用双引号包围
+    cleaned = re.sub(r'(\w+):', r'"\1":', cleaned)
+    # 6. 确保字符串值用双引号包围（如果当前是单引号）
+    cleaned = re.sub(r"'([^']*)'", r'"\1"', cleaned)
+    return cleaned
+
+
+def parse_extraction_response(content):
+    """
+    解析 LLM 响应中的 JSON，依次尝试标准解析、demjson3 宽松解析和手动修复
+
+    Returns:
+        ExtractionResult，所有解析方法都失败时返回 None
+    """
+    # 提取JSON部分
+    json_match = re.search(r'\{[\s\S]*\}', content)
+    if not json_match:
+        logger.warning("未找到JSON格式的响应")
+        return None
+
+    json_str = json_match.group(0)
+    log_payload(logger, "提取的JSON字符串", json_str)
+
+    cleaned_json = _clean_json_string(json_str)
+    log_payload(logger, "清理后的JSON字符串", cleaned_json)
+
+    # 尝试解析JSON
+    try:
+        json_data = json.loads(cleaned_json)
+        log_payload(logger, "成功解析JSON", json_data)
+        return _triples_from_json(json_data)
+    except json.JSONDecodeError as json_error:
+        logger.debug("标准JSON解析错误: %s", json_error)
+
+    # 尝试更宽松的解析方式：使用demjson3库（未安装时跳过）
+    if demjson3 is not None:
+        try:
+            json_data = demjson3.decode(cleaned_json)
+            log_payload(logger, "使用demjson3成功解析JSON", json_data)
+            return _triples_from_json(json_data)
+        except Exception as demjson_error:
+            logger.debug("demjson3解析也失败: %s", demjson_error)
+
+    # 最后尝试：手动修复常见的JSON格式问题
+    try:
+        # 移除所有注释行，保留注释前的部分
+        cleaned_lines = []
+        for line in json_str.split('\n'):
+            if '//' in line:
+                line = line.split('//')[0]
+            cleaned_lines.append(line.strip())
+        manual_fixed_json = '\n'.join(cleaned_lines)
+
+        # 移除尾随逗号
+        manual_fixed_json = re.sub(r',\s*\n\s*([}\]])', r'\n\1', manual_fixed_json)
+
+        log_payload(logger, "手动修复后的JSON", manual_fixed_json)
+
+        json_data = json.loads(manual_fixed_json)
+        return _triples_from_json(json_data)
+    except Exception as final_error:
+        logger.warning("所有解析方法都失败: %s", final_error)
+        return None
+
+
+def process_text_with_llm(text_chunk, ontology, api_key, model_name="glm-4-flash", prune_schema=False,
+                          usage_tracker=None, api_base=None, report=None, hints=None, normalization_stats=None,
+                          log_context=None):
+    """
+    调用指定的LLM模型进行抽取
+
+    Args:
+        text_chunk: 文本块
+        ontology: YAML 本体定义字符串
+        api_key: LLM API Key
+        model_name: 模型名称
+        prune_schema: 是否按文本块裁剪本体，只在提示词中包含关键词命中的类型及其关系
+        usage_tracker: 可选 UsageTracker，记录响应中的实际 token 用量和缓存命中
+        api_base: 可选 OpenAI 兼容接口地址，指定时覆盖按模型名称选择的地址（如本地部署或压测用的模拟服务）
+        report: 可选字典，填入本次抽取的结果信息：parse_ok（响应能否解析）、candidates（解析出的三元组数）、
+            accepted（通过本体校验的三元组数）、normalization（各规范化规则的计数）、error（调用异常信息）
+        hints: 可选已知实体提示文本（Gazetteer.annotate 生成），附加在待分析文本之后
+        normalization_stats: 可选 NormalizationStats，累计三元组规范化各规则的计数
+        log_context: 可选字典（如 chunk_id、doc），开启逐块日志时附加到该文本块的 JSON Lines 记录中
+    """
+    if report is None and chunk_log.enabled:
+        report = {}
+    if report is not None:
+        report.update({"parse_ok": False, "candidates": 0, "accepted": 0, "error": None})
+
+    # 从服务商注册表获取接口地址、超时和 JSON 模式等参数，未声明的模型直接报错
+    model_config = get_registry().resolve(model_name, api_base)
+    llm_config = {
+        "temperature": 0.1,
+        "openai_api_key": api_key,
+        "model": model_config.name,
+        "openai_api_base": model_config.base_url,
+        "timeout": model_config.timeout
+    }
+    if model_config.json_mode:
+        llm_config["model_kwargs"] = {"response_format": {"type": "json_object"}}
+    
+    # 配置LLM并添加错误处理（langchain_openai 在首次抽取时才导入）
+    try:
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(**llm_config)
+    except Exception as e:
+        raise ValueError(f"配置LLM失败: {str(e)}")
+
+    # 解析YAML本体定义（按YAML字符串缓存）
+    compiled_ontology = compile_ontology(ontology)
+
+    # 提示词中使用的本体：可选按文本块裁剪
+    prompt_ontology = compiled_ontology
+    if prune_schema:
+        prompt_ontology, _ = select_relevant_ontology(compiled_ontology, text_chunk)
+
+    start = time.perf_counter()
     try:
         # 首先尝试直接调用LLM获取原始响应
-        raw_response = llm.invoke(prompt.format(
-            entity_types="\n".join([f"- {entity_type}" for entity_type in allowed_entity_types]),
-            relation_types="\n".join([f"- {relation_type}" for relation_type in allowed_relation_types]),
-            relation_constraints="\n".join([f"- {rel}: {constraints['head']} -> {constraints['tail']}" for rel, constraints in relation_constraints.items()]),
-            entity_properties="\n".join([f"- {entity}: {props}" for entity, props in entity_properties.items()]),
-            text=text_chunk
-        ))
-        
-        print(f"LLM原始响应: {raw_response.content}")
-        
-        # 尝试解析JSON
-        import re
-        
-        # 提取JSON部分
-        json_match = re.search(r'\{[\s\S]*\}', raw_response.content)
-        if json_match:
-            json_str = json_match.group(0)
-            print(f"提取的JSON字符串: {json_str}")
-            
-            # 清理JSON字符串：移除注释和尾随逗号
-            def clean_json_string(json_str):
-                # 1. 移除单行注释 (// ...)
-                cleaned = re.sub(r'//[^\n]*', '', json_str)
-                # 2. 移除多行注释 (/* ... */)
-                cleaned = re.sub(r'/\*[^*]*\*+(?:[^/*][^*]*\*+)*/', '', cleaned)
-                # 3. 移除尾随逗号（在对象和数组末尾）
-                cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
-                # 4. 清理多余的空格和换行
-                cleaned = re.sub(r'\n\s*\n', '\n', cleaned)
-                cleaned = re.sub(r'^\s+|\s+$', '', cleaned, flags=re.MULTILINE)
-                # 5. 修复可能的问题：确保属性名用双引号包围
-                cleaned = re.sub(r'(\w+):', r'"\1":', cleaned)
-                # 6. 确保字符串值用双引号包围（如果当前是单引号）
-                cleaned = re.sub(r"'([^']*)'", r'"\1"', cleaned)
-                return cleaned
-            
-            cleaned_json = clean_json_string(json_str)
-            print(f"清理后的JSON字符串: {cleaned_json}")
-            
-            # 尝试解析JSON
-            try:
-                json_data = json.loads(cleaned_json)
-                print(f"成功解析JSON: {json_data}")
-                
-                # 手动构建ExtractionResult对象
-                triples_list = []
-                if 'triples' in json_data and isinstance(json_data['triples'], list):
-                    for triple_data in json_data['triples']:
-                        # 创建KnowledgeGraphTriple对象
-                        triple = KnowledgeGraphTriple(
-                            head=triple_data.get('head', ''),
-                            head_type=triple_data.get('head_type', ''),
-                            head_properties=triple_data.get('head_properties', {}),
-                            relation=triple_data.get('relation', ''),
-                            tail=triple_data.get('tail', ''),
-                            tail_type=triple_data.get('tail_type', ''),
-                            tail_properties=triple_data.get('tail_properties', {})
-                        )
-                        triples_list.append(triple)
-                
-                # 创建ExtractionResult对象
-                result = ExtractionResult(triples=triples_list)
-                print(f"手动构建的结果: {result}")
-                
-            except json.JSONDecodeError as json_error:
-                print(f"标准JSON解析错误: {json_error}")
-                print(f"清理后的JSON字符串: {cleaned_json}")
-                
-                # 尝试更宽松的解析方式
-                try:
-                    # 使用demjson3库进行更宽松的解析
-                    import demjson3
-                    json_data = demjson3.decode(cleaned_json)
-                    print(f"使用demjson3成功解析JSON: {json_data}")
-                    
-                    # 手动构建ExtractionResult对象
-                    triples_list = []
-                    if 'triples' in json_data and isinstance(json_data['triples'], list):
-                        for triple_data in json_data['triples']:
-                            triple = KnowledgeGraphTriple(
-                                head=triple_data.get('head', ''),
-                                head_type=triple_data.get('head_type', ''),
-                                head_properties=triple_data.get('head_properties', {}),
-                                relation=triple_data.get('relation', ''),
-                                tail=triple_data.get('tail', ''),
-                                tail_type=triple_data.get('tail_type', ''),
-                                tail_properties=triple_data.get('tail_properties', {})
-                            )
-                            triples_list.append(triple)
-                    
-                    result = ExtractionResult(triples=triples_list)
-                    print(f"手动构建的结果: {result}")
-                except Exception as demjson_error:
-                    print(f"demjson3解析也失败: {demjson_error}")
-                    
-                    # 最后尝试：手动修复常见的JSON格式问题
-                    try:
-                        # 手动修复注释问题
-                        manual_fixed_json = json_str
-                        # 移除所有注释行
-                        lines = manual_fixed_json.split('\n')
-                        cleaned_lines = []
-                        for line in lines:
-                            if '//' in line:
-                                # 保留注释前的部分
-                                line = line.split('//')[0]
-                            cleaned_lines.append(line.strip())
-                        manual_fixed_json = '\n'.join(cleaned_lines)
-                        
-                        # 移除尾随逗号
-                        manual_fixed_json = re.sub(r',\s*\n\s*([}\]])', r'\n\1', manual_fixed_json)
-                        
-                        print(f"手动修复后的JSON: {manual_fixed_json}")
-                        
-                        json_data = json.loads(manual_fixed_json)
-                        print(f"手动修复后成功解析JSON: {json_data}")
-                        
-                        # 手动构建ExtractionResult对象
-                        triples_list = []
-                        if 'triples' in json_data and isinstance(json_data['triples'], list):
-                            for triple_data in json_data['triples']:
-                                triple = KnowledgeGraphTriple(
-                                    head=triple_data.get('head', ''),
-                                    head_type=triple_data.get('head_type', ''),
-                                    head_properties=triple_data.get('head_properties', {}),
-                                    relation=triple_data.get('relation', ''),
-                                    tail=triple_data.get('tail', ''),
-                                    tail_type=triple_data.get('tail_type', ''),
-                                    tail_properties=triple_data.get('tail_properties', {})
-                                )
-                                triples_list.append(triple)
-                        
-                        result = ExtractionResult(triples=triples_list)
-                        print(f"手动构建的结果: {result}")
-                    except Exception as final_error:
-                        print(f"所有解析方法都失败: {final_error}")
-                        return []
-        else:
-            print("未找到JSON格式的响应")
+        with tracer.span("prompt_format"):
+            prompt = build_extraction_prompt(text_chunk, prompt_ontology, hints)
+
+        prompt_tokens = estimate_tokens(prompt)
+        if model_config.context_window and prompt_tokens > model_config.context_window:
+            raise ValueError(f"提示词约 {prompt_tokens} tokens，超过模型 {model_name} 的上下文窗口 "
+                             f"{model_config.context_window}")
+
+        usage_callback = _usage_callback_class()()
+        # 在服务商的并发上限和 RPM/TPM 限制内发起请求
+        with model_config.provider.throttle(prompt_tokens):
+            invoke_start = time.perf_counter()
+            with tracer.span("llm_invoke", model=model_name):
+                raw_response = llm.invoke(prompt, config={"callbacks": [usage_callback]})
+        if usage_tracker is not None:
+            usage_tracker.record(model_name, usage_callback.usage or _response_usage(raw_response),
+                                 latency=time.perf_counter() - invoke_start)
+
+        log_payload(logger, "LLM原始响应", raw_response.content)
+
+        # 解析JSON（含多级修复）
+        with tracer.span("json_repair"):
+            result = parse_extraction_response(raw_response.content)
+        if result is None:
+            _log_chunk(model_name, report, start, log_context)
             return []
+        if report is not None:
+            report["parse_ok"] = True
+            report["candidates"] = len(result.triples)
         
-        # 后处理过滤：确保所有三元组都符合本体定义
-        filtered_triples = []
-        for triple in result.triples:
-            # 检查实体类型是否在允许列表中
-            if triple.head_type not in allowed_entity_types:
-                print(f"警告: 跳过不符合本体定义的实体类型: {triple.head_type}")
-                continue
-            if triple.tail_type not in allowed_entity_types:
-                print(f"警告: 跳过不符合本体定义的实体类型: {triple.tail_type}")
-                continue
-            
-            # 检查关系类型是否在允许列表中
-            if triple.relation not in allowed_relation_types:
-                print(f"警告: 跳过不符合本体定义的关系类型: {triple.relation}")
-                continue
-            
-            # 检查关系约束
-            if triple.relation in relation_constraints:
-                constraint = relation_constraints[triple.relation]
-                if triple.head_type != constraint['head'] or triple.tail_type != constraint['tail']:
-                    print(f"警告: 跳过不符合关系约束的三元组: {triple.head_type}-[{triple.relation}]->{triple.tail_type}")
-                    continue
-            
-            filtered_triples.append(triple)
-        
-        print(f"过滤后三元组数量: {len(filtered_triples)}")
+        # 后处理：按本体规范化类型、关系、方向和属性后再校验（校验始终基于完整本体）
+        normalization_counts = {}
+        with tracer.span("validation", candidates=len(result.triples)):
+            filtered_triples, rejected = get_normalizer(compiled_ontology).normalize(result.triples,
+                                                                                     normalization_counts)
+        if logger.isEnabledFor(logging.DEBUG):
+            for triple, reason in rejected:
+                logger.debug("跳过不符合本体定义的三元组（%s）: %s-[%s]->%s",
+                             reason, triple.head_type, triple.relation, triple.tail_type)
+        if normalization_stats is not None:
+            normalization_stats.add(normalization_counts)
+
+        logger.debug("过滤后三元组数量: %d", len(filtered_triples))
+        if report is not None:
+            report["accepted"] = len(filtered_triples)
+            report["normalization"] = normalization_counts
+        _log_chunk(model_name, report, start, log_context)
         return filtered_triples
-        
+
     except Exception as e:
-        print(f"LLM Extraction Error: {e}")
-        import traceback
-        print(f"详细错误信息: {traceback.format_exc()}")
+        if report is not None:
+            report["error"] = str(e)
+        logger.error("LLM Extraction Error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        _log_chunk(model_name, report, start, log_context)
         return []
 
 
+def _log_chunk(model_name, report, start, log_context):
+    """把一次抽取的结果写入逐块 JSON Lines 日志（未开启时直接返回）"""
+    if not chunk_log.enabled:
+        return
+    normalization = report.get("normalization") or {}
+    chunk_log.record(**(log_context or {}), model=model_name, parse_ok=report["parse_ok"],
+                     candidates=report["candidates"], accepted=report["accepted"],
+                     repaired=normalization.get("repaired", 0),
+                     latency_ms=round((time.perf_counter() - start) * 1000, 1), error=report["error"])
+
+
+# neo4j 驱动可直接写为原生类型的属性值，其他值（嵌套字典、列表等）按字符串写入
+_NATIVE_PROPERTY_TYPES = (str, bool, int, float, date, datetime)
+
+
+def _property_params(properties):
+    """节点属性参数：去掉 name（MERGE 的键）和空值"""
+    if not properties or not isinstance(properties, dict):
+        return {}
+    return {k: v if isinstance(v, _NATIVE_PROPERTY_TYPES) else str(v)
+            for k, v in properties.items() if v is not None and k != "name"}
+
+
+@traced("generate_cypher")
 def generate_cypher(triples):
     """
-    将三元组转换为 Cypher 语句
+    将三元组转换为参数化的 Cypher 语句
     逻辑：
-    1. 对每个三元组，构建一个完整的Cypher查询
-    2. 使用MERGE创建或匹配节点
-    3. 使用SET更新节点属性
+    1. 按 (头实体类型, 关系, 尾实体类型) 分组，每组生成一条 UNWIND 语句
+    2. 使用MERGE创建或匹配节点，名称和属性作为查询参数传入（属性保持原生类型，不做字符串转义）
+    3. 使用SET += 更新节点属性
     4. 使用MERGE创建关系
+
+    标签和关系类型不能参数化，用反引号转义
+
+    Returns:
+        [(Cypher 语句, 参数字典)]，传给 Neo4jHandler.execute_cypher
     """
-    queries = []
+    groups = {}
     for t in triples:
-        # 清理特殊字符，防止 Cypher 注入 (简单处理)
-        h_name = t.head.replace("'", "").replace('"', "")
-        t_name = t.tail.replace("'", "").replace('"', "")
-        relation = t.relation.replace("'", "").replace('"', "")
-
-        # 构建完整的Cypher查询
-        cypher_query = f"""
-        // 处理头节点
-        MERGE (h:{t.head_type} {{name: '{h_name}'}})
-        """
+        rows = groups.setdefault((t.head_type, t.relation, t.tail_type), [])
+        rows.append({
+            "head": t.head,
+            "head_properties": _property_params(t.head_properties),
+            "tail": t.tail,
+            "tail_properties": _property_params(t.tail_properties)
+        })
 
-        # 设置头实体的属性
-        if t.head_properties and isinstance(t.head_properties, dict):
-            # 只保留非空属性
-            valid_head_props = {k: v for k, v in t.head_properties.items() if v is not None}
-            if valid_head_props:
-                # 构建SET语句
-                head_props = []
-                for k, v in valid_head_props.items():
-                    if k != "name":
-                        # 先处理单引号转义
-                        prop_value = str(v).replace("'", "''")
-                        # 再构建属性字符串
-                        head_props.append(f"h.{k} = '{prop_value}'")
-                head_props_str = ", ".join(head_props)
-                if head_props_str:
-                    cypher_query += f"\n        SET {head_props_str}"
-
-        # 处理尾节点
-        cypher_query += f"""
-        
-        // 处理尾节点
-        MERGE (t:{t.tail_type} {{name: '{t_name}'}})
-        """
+    queries = []
+    for (head_type, relation, tail_type), rows in groups.items():
+        cypher_query = (
+            "UNWIND $rows AS row\n"
+            f"MERGE (h:{quote_identifier(head_type)} {{name: row.head}})\n"
+            "SET h += row.head_properties\n"
+            f"MERGE (t:{quote_identifier(tail_type)} {{name: row.tail}})\n"
+            "SET t += row.tail_properties\n"
+            f"MERGE (h)-[:{quote_identifier(relation)}]->(t)"
+        )
+        queries.append((cypher_query, {"rows": rows}))
 
-        # 设置尾实体的属性
-        if t.tail_properties and isinstance(t.tail_properties, dict):
-            # 只保留非空属性
-            valid_tail_props = {k: v for k, v in t.tail_properties.items() if v is not None}
-            if valid_tail_props:
-                # 构建SET语句
-                tail_props = []
-                for k, v in valid_tail_props.items():
-                    if k != "name":
-                        # 先处理单引号转义
-                        prop_value = str(v).replace("'", "''")
-                        # 再构建属性字符串
-                        tail_props.append(f"t.{k} = '{prop_value}'")
-                tail_props_str = ", ".join(tail_props)
-                if tail_props_str:
-                    cypher_query += f"\n        SET {tail_props_str}"
-
-        # 处理关系
-        cypher_query += f"""
-        
-        // 处理关系
-        MERGE (h)-[:{relation}]->(t)
-        """
+    return queries
+
+
+def generate_index_cypher(ontology):
+    """
+    按本体生成建索引语句（IF NOT EXISTS，可重复执行）：每个实体类型的 name（MERGE 的键）建 range 索引，
+    声明了 index 的属性建 range 或 text 索引
 
-        queries.append(cypher_query)
+    Args:
+        ontology: YAML 本体定义字符串
 
-    return queries
\ No newline at end of file
+    Returns:
+        Cypher 语句列表
+    """
+    compiled = compile_ontology(ontology)
+    indexes = [(entity_type, "name", INDEX_RANGE) for entity_type in compiled.entity_types]
+    indexes += compiled.property_indexes
+    queries = []
+    for entity_type, prop, kind in dict.fromkeys(indexes):
+        index_name = quote_identifier(f"kg_{entity_type}_{prop}_{kind}")
+        queries.append(f"CREATE {kind.upper()} INDEX {index_name} IF NOT EXISTS "
+                       f"FOR (n:{quote_identifier(entity_type)}) ON (n.{quote_identifier(prop)})")
+    return queries
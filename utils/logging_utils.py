@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from config.app_config import LOG_LEVEL, LOG_PAYLOAD_SAMPLE_RATE, LOG_PAYLOAD_MAX_CHARS
+
+
+# 所有模块的日志记录器都挂在该名称下，统一配置级别和输出
+ROOT_LOGGER_NAME = "kgbuilder"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_configure_lock = threading.Lock()
+_handler = None
+
+
+def get_logger(name):
+    """返回 kgbuilder 下的子日志记录器（如 get_logger("llm_extractor")）"""
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def configure_logging(level=None, payload_sample_rate=None, stream=None):
+    """
+    配置日志级别和输出（可重复调用，只保留一个输出 handler）
+
+    Args:
+        level: 日志级别名称，默认依次取环境变量 KG_LOG_LEVEL、config/app_config.py 中的 LOG_LEVEL
+        payload_sample_rate: 大段载荷的采样率（0~1），默认取环境变量 KG_LOG_SAMPLE 或 LOG_PAYLOAD_SAMPLE_RATE
+        stream: 输出流，默认 stderr
+    """
+    global _handler
+    level = (level or os.environ.get("KG_LOG_LEVEL") or LOG_LEVEL).upper()
+    if payload_sample_rate is None and os.environ.get("KG_LOG_SAMPLE"):
+        payload_sample_rate = float(os.environ["KG_LOG_SAMPLE"])
+    if payload_sample_rate is not None:
+        payload_sampler.rate = payload_sample_rate
+
+    logger = logging.getLogger(ROOT_LOGGER_NAME)
+    with _configure_lock:
+        logger.setLevel(level)
+        if _handler is not None:
+            logger.removeHandler(_handler)
+        _handler = logging.StreamHandler(stream or sys.stderr)
+        _handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(_handler)
+        logger.propagate = False
+    return logger
+
+
+class PayloadSampler:
+    """按比例抽样记录大段载荷，高并发时 DEBUG 日志不会被完整响应淹没"""
+
+    def __init__(self, rate=LOG_PAYLOAD_SAMPLE_RATE):
+        self.rate = rate
+
+    def sample(self):
+        if self.rate >= 1:
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+
+payload_sampler = PayloadSampler()
+
+
+class _Truncated:
+    """延迟截断：只有日志真正输出时才转换为字符串"""
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value, max_chars):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self):
+        text = str(self.value)
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}...（共 {len(text)} 字符）"
+
+
+def log_payload(logger, label, payload, max_chars=LOG_PAYLOAD_MAX_CHARS):
+    """
+    在 DEBUG 级别按采样率记录大段载荷（LLM 原始响应、JSON 字符串等），超过 max_chars 时截断
+
+    未开启 DEBUG 时直接返回，不做任何字符串格式化
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or not payload_sampler.sample():
+        return
+    logger.debug("%s: %s", label, _Truncated(payload, max_chars))
+
+
+class ChunkLog:
+    """
+    逐块结果的 JSON Lines 日志：每次 LLM 抽取或跳过记录一行，
+    包含 chunk_id、doc、模型、解析是否成功、候选/通过/修复的三元组数、耗时和错误信息
+
+    默认关闭（环境变量 KG_CHUNK_LOG 指定路径时开启），关闭时 record() 直接返回
+    """
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._file = None
+        self.path = None
+        if path:
+            self.open(path)
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    def open(self, path):
+        """开始写入指定路径（追加模式，'-' 表示 stderr）"""
+        self.close()
+        if path == '-':
+            file = sys.stderr
+        else:
+            path_dir = os.path.dirname(path)
+            if path_dir:
+                os.makedirs(path_dir, exist_ok=True)
+            file = open(path, 'a', encoding='utf-8')
+        with self._lock:
+            self._file = file
+            self.path = path
+
+    def record(self, **fields):
+        if self._file is None:
+            return
+        entry = {"ts": round(time.time(), 3)}
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._file is not sys.stderr:
+                self._file.close()
+            self._file = None
+            self.path = None
+
+
+# 全局逐块日志，多个抽取线程共享
+chunk_log = ChunkLog(os.environ.get("KG_CHUNK_LOG"))
@@ -0,0 +1,193 @@
+import re
+import time
+import threading
+from utils.llm_extractor import process_text_with_llm
+from utils.triple_normalizer import NormalizationStats
+
+
+# 升级原因
+ESCALATE_PARSE_FAILURE = "parse_failure"
+ESCALATE_LOW_YIELD = "low_yield"
+ESCALATE_ERROR = "error"
+
+
+def chunk_complexity(text, max_chars=None, table_line_ratio=0.3, digit_ratio=0.15):
+    """
+    用本地启发式规则判断文本块是否复杂（适合直接交给更强的模型）
+
+    Args:
+        text: 文本块
+        max_chars: 字符数超过该值视为长文本，应取构建配置的最大文本块大小（切分器无法再拆分的超长段落或表格
+            才会超过它）；为 None 时不按长度判断。不使用 token 估算：中文每个字约计 1 token，
+            固定的 token 阈值会把几乎所有正常大小的中文文本块判定为长文本
+        table_line_ratio: 表格样式的行（含多个 | 或制表符）占比超过该值视为表格
+        digit_ratio: 数字字符占比超过该值视为数据密集
+
+    Returns:
+        判定为复杂的原因列表，空列表表示简单文本块
+    """
+    reasons = []
+    if max_chars and len(text) > max_chars:
+        reasons.append("long")
+
+    lines = [line for line in text.split('\n') if line.strip()]
+    if lines:
+        table_lines = sum(1 for line in lines if line.count('|') >= 2 or line.count('\t') >= 2)
+        if table_lines / len(lines) > table_line_ratio:
+            reasons.append("table")
+
+    if text and len(re.findall(r'\d', text)) / len(text) > digit_ratio:
+        reasons.append("numeric")
+    return reasons
+
+
+class CascadeRouter:
+    """
+    级联路由：每个文本块先交给低成本模型，出现以下情况时升级到下一级模型
+
+    - 响应无法解析为 JSON，或调用出错
+    - 解析出的三元组中通过本体校验的比例低于 min_accept_ratio
+    - 文本块被本地启发式判定为复杂（直接从第二级开始）
+
+    采用第一个通过检查的那一级的结果；所有级别都未通过时（最后一级也解析失败或通过率低），
+    退而采用通过校验的三元组最多的结果（计入 fallback_chunks）。各级的请求数、接受数和升级原因记录在 summary() 中
+    """
+
+    def __init__(self, tiers, min_accept_ratio=0.5, route_complex=True, complexity_options=None,
+                 max_chunk_size=None):
+        """
+        Args:
+            tiers: 按成本从低到高排列的模型列表，每项为模型名称或 {"model", "api_key", "api_base"}，
+                未指定 api_key 时使用构建时传入的 API Key
+            min_accept_ratio: 通过本体校验的三元组比例低于该值时升级
+            route_complex: 复杂文本块是否跳过第一级
+            complexity_options: 传给 chunk_complexity 的阈值参数
+            max_chunk_size: 构建配置的最大文本块大小（字符），超过它的文本块视为长文本；
+                未指定时不按长度判断复杂度
+        """
+        if not tiers:
+            raise ValueError("级联路由至少需要一个模型")
+        self.tiers = [tier if isinstance(tier, dict) else {"model": tier} for tier in tiers]
+        self.min_accept_ratio = min_accept_ratio
+        self.route_complex = route_complex
+        self.complexity_options = dict(complexity_options or {})
+        if max_chunk_size:
+            self.complexity_options.setdefault("max_chars", max_chunk_size)
+        self._lock = threading.Lock()
+        self._tier_stats = [{
+            "model": tier["model"],
+            "requests": 0,
+            "accepted": 0,
+            "triples": 0,
+            "latency_seconds": 0.0,
+            "escalated": {ESCALATE_PARSE_FAILURE: 0, ESCALATE_LOW_YIELD: 0, ESCALATE_ERROR: 0}
+        } for tier in self.tiers]
+        self._chunks = 0
+        self._complex_chunks = 0
+        self._escalated_chunks = 0
+        self._fallback_chunks = 0
+
+    @property
+    def model_name(self):
+        """用于显示的模型名称"""
+        return " → ".join(tier["model"] for tier in self.tiers)
+
+    def _escalation_reason(self, report):
+        if report.get("error"):
+            return ESCALATE_ERROR
+        if not report.get("parse_ok"):
+            return ESCALATE_PARSE_FAILURE
+        candidates = report.get("candidates", 0)
+        if candidates and report.get("accepted", 0) / candidates < self.min_accept_ratio:
+            return ESCALATE_LOW_YIELD
+        return None
+
+    def extract(self, text_chunk, ontology, api_key, result=None, **extract_options):
+        """
+        按级联策略抽取一个文本块
+
+        Args:
+            result: 可选字典，写入 "model"（最终采用的结果来自哪一级模型）
+            extract_options: 透传给 process_text_with_llm；其中的 normalization_stats 只累计最终采用的那一级的计数
+
+        Returns:
+            通过本体校验的三元组列表（第一个通过检查的那一级的结果，都未通过时为三元组最多的结果）
+        """
+        start_tier = 0
+        complex_chunk = False
+        if self.route_complex and len(self.tiers) > 1:
+            complex_chunk = bool(chunk_complexity(text_chunk, **self.complexity_options))
+            if complex_chunk:
+                start_tier = 1
+
+        # 每一级使用独立的规范化计数，只把采用的结果合并到构建级统计，升级的文本块不重复计数
+        normalization_stats = extract_options.pop("normalization_stats", None)
+        attempts = []
+        accepted = False
+        escalated = False
+        for level in range(start_tier, len(self.tiers)):
+            tier = self.tiers[level]
+            report = {}
+            attempt_stats = NormalizationStats()
+            start = time.perf_counter()
+            try:
+                triples = process_text_with_llm(text_chunk, ontology, tier.get("api_key") or api_key, tier["model"],
+                                                api_base=tier.get("api_base"), report=report,
+                                                normalization_stats=attempt_stats, **extract_options)
+            except Exception as e:
+                triples = []
+                report = {"error": str(e)}
+            elapsed = time.perf_counter() - start
+            attempts.append((level, triples, attempt_stats))
+            reason = self._escalation_reason(report)
+            is_last = level == len(self.tiers) - 1
+
+            with self._lock:
+                stats = self._tier_stats[level]
+                stats["requests"] += 1
+                stats["latency_seconds"] += elapsed
+                if reason is None:
+                    stats["accepted"] += 1
+                elif not is_last:
+                    stats["escalated"][reason] += 1
+            if reason is None:
+                accepted = True
+                break
+            if not is_last:
+                escalated = True
+
+        if accepted:
+            level, triples, attempt_stats = attempts[-1]
+        else:
+            # 所有级别都未通过检查：保留三元组最多的结果（相同时取更强的一级），不至于丢掉部分结果
+            level, triples, attempt_stats = max(reversed(attempts), key=lambda attempt: len(attempt[1]))
+        if normalization_stats is not None:
+            normalization_stats.add(attempt_stats.counts())
+
+        with self._lock:
+            self._tier_stats[level]["triples"] += len(triples)
+            self._chunks += 1
+            self._complex_chunks += int(complex_chunk)
+            self._escalated_chunks += int(escalated)
+            self._fallback_chunks += int(not accepted)
+        if result is not None:
+            result["model"] = self.tiers[level]["model"]
+        return triples
+
+    def summary(self):
+        """路由统计：各级模型的请求数、接受数、升级原因和平均延迟"""
+        with self._lock:
+            tiers = []
+            for stats in self._tier_stats:
+                tier = dict(stats, escalated=dict(stats["escalated"]))
+                latency = tier.pop("latency_seconds")
+                tier["avg_latency_seconds"] = round(latency / tier["requests"], 3) if tier["requests"] else None
+                tiers.append(tier)
+            return {
+                "chunks": self._chunks,
+                "complex_chunks": self._complex_chunks,
+                "escalated_chunks": self._escalated_chunks,
+                "escalation_rate": round(self._escalated_chunks / self._chunks, 4) if self._chunks else 0,
+                "fallback_chunks": self._fallback_chunks,
+                "tiers": tiers
+            }
@@ -0,0 +1,173 @@
+import yaml
+from functools import lru_cache
+from utils.property_types import parse_property_spec, TYPE_STRING
+
+
+class CompiledOntology:
+    """
+    编译后的本体定义：预先计算实体类型、关系类型、关系约束、属性列表和关键词表，
+    避免每个文本块重复解析 YAML
+
+    YAML 中的实体和关系可以额外声明 keywords / aliases 列表，用于按文本块裁剪本体:
+
+        entities:
+          - name: "公司"
+            properties: ["name", "industry"]
+            keywords: ["公司", "集团", "有限公司"]
+        relationships:
+          - head: "人物"
+            relation: "任职于"
+            tail: "公司"
+            keywords: ["任职", "就职"]
+
+    实体和关系的 aliases 同时作为同义词，用于把 LLM 输出的类型和关系映射到标准名称（见 utils/triple_normalizer.py）；
+    known_entities 中声明的已知实体及别名用于已知实体索引（见 utils/gazetteer.py）
+
+    属性可以声明类型和索引（见 utils/property_types.py），抽取结果在校验时转换为声明的类型，
+    写入 Neo4j 时为原生类型，声明 index 的属性会建立索引:
+
+        entities:
+          - name: "公司"
+            properties:
+              - "name"
+              - {name: "成立年份", type: "integer", index: true}
+              - {name: "注册资本", type: "float", index: "range"}
+    """
+
+    def __init__(self, entities, relationships, known_entities=None):
+        self.entities = entities
+        self.relationships = relationships
+        self.known_entities = [entity for entity in (known_entities or []) if entity and entity.get('name')]
+
+        # 允许的实体类型和关系类型
+        self.entity_types = [entity['name'] for entity in entities]
+        self.relation_types = [rel['relation'] for rel in relationships]
+
+        # 关系约束映射
+        self.relation_constraints = {}
+        for rel in relationships:
+            self.relation_constraints[rel['relation']] = {
+                'head': rel['head'],
+                'tail': rel['tail']
+            }
+
+        # 实体属性映射：属性名列表、声明了非字符串类型的属性类型和需要建立索引的属性
+        self.entity_properties = {}
+        self.property_types = {}
+        self.property_indexes = []
+        for entity in entities:
+            names = []
+            types = {}
+            for spec in entity.get('properties') or []:
+                name, property_type, index = parse_property_spec(spec)
+                names.append(name)
+                if property_type != TYPE_STRING:
+                    types[name] = property_type
+                if index:
+                    self.property_indexes.append((entity['name'], name, index))
+            self.entity_properties[entity['name']] = names
+            self.property_types[entity['name']] = types
+
+        # 关键词表：类型名本身也作为关键词
+        self.entity_keywords = {}
+        for entity in entities:
+            keywords = [entity['name']] + list(entity.get('keywords', [])) + list(entity.get('aliases', []))
+            self.entity_keywords[entity['name']] = [str(k) for k in keywords if k]
+        self.relation_keywords = {}
+        for rel in relationships:
+            keywords = [rel['relation']] + list(rel.get('keywords', [])) + list(rel.get('aliases', []))
+            self.relation_keywords[rel['relation']] = [str(k) for k in keywords if k]
+
+        # 是否声明了用于裁剪的关键词（只有类型名时无法可靠判断相关性）；只给关系声明关键词时同样启用裁剪
+        self.has_keywords = any(item.get('keywords') or item.get('aliases') for item in entities + relationships)
+
+        self._restrict_cache = {}
+
+    def restrict(self, entity_types):
+        """返回仅包含指定实体类型及其之间关系的子本体（相同类型集合返回同一对象，便于复用提示词前缀）"""
+        entity_types = frozenset(entity_types)
+        if entity_types not in self._restrict_cache:
+            self._restrict_cache[entity_types] = self._build_restricted(entity_types)
+        return self._restrict_cache[entity_types]
+
+    def _build_restricted(self, entity_types):
+        entities = [entity for entity in self.entities if entity['name'] in entity_types]
+        relationships = [rel for rel in self.relationships
+                         if rel['head'] in entity_types and rel['tail'] in entity_types]
+        return CompiledOntology(entities, relationships)
+
+    def format_entity_types(self):
+        return "\n".join([f"- {entity_type}" for entity_type in self.entity_types])
+
+    def format_relation_types(self):
+        return "\n".join([f"- {relation_type}" for relation_type in self.relation_types])
+
+    def format_relation_constraints(self):
+        return "\n".join([f"- {rel}: {constraints['head']} -> {constraints['tail']}"
+                          for rel, constraints in self.relation_constraints.items()])
+
+    def format_entity_properties(self):
+        lines = []
+        for entity, props in self.entity_properties.items():
+            line = f"- {entity}: {props}"
+            types = self.property_types.get(entity)
+            if types:
+                line += f"（类型: {', '.join(f'{name}={property_type}' for name, property_type in types.items())}）"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+@lru_cache(maxsize=32)
+def compile_ontology(ontology):
+    """
+    解析并编译 YAML 本体定义（按 YAML 字符串缓存）
+
+    Args:
+        ontology: YAML 本体定义字符串
+
+    Returns:
+        CompiledOntology
+    """
+    ontology_dict = yaml.safe_load(ontology) or {}
+    # 兼容 entity_types / relations 两种键名
+    entities = ontology_dict.get('entities', ontology_dict.get('entity_types', [])) or []
+    relationships = ontology_dict.get('relationships', ontology_dict.get('relations', [])) or []
+    return CompiledOntology(entities, relationships, ontology_dict.get('known_entities'))
+
+
+def select_relevant_ontology(compiled, text, expand_neighbors=True):
+    """
+    本地预筛选：根据 YAML 中声明的关键词，为文本块挑选可能用到的子本体
+
+    Args:
+        compiled: CompiledOntology
+        text: 文本块内容
+        expand_neighbors: 是否把命中类型的一跳关系及其另一端类型一并保留
+
+    Returns:
+        (子本体, 是否发生了裁剪)。未声明关键词或未命中任何类型时回退到完整本体
+    """
+    if not compiled.has_keywords:
+        return compiled, False
+
+    matched = {entity_type for entity_type, keywords in compiled.entity_keywords.items()
+               if any(keyword in text for keyword in keywords)}
+
+    # 关系关键词命中时，保留关系两端的实体类型
+    for rel in compiled.relationships:
+        if any(keyword in text for keyword in compiled.relation_keywords[rel['relation']]):
+            matched.update([rel['head'], rel['tail']])
+
+    if not matched:
+        return compiled, False
+
+    if expand_neighbors:
+        seeds = set(matched)
+        for rel in compiled.relationships:
+            if rel['head'] in seeds or rel['tail'] in seeds:
+                matched.update([rel['head'], rel['tail']])
+
+    if len(matched) >= len(compiled.entity_types):
+        return compiled, False
+
+    return compiled.restrict(matched), True
@@ -0,0 +1,225 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.build_control import CONTROL_RUNNING, POLL_INTERVAL
+from utils.llm_extractor import process_text_with_llm, generate_cypher, generate_index_cypher
+from utils.tracing import tracer
+from utils.triple_normalizer import NormalizationStats
+from utils.logging_utils import get_logger, chunk_log
+
+
+logger = get_logger("pipeline")
+
+
+class CypherBatchWriter:
+    """
+    把多个文本块的三元组攒成一批再写入 Neo4j，减少会话开销
+
+    batch_size 为每批的三元组数，1 表示每个文本块抽取完成后立即写入；failed_rows 累计写入失败的行数
+    """
+
+    def __init__(self, db_handler, batch_size=1):
+        self.db_handler = db_handler
+        self.batch_size = max(1, int(batch_size or 1))
+        self.failed_rows = 0
+        self._pending = []
+
+    def add(self, triples):
+        self._pending.extend(triples)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.failed_rows += self.db_handler.execute_cypher(generate_cypher(self._pending)) or 0
+            self._pending = []
+
+
+def _extract_record(record, ontology, api_key, model_name, router, gazetteer, extract_options):
+    """
+    抽取单个文本块，开启追踪时记录为按 chunk 标记的 span
+
+    Returns:
+        (三元组列表, 产出结果的模型名称)，被已知实体索引跳过时模型为 None
+    """
+    with tracer.span("extract_chunk", chunk_id=record["chunk_id"], doc=record["doc"]) as span:
+        if gazetteer is not None:
+            with tracer.span("gazetteer_scan"):
+                skip, hints = gazetteer.annotate(record["text"])
+            if skip:
+                span.set(triples=0, skipped=True)
+                chunk_log.record(chunk_id=record["chunk_id"], doc=record["doc"], skipped=True)
+                return [], None
+            if hints:
+                extract_options = dict(extract_options, hints=hints)
+        if chunk_log.enabled:
+            extract_options = dict(extract_options, log_context={"chunk_id": record["chunk_id"], "doc": record["doc"]})
+        if router is not None:
+            result = {}
+            triples = router.extract(record["text"], ontology, api_key, result=result, **extract_options)
+            model_name = result.get("model")
+        else:
+            triples = process_text_with_llm(record["text"], ontology, api_key, model_name, **extract_options)
+        span.set(triples=len(triples))
+    return triples, model_name
+
+
+def extract_corpus(records, ontology, api_key, model_name="glm-4-flash", max_workers=4, router=None,
+                   gazetteer=None, control=None, **extract_options):
+    """
+    在整个语料上调度知识抽取：所有文档的文本块进入同一个全局队列，
+    线程池始终保持 max_workers 个在途 LLM 请求，不会因单个文档处理完毕而出现空档
+
+    Args:
+        records: 文本块记录的列表或迭代器（load_corpus / iter_corpus_records），按需惰性拉取
+        ontology: YAML 本体定义字符串
+        api_key: LLM API Key
+        model_name: 模型名称
+        max_workers: 并发 LLM 请求数
+        router: 可选 CascadeRouter，指定时按级联策略选择模型（忽略 model_name）
+        gazetteer: 可选 Gazetteer，在本地扫描文本块，按策略跳过没有候选实体的文本块并附加已知实体提示
+        control: 可选 BuildControl，暂停时停止派发新的文本块，取消时在 cancel_timeout 内等待在途请求后结束
+        extract_options: 透传给 process_text_with_llm 的其他参数（如 prune_schema）
+
+    Yields:
+        (文本块记录, 三元组列表)，按完成顺序产出；产出的记录是原记录的副本，附带 "model"（产出结果的模型，
+        级联路由时为最终采用的那一级，被跳过的文本块为 None）
+    """
+    queue = iter(records)
+    max_workers = max(1, max_workers)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    in_flight = {}
+    exhausted = False
+
+    def fill():
+        nonlocal exhausted
+        while not exhausted and len(in_flight) < max_workers:
+            # 暂停或取消后不再派发新的文本块，语料迭代位置保留
+            if control is not None and control.state != CONTROL_RUNNING:
+                return
+            record = next(queue, None)
+            if record is None:
+                exhausted = True
+                return
+            future = executor.submit(_extract_record, record, ontology, api_key, model_name, router,
+                                     gazetteer, extract_options)
+            in_flight[future] = record
+
+    try:
+        fill()
+        while in_flight or (control is not None and control.paused and not exhausted):
+            if not in_flight:
+                # 暂停且在途请求已全部完成：阻塞到恢复或取消
+                control.wait_while_paused()
+                fill()
+                continue
+            timeout = None
+            if control is not None:
+                deadline = control.cancel_deadline()
+                timeout = POLL_INTERVAL if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if control.cancelled and time.monotonic() >= control.cancel_deadline():
+                    logger.warning("取消构建: 放弃 %s 个超过 %ss 仍未完成的在途请求", len(in_flight),
+                                   control.cancel_timeout)
+                    break
+                fill()
+                continue
+            for future in done:
+                record = in_flight.pop(future)
+                try:
+                    triples, model = future.result()
+                except Exception as e:
+                    logger.error("Chunk %s 抽取失败: %s", record["chunk_id"], e)
+                    triples, model = [], None
+                # 先补充新任务再交出结果，调用方处理结果时线程池仍保持满载
+                fill()
+                yield dict(record, model=model), triples
+    finally:
+        if control is not None:
+            control.mark_stopped(abandoned=len(in_flight))
+        # 正常结束时 in_flight 为空；取消超时或调用方提前关闭生成器时不等待剩余请求（其结果被丢弃）
+        executor.shutdown(wait=not in_flight, cancel_futures=True)
+
+
+def build_graph(records, ontology, api_key, model_name, db_handler, max_workers=4, on_progress=None,
+                triple_store=None, router=None, gazetteer=None, resolver=None, normalization_stats=None,
+                write_batch_size=1, exporter=None, create_indexes=True, control=None, **extract_options):
+    """
+    完整的构建流程：调度抽取、生成 Cypher 并写入 Neo4j（不依赖界面，供命令行和后台任务复用）
+
+    Args:
+        records: 文本块记录的列表或迭代器
+        ontology: YAML 本体定义字符串
+        api_key: LLM API Key
+        model_name: 模型名称
+        db_handler: Neo4jHandler
+        max_workers: 并发 LLM 请求数
+        on_progress: 可选回调 on_progress(record, triples, processed_chunks, total_triples)
+        triple_store: 可选 TripleStore，以紧凑形式保留本次构建的全部三元组（按 chunk_id 记录来源）
+        router: 可选 CascadeRouter，按级联策略选择模型
+        gazetteer: 可选 Gazetteer，按策略跳过没有候选实体的文本块
+        resolver: 可选 EntityResolver，写入前把实体名称归并到规范名称
+        normalization_stats: 可选 NormalizationStats，默认为本次构建新建一个，汇总三元组规范化的计数
+        write_batch_size: 每次写入 Neo4j 的三元组数（攒够后再写，见 CypherBatchWriter）
+        exporter: 可选三元组导出器（见 utils/triple_exporter.py），流式写出通过校验（及实体消解后）的三元组
+        create_indexes: 构建前按本体建立 name 和可查询属性的索引（IF NOT EXISTS）
+        control: 可选 BuildControl，支持暂停/恢复和协作式取消；取消后已抽取的三元组照常写入和导出
+        extract_options: 透传给 process_text_with_llm 的其他参数
+
+    Returns:
+        统计信息字典 {"total_chunks", "total_triples", "efficiency", "normalization", "write_failures"}（写入 Neo4j 失败的行数），使用级联路由时包含 "routing"，
+        使用已知实体索引时包含 "gazetteer"，使用实体消解时包含 "entity_resolution"，导出三元组时包含 "export"，
+        传入 control 时包含 "cancelled" 和 "control"（取消延迟、放弃的在途请求数等）
+    """
+    if normalization_stats is None:
+        normalization_stats = NormalizationStats()
+    if create_indexes:
+        db_handler.execute_cypher(generate_index_cypher(ontology))
+    writer = CypherBatchWriter(db_handler, write_batch_size)
+    total_chunks = 0
+    total_triples = 0
+    try:
+        for record, triples in extract_corpus(records, ontology, api_key, model_name,
+                                              max_workers=max_workers, router=router, gazetteer=gazetteer,
+                                              normalization_stats=normalization_stats, control=control,
+                                              **extract_options):
+            total_chunks += 1
+            total_triples += len(triples)
+            if triples:
+                if resolver is not None:
+                    with tracer.span("entity_resolution", triples=len(triples)):
+                        resolver.resolve_triples(triples)
+                writer.add(triples)
+                if exporter is not None:
+                    exporter.write(triples, record, record["model"])
+                if triple_store is not None:
+                    triple_store.extend(triples, source=record["chunk_id"])
+            if on_progress is not None:
+                on_progress(record, triples, total_chunks, total_triples)
+    finally:
+        # 抽取、回调或写入中途出错时也写入已缓冲的三元组（它们已流式写入导出文件），保持 Neo4j 与导出一致
+        writer.flush()
+        if resolver is not None:
+            resolver.flush()
+        if exporter is not None:
+            exporter.flush()
+
+    stats = {
+        "total_chunks": total_chunks,
+        "total_triples": total_triples,
+        "efficiency": round(total_triples / total_chunks, 2) if total_chunks > 0 else 0,
+        "normalization": normalization_stats.summary(),
+        "write_failures": writer.failed_rows
+    }
+    if router is not None:
+        stats["routing"] = router.summary()
+    if gazetteer is not None:
+        stats["gazetteer"] = gazetteer.summary()
+    if resolver is not None:
+        stats["entity_resolution"] = resolver.summary()
+    if exporter is not None:
+        stats["export"] = exporter.summary()
+    if control is not None:
+        stats["cancelled"] = control.cancelled
+        stats["control"] = control.summary()
+    return stats
@@ -0,0 +1,151 @@
+import re
+import unicodedata
+from datetime import date, datetime
+
+
+# YAML 本体中可声明的属性类型（未声明时为 string，与此前全部按字符串写入一致）
+TYPE_STRING = "string"
+TYPE_INTEGER = "integer"
+TYPE_FLOAT = "float"
+TYPE_BOOLEAN = "boolean"
+TYPE_DATE = "date"
+TYPE_DATETIME = "datetime"
+PROPERTY_TYPES = (TYPE_STRING, TYPE_INTEGER, TYPE_FLOAT, TYPE_BOOLEAN, TYPE_DATE, TYPE_DATETIME)
+
+# 可查询属性的索引类型：range 支持等值、范围和前缀查询，text 支持 CONTAINS / ENDS WITH
+INDEX_RANGE = "range"
+INDEX_TEXT = "text"
+INDEX_KINDS = (INDEX_RANGE, INDEX_TEXT)
+
+_NUMBER_SEPARATOR_PATTERN = re.compile(r'[,_\s]')
+_INTEGER_PATTERN = re.compile(r'[-+]?\d+')
+_FLOAT_PATTERN = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?')
+_DATE_PATTERN = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?')
+_TRUE_VALUES = {"true", "yes", "y", "1", "是", "对", "真"}
+_FALSE_VALUES = {"false", "no", "n", "0", "否", "不是", "假"}
+
+
+def parse_property_spec(spec):
+    """
+    解析 YAML 中的属性声明
+
+    支持两种写法:
+        properties:
+          - "name"                                   # 字符串属性，不建索引
+          - {name: "founded", type: "integer", index: true}
+          - {name: "description", index: "text"}
+
+    index 为 true 时字符串属性建 text 索引，其他类型建 range 索引
+
+    Returns:
+        (属性名, 类型, 索引类型或 None)
+    """
+    if not isinstance(spec, dict):
+        return str(spec), TYPE_STRING, None
+    name = str(spec.get('name', ''))
+    if not name:
+        raise ValueError(f"属性声明缺少 name: {spec}")
+    property_type = str(spec.get('type') or TYPE_STRING).lower()
+    if property_type not in PROPERTY_TYPES:
+        raise ValueError(f"属性 {name} 的类型 {property_type} 不受支持（可选 {', '.join(PROPERTY_TYPES)}）")
+    index = spec.get('index')
+    if index is True:
+        index = INDEX_TEXT if property_type == TYPE_STRING else INDEX_RANGE
+    elif index:
+        index = str(index).lower()
+        if index not in INDEX_KINDS:
+            raise ValueError(f"属性 {name} 的索引类型 {index} 不受支持（可选 {', '.join(INDEX_KINDS)}）")
+    else:
+        index = None
+    return name, property_type, index
+
+
+def _clean_text(value):
+    return unicodedata.normalize("NFKC", value).strip()
+
+
+def _to_integer(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        raise ValueError(f"不是整数: {value}")
+    text = _NUMBER_SEPARATOR_PATTERN.sub("", _clean_text(str(value)))
+    if _INTEGER_PATTERN.fullmatch(text):
+        return int(text)
+    if _FLOAT_PATTERN.fullmatch(text) and float(text).is_integer():
+        return int(float(text))
+    raise ValueError(f"不是整数: {value}")
+
+
+def _to_float(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = _NUMBER_SEPARATOR_PATTERN.sub("", _clean_text(str(value)))
+    if _FLOAT_PATTERN.fullmatch(text):
+        return float(text)
+    raise ValueError(f"不是数值: {value}")
+
+
+def _to_boolean(value):
+    if isinstance(value, int):
+        if value in (0, 1):
+            return bool(value)
+        raise ValueError(f"不是布尔值: {value}")
+    text = _clean_text(str(value)).lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(f"不是布尔值: {value}")
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    match = _DATE_PATTERN.fullmatch(_clean_text(str(value)))
+    if match:
+        return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    raise ValueError(f"不是日期: {value}")
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = _clean_text(str(value))
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return _to_datetime(_to_date(text))
+
+
+_CONVERTERS = {
+    TYPE_STRING: lambda value: value if isinstance(value, str) else str(value),
+    TYPE_INTEGER: _to_integer,
+    TYPE_FLOAT: _to_float,
+    TYPE_BOOLEAN: _to_boolean,
+    TYPE_DATE: _to_date,
+    TYPE_DATETIME: _to_datetime
+}
+
+
+def coerce_value(value, property_type=TYPE_STRING):
+    """
+    把 LLM 输出的属性值转换为声明的类型（neo4j 驱动把 int/float/bool/date/datetime 写为原生类型）
+
+    "1,200"、"1998" 可转换为整数，"2020年1月5日"、"2020/01/05" 可转换为日期；
+    布尔值不会被当作数值（True 不会变成 1）
+
+    Raises:
+        ValueError: 无法转换
+    """
+    if isinstance(value, bool) and property_type not in (TYPE_STRING, TYPE_BOOLEAN):
+        raise ValueError(f"布尔值不能转换为 {property_type}")
+    if isinstance(value, (dict, list)) and property_type != TYPE_STRING:
+        raise ValueError(f"{type(value).__name__} 不能转换为 {property_type}")
+    return _CONVERTERS[property_type](value)
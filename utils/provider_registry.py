@@ -0,0 +1,188 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+import yaml
+
+
+# 默认注册表位置（可通过环境变量 KG_PROVIDERS 覆盖）
+DEFAULT_PROVIDERS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                      "config", "providers.yaml")
+
+_PROVIDER_DEFAULTS = {
+    "max_concurrency": 8,
+    "rpm": None,
+    "tpm": None,
+    "timeout": 120,
+    "context_window": None,
+    "json_mode": False
+}
+
+
+class UnknownModelError(ValueError):
+    """模型未在注册表中声明"""
+
+
+class RateLimiter:
+    """令牌桶限流：同时限制每分钟请求数（rpm）和每分钟 token 数（tpm），未设置的维度不限制"""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._requests = float(rpm or 0)
+        self._tokens = float(tpm or 0)
+        self._last = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0):
+        """阻塞直到额度足够，然后扣除一次请求和 tokens 个 token"""
+        if not self.rpm and not self.tpm:
+            return
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                # 单个请求超过整分钟额度时按整分钟额度计，避免永远等待
+                needed_tokens = min(tokens, self.tpm) if self.tpm else 0
+                wait = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < needed_tokens:
+                    wait = max(wait, (needed_tokens - self._tokens) * 60 / self.tpm)
+                if wait == 0.0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= needed_tokens
+                    return
+            time.sleep(wait)
+
+
+class ProviderConfig:
+    """一个服务商接口的连接和吞吐配置，并发信号量和限流器在使用该接口的所有请求间共享"""
+
+    def __init__(self, key, data):
+        settings = dict(_PROVIDER_DEFAULTS)
+        settings.update({k: v for k, v in data.items() if k != "models"})
+        self.key = key
+        self.name = settings.get("name", key)
+        self.base_url = settings.get("base_url")
+        self.api_key_label = settings.get("api_key_label", f"{self.name} API Key")
+        self.max_concurrency = int(settings["max_concurrency"])
+        self.rpm = settings["rpm"]
+        self.tpm = settings["tpm"]
+        self.timeout = settings["timeout"]
+        self.context_window = settings["context_window"]
+        self.json_mode = bool(settings["json_mode"])
+        if not self.base_url:
+            raise ValueError(f"服务商 {key} 缺少 base_url")
+        self._semaphore = threading.BoundedSemaphore(max(1, self.max_concurrency))
+        self._limiter = RateLimiter(self.rpm, self.tpm)
+
+    @contextmanager
+    def throttle(self, tokens=0):
+        """在并发上限和 RPM/TPM 限制内执行一次请求"""
+        with self._semaphore:
+            self._limiter.acquire(tokens)
+            yield
+
+
+class ModelConfig:
+    """一个模型的请求配置（未声明的字段继承自所属服务商）"""
+
+    def __init__(self, provider, data):
+        self.provider = provider
+        self.name = data["name"]
+        self.label = data.get("label", self.name)
+        self.base_url = provider.base_url
+        self.context_window = data.get("context_window", provider.context_window)
+        self.json_mode = bool(data.get("json_mode", provider.json_mode))
+        self.timeout = data.get("timeout", provider.timeout)
+        self.price = tuple(data["price"]) if data.get("price") is not None else None
+
+    def with_base_url(self, base_url):
+        """指定其他接口地址时使用独立的、不限流的服务商配置"""
+        return ModelConfig(_custom_provider(base_url), {
+            "name": self.name,
+            "label": self.label,
+            "context_window": self.context_window,
+            "json_mode": False,
+            "timeout": self.timeout
+        })
+
+
+@lru_cache(maxsize=32)
+def _custom_provider(base_url):
+    return ProviderConfig("custom", {"name": "自定义接口", "base_url": base_url, "max_concurrency": 1024})
+
+
+class ProviderRegistry:
+    """从 YAML 加载的服务商注册表，界面的模型列表和抽取器的连接参数都来自这里"""
+
+    def __init__(self, data):
+        self.providers = {}
+        self._models = {}
+        for key, provider_data in (data.get("providers") or {}).items():
+            provider = ProviderConfig(key, provider_data)
+            self.providers[key] = provider
+            for model_data in provider_data.get("models") or []:
+                model = ModelConfig(provider, model_data)
+                if model.name in self._models:
+                    raise ValueError(f"模型 {model.name} 在多个服务商中重复声明")
+                self._models[model.name] = model
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(yaml.safe_load(f) or {})
+
+    def get(self, model_name):
+        """查找模型配置，未声明的模型抛出 UnknownModelError（不再静默回退到默认模型）"""
+        model = self._models.get(model_name)
+        if model is None:
+            raise UnknownModelError(f"模型 {model_name} 未在服务商注册表中声明，可用模型: {', '.join(self._models)}")
+        return model
+
+    def resolve(self, model_name, api_base=None):
+        """获取请求使用的模型配置；指定 api_base 时允许使用注册表之外的模型（如本地模拟服务）"""
+        if api_base:
+            model = self._models.get(model_name)
+            if model is None:
+                return ModelConfig(_custom_provider(api_base), {"name": model_name})
+            return model.with_base_url(api_base)
+        return self.get(model_name)
+
+    def __contains__(self, model_name):
+        return model_name in self._models
+
+    def models(self):
+        return list(self._models.values())
+
+    def ui_options(self):
+        """界面模型下拉框的选项"""
+        return [{
+            "name": model.label,
+            "key": f"{model.provider.key}:{model.name}",
+            "model_name": model.name,
+            "api_key_label": model.provider.api_key_label,
+            "provider": model.provider.key,
+            "max_concurrency": model.provider.max_concurrency
+        } for model in self._models.values()]
+
+
+@lru_cache(maxsize=4)
+def _load_registry(path):
+    return ProviderRegistry.from_file(path)
+
+
+def get_registry(path=None):
+    """加载（并缓存）服务商注册表"""
+    return _load_registry(path or os.environ.get("KG_PROVIDERS") or DEFAULT_PROVIDERS_PATH)
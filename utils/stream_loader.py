@@ -0,0 +1,224 @@
+import re
+import csv
+import json
+import mmap
+from contextlib import contextmanager
+from utils.doc_loader import clean_special_characters
+
+
+# 可流式解析的纯文本格式
+STREAMABLE_FILE_TYPES = ['txt', 'md', 'csv', 'jsonl']
+
+# 单条记录的最大字节数，超长段落/行会被拆分，保证内存占用只与窗口大小相关
+MAX_RECORD_BYTES = 64 * 1024
+
+_PARAGRAPH_BREAK = re.compile(rb'\n[ \t\r]*\n')
+_LINE_BREAK = re.compile(rb'\n')
+
+
+@contextmanager
+def open_buffer(file_obj):
+    """
+    以只读缓冲区的形式打开文件：本地文件使用内存映射，上传的内存文件直接复用其字节内容
+
+    Args:
+        file_obj: 本地文件路径，或带 name 属性的文件对象
+
+    Yields:
+        支持切片和正则扫描的缓冲区（mmap 或 bytes）
+    """
+    if isinstance(file_obj, str):
+        with open(file_obj, 'rb') as f:
+            with open_buffer(f) as buffer:
+                yield buffer
+        return
+
+    try:
+        fileno = file_obj.fileno()
+    except (AttributeError, OSError, ValueError):
+        fileno = None
+
+    if fileno is None:
+        # 内存中的文件对象（如 Streamlit 上传文件），内容本就在内存中
+        yield file_obj.getvalue() if hasattr(file_obj, 'getvalue') else file_obj.read()
+        return
+
+    try:
+        buffer = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # 空文件无法映射
+        yield b''
+        return
+    try:
+        yield buffer
+    finally:
+        buffer.close()
+
+
+def _utf8_boundary(buffer, pos, start):
+    """向前调整切分位置，避免切断多字节 UTF-8 字符"""
+    while pos > start and (buffer[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+def _split_record(buffer, start, end):
+    """按换行和固定窗口拆分超长记录"""
+    if end - start <= MAX_RECORD_BYTES:
+        yield start, end
+        return
+    pos = start
+    while pos < end:
+        cut = min(pos + MAX_RECORD_BYTES, end)
+        if cut < end:
+            newline = buffer.rfind(b'\n', pos, cut)
+            cut = newline + 1 if newline > pos else _utf8_boundary(buffer, cut, pos)
+            if cut <= pos:
+                # 整个窗口都是 UTF-8 续字节（非法字节序列），按窗口硬切，解码时替换为 U+FFFD，避免原地循环
+                cut = min(pos + MAX_RECORD_BYTES, end)
+        yield pos, cut
+        pos = cut
+
+
+def iter_record_spans(buffer, separator):
+    """
+    扫描记录边界，只产出 (起始偏移, 结束偏移)，不复制缓冲区内容
+
+    Args:
+        buffer: mmap 或 bytes
+        separator: 记录分隔符的正则（段落或行）
+    """
+    pos = 0
+    size = len(buffer)
+    for match in separator.finditer(buffer):
+        if match.start() > pos:
+            yield from _split_record(buffer, pos, match.start())
+        pos = match.end()
+    if pos < size:
+        yield from _split_record(buffer, pos, size)
+
+
+def _jsonl_text(line, text_field=None):
+    """从一行 JSONL 中提取文本：优先使用指定字段或常见文本字段，否则拼接所有字符串值"""
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError:
+        return line
+    if isinstance(data, str):
+        return data
+    if not isinstance(data, dict):
+        return ""
+    for field in ([text_field] if text_field else ['text', 'content', 'body']):
+        if isinstance(data.get(field), str):
+            return data[field]
+    return " ".join(str(v) for v in data.values() if isinstance(v, (str, int, float)))
+
+
+def _iter_csv_rows(buffer):
+    """
+    逐行解码后交给 csv.reader：引号内包含换行的字段会跨多个物理行拼接为一条记录；
+    单个字段超过 csv.field_size_limit()（如引号未闭合）时抛出 csv.Error，内存占用仍有上限
+    """
+    lines = (bytes(buffer[start:end]).decode('utf-8', errors='replace') + "\n"
+             for start, end in iter_record_spans(buffer, _LINE_BREAK))
+    for row in csv.reader(lines):
+        yield " ".join(cell.strip() for cell in row if cell.strip())
+
+
+def iter_text_records(file_obj, file_type, text_field=None):
+    """
+    惰性读取纯文本类文档的记录（段落、行或 CSV 行），每次只解码一条记录
+
+    Args:
+        file_obj: 本地文件路径或文件对象
+        file_type: txt / md / csv / jsonl
+        text_field: JSONL 中存放正文的字段名
+
+    Yields:
+        记录文本
+    """
+    with open_buffer(file_obj) as buffer:
+        if file_type == 'csv':
+            for text in _iter_csv_rows(buffer):
+                if text:
+                    yield text
+            return
+        separator = _PARAGRAPH_BREAK if file_type in ['txt', 'md'] else _LINE_BREAK
+        for start, end in iter_record_spans(buffer, separator):
+            text = bytes(buffer[start:end]).decode('utf-8', errors='replace').strip()
+            if not text:
+                continue
+            if file_type == 'jsonl':
+                text = _jsonl_text(text, text_field)
+            if text.strip():
+                yield text
+
+
+def stream_segmentation(records, max_chunk_size=2000, min_chunk_size=500):
+    """
+    流式智能切分：与 smart_text_segmentation 的合并规则一致，但逐条消费记录，
+    只保留当前块和上一个待定块，内存占用与文件大小无关
+
+    Args:
+        records: 记录文本的可迭代对象
+        max_chunk_size: 最大块大小（字符数）
+        min_chunk_size: 最小块大小（字符数）
+
+    Yields:
+        文本块
+    """
+    current_chunk = ""
+    # 保留上一个完成的块，以便把末尾过小的块合并进去
+    pending_chunk = None
+
+    def pieces(record):
+        cleaned = clean_special_characters(record)
+        if len(cleaned) <= max_chunk_size:
+            if cleaned:
+                yield cleaned
+            return
+        # 过长的记录按句子拆分，句子仍超长时按固定长度切分
+        for sentence in re.split(r'(?<=[。！？!?])', cleaned):
+            sentence = sentence.strip()
+            while len(sentence) > max_chunk_size:
+                yield sentence[:max_chunk_size]
+                sentence = sentence[max_chunk_size:]
+            if sentence:
+                yield sentence
+
+    for record in records:
+        for piece in pieces(record):
+            if len(current_chunk) + len(piece) + 1 > max_chunk_size and current_chunk:
+                if pending_chunk is not None:
+                    yield pending_chunk
+                pending_chunk = current_chunk
+                current_chunk = piece
+            else:
+                current_chunk = f"{current_chunk} {piece}" if current_chunk else piece
+
+    if current_chunk:
+        if pending_chunk is not None and len(current_chunk) < min_chunk_size:
+            current_chunk = pending_chunk + " " + current_chunk
+        elif pending_chunk is not None:
+            yield pending_chunk
+        yield current_chunk
+    elif pending_chunk is not None:
+        yield pending_chunk
+
+
+def iter_document_chunks(file_obj, file_type, max_chunk_size=2000, min_chunk_size=500, text_field=None):
+    """
+    惰性加载并切分纯文本类文档
+
+    Args:
+        file_obj: 本地文件路径或文件对象
+        file_type: txt / md / csv / jsonl
+        max_chunk_size: 最大块大小（字符数）
+        min_chunk_size: 最小块大小（字符数）
+        text_field: JSONL 中存放正文的字段名
+
+    Yields:
+        文本块
+    """
+    records = iter_text_records(file_obj, file_type, text_field)
+    yield from stream_segmentation(records, max_chunk_size, min_chunk_size)
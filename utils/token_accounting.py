@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import math
+import threading
+from functools import lru_cache
+
+
+# 吞吐观测记录的默认位置
+DEFAULT_THROUGHPUT_PATH = os.path.join(".kgbuilder", "throughput.json")
+
+# 没有观测数据时的默认假设
+DEFAULT_COMPLETION_TOKENS = 400
+DEFAULT_LATENCY_SECONDS = 8.0
+
+# 各模型系列分词器的近似比例：(每个中日韩字符的 token 数, 每个 token 的其他字符数)
+FAMILY_TOKEN_RATIOS = {
+    "openai": (1.2, 4.0),
+    "glm": (0.7, 4.0),
+    "qwen": (0.7, 4.0),
+    "claude": (1.3, 3.5),
+    "gemini": (0.8, 4.0),
+    "llama": (1.0, 4.0),
+    "other": (1.0, 4.0)
+}
+
+# 参考价格（美元 / 百万 tokens）：(输入, 输出)，未列出的模型视为价格未知；价格会变动，请按服务商最新报价调整
+MODEL_PRICES = {
+    "glm-4-flash": (0.0, 0.0),
+    "glm-4": (14.0, 14.0),
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "gpt-3.5-turbo-16k": (3.0, 4.0),
+    "qwen-turbo": (0.3, 0.9),
+    "qwen-plus": (0.6, 1.7),
+    "qwen-max": (5.5, 16.5),
+    "claude-3-opus": (15.0, 75.0),
+    "claude-3-sonnet": (3.0, 15.0),
+    "claude-3-haiku": (0.25, 1.25),
+    "gemini-pro": (0.5, 1.5)
+}
+
+# 同一进程内的多个构建任务可能同时写观测文件
+_THROUGHPUT_LOCK = threading.Lock()
+
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]')
+
+
+def model_family(model_name):
+    """根据模型名称判断所属系列"""
+    name = (model_name or "").lower()
+    for prefix, family in (("gpt-", "openai"), ("o1", "openai"), ("glm", "glm"), ("qwen", "qwen"),
+                           ("claude", "claude"), ("gemini", "gemini"), ("llama", "llama")):
+        if name.startswith(prefix):
+            return family
+    return "other"
+
+
+@lru_cache(maxsize=16)
+def _tiktoken_encoding(model_name):
+    """OpenAI 系列优先使用 tiktoken（可选依赖），未安装时返回 None"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model_name=None):
+    """
+    在本地统计文本的 token 数
+
+    OpenAI 系列在安装 tiktoken 时精确计数，其他模型按系列的字符比例估算
+    """
+    if not text:
+        return 0
+    family = model_family(model_name)
+    if family == "openai":
+        encoding = _tiktoken_encoding(model_name)
+        if encoding is not None:
+            return len(encoding.encode(text))
+    cjk_ratio, chars_per_token = FAMILY_TOKEN_RATIOS[family]
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return int(math.ceil(cjk_count * cjk_ratio + (len(text) - cjk_count) / chars_per_token))
+
+
+def model_price(model_name):
+    """查找模型价格：优先使用服务商注册表中声明的 price，其次按内置价格表的最长前缀匹配（支持带日期等后缀的模型名）"""
+    from utils.provider_registry import get_registry
+    registry = get_registry()
+    if model_name in registry and registry.get(model_name).price is not None:
+        return registry.get(model_name).price
+    if model_name in MODEL_PRICES:
+        return MODEL_PRICES[model_name]
+    matches = [name for name in MODEL_PRICES if model_name and model_name.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model_name, prompt_tokens, completion_tokens):
+    """按参考价格估算费用（美元），价格未知时返回 None"""
+    price = model_price(model_name)
+    if price is None:
+        return None
+    input_price, output_price = price
+    return round((prompt_tokens * input_price + completion_tokens * output_price) / 1e6, 4)
+
+
+class ThroughputStore:
+    """
+    按模型保存真实构建中观测到的用量和延迟，用于预估输出 tokens 和耗时
+
+    文件格式: {model: {"requests", "prompt_tokens", "completion_tokens", "latency_seconds", "latency_requests"}}
+    """
+
+    _FIELDS = ("requests", "prompt_tokens", "completion_tokens", "latency_seconds", "latency_requests")
+
+    def __init__(self, path=DEFAULT_THROUGHPUT_PATH):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, usage_tracker):
+        """把一次构建的 UsageTracker 按模型累加到观测记录中"""
+        with _THROUGHPUT_LOCK:
+            data = self.load()
+            for model_name, stats in usage_tracker.by_model.items():
+                observed = data.setdefault(model_name, {field: 0 for field in self._FIELDS})
+                for field in self._FIELDS:
+                    observed[field] = observed.get(field, 0) + stats.get(field, 0)
+            path_dir = os.path.dirname(self.path)
+            if path_dir:
+                os.makedirs(path_dir, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def model_profile(self, model_name):
+        """
+        返回模型的平均输出 tokens 和平均延迟
+
+        Returns:
+            {"completion_tokens", "latency_seconds", "observed"}，没有观测时使用默认假设
+        """
+        observed = self.load().get(model_name)
+        if not observed or not observed.get("requests"):
+            return {"completion_tokens": DEFAULT_COMPLETION_TOKENS, "latency_seconds": DEFAULT_LATENCY_SECONDS,
+                    "observed": False}
+        latency_requests = observed.get("latency_requests") or 0
+        return {
+            "completion_tokens": observed["completion_tokens"] / observed["requests"],
+            "latency_seconds": (observed["latency_seconds"] / latency_requests
+                                if latency_requests else DEFAULT_LATENCY_SECONDS),
+            "observed": True
+        }
+
+
+def plan_build(records, ontology, model_name, max_workers=4, prune_schema=False, throughput_store=None,
+               sample_prompts=1, gazetteer=None):
+    """
+    试运行（不调用 LLM）：渲染每个文本块的完整提示词，统计 token 并预估费用和耗时
+
+    Args:
+        records: 文本块记录的列表或迭代器
+        ontology: YAML 本体定义字符串
+        model_name: 模型名称（决定分词方式、价格和吞吐观测）
+        max_workers: 计划使用的并发 LLM 请求数
+        prune_schema: 是否按文本块裁剪本体（与正式构建保持一致）
+        throughput_store: ThroughputStore，默认读取 DEFAULT_THROUGHPUT_PATH
+        sample_prompts: 在结果中保留的完整提示词样例数量
+        gazetteer: 可选 Gazetteer，按其跳过策略排除不会发给 LLM 的文本块，并计入已知实体提示
+
+    Returns:
+        预估结果字典
+    """
+    from utils.llm_extractor import build_prompt_prefix, build_extraction_prompt
+    from utils.ontology import compile_ontology, select_relevant_ontology
+
+    compiled = compile_ontology(ontology)
+    profile = (throughput_store or ThroughputStore()).model_profile(model_name)
+    prefix_tokens = {}
+    documents = {}
+    samples = []
+    chunks = 0
+    skipped_chunks = 0
+    input_tokens = 0
+    max_prompt_tokens = 0
+
+    for record in records:
+        hints = None
+        if gazetteer is not None:
+            skip, hints = gazetteer.annotate(record["text"])
+            if skip:
+                skipped_chunks += 1
+                continue
+        prompt_ontology = compiled
+        if prune_schema:
+            prompt_ontology, _ = select_relevant_ontology(compiled, record["text"])
+        prefix = build_prompt_prefix(prompt_ontology)
+        if prefix not in prefix_tokens:
+            prefix_tokens[prefix] = count_tokens(prefix, model_name)
+        prompt = build_extraction_prompt(record["text"], prompt_ontology, hints)
+        # 静态前缀只计数一次，每个文本块只需统计前缀之后的部分
+        prompt_tokens = prefix_tokens[prefix] + count_tokens(prompt[len(prefix):], model_name)
+
+        chunks += 1
+        input_tokens += prompt_tokens
+        max_prompt_tokens = max(max_prompt_tokens, prompt_tokens)
+        doc = documents.setdefault(record["doc"], {"doc": record["doc"], "chunks": 0, "input_tokens": 0})
+        doc["chunks"] += 1
+        doc["input_tokens"] += prompt_tokens
+        if len(samples) < sample_prompts:
+            samples.append(prompt)
+
+    output_tokens = int(round(chunks * profile["completion_tokens"]))
+    return {
+        "model": model_name,
+        "chunks": chunks,
+        "skipped_chunks": skipped_chunks,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "avg_prompt_tokens": round(input_tokens / chunks, 1) if chunks else 0,
+        "max_prompt_tokens": max_prompt_tokens,
+        "estimated_cost": estimate_cost(model_name, input_tokens, output_tokens),
+        # 所有请求以 max_workers 并发、按平均延迟完成（不含限流）
+        "estimated_seconds": round(math.ceil(chunks / max(1, max_workers)) * profile["latency_seconds"], 1),
+        "profile_observed": profile["observed"],
+        "documents": list(documents.values()),
+        "sample_prompts": samples
+    }
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+
+class _NullSpan:
+    """关闭追踪时返回的空上下文，不记录任何数据"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, end, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """在 span 结束前补充属性（如三元组数量）"""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    轻量级分阶段计时器：记录每个 span 的耗时和次数，
+    可导出 Chrome trace (chrome://tracing / Perfetto) 和 Prometheus 文本格式。
+    关闭时 span() 直接返回共享的空上下文，开销可忽略。
+    """
+
+    def __init__(self, enabled=False, max_events=200000):
+        self.enabled = enabled
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self.events = []
+        self.stats = {}
+        self.dropped_events = 0
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, attrs)
+
+    def _record(self, name, start, end, attrs):
+        duration = end - start
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = {"count": 0, "total_ns": 0, "min_ns": duration, "max_ns": duration}
+            stats["count"] += 1
+            stats["total_ns"] += duration
+            stats["min_ns"] = min(stats["min_ns"], duration)
+            stats["max_ns"] = max(stats["max_ns"], duration)
+            # 超过上限时只保留聚合统计，避免超大构建的追踪数据占满内存
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, duration, threading.get_ident(), attrs))
+            else:
+                self.dropped_events += 1
+
+    def reset(self):
+        with self._lock:
+            self._origin = time.perf_counter_ns()
+            self.events = []
+            self.stats = {}
+            self.dropped_events = 0
+
+    def summary(self):
+        """各阶段的次数、总耗时和平均耗时（毫秒）"""
+        with self._lock:
+            items = list(self.stats.items())
+        return [{
+            "stage": name,
+            "count": stats["count"],
+            "total_ms": round(stats["total_ns"] / 1e6, 3),
+            "avg_ms": round(stats["total_ns"] / stats["count"] / 1e6, 3),
+            "min_ms": round(stats["min_ns"] / 1e6, 3),
+            "max_ms": round(stats["max_ns"] / 1e6, 3)
+        } for name, stats in sorted(items, key=lambda item: -item[1]["total_ns"])]
+
+    def chrome_trace(self):
+        """生成 Chrome trace 事件格式的字典"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace_events = [{
+            "name": name,
+            "ph": "X",
+            "ts": (start - self._origin) / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": {key: value if isinstance(value, (int, float, bool)) else str(value)
+                     for key, value in attrs.items()}
+        } for name, start, duration, tid, attrs in events]
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": self.dropped_events}}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+    def prometheus_text(self, prefix="kgbuilder"):
+        """生成 Prometheus 文本格式的指标"""
+        with self._lock:
+            items = sorted(self.stats.items())
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total 各阶段累计耗时",
+            f"# TYPE {prefix}_stage_seconds_total counter"
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {stats["total_ns"] / 1e9:.6f}'
+                  for name, stats in items]
+        lines += [
+            f"# HELP {prefix}_stage_calls_total 各阶段调用次数",
+            f"# TYPE {prefix}_stage_calls_total counter"
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {stats["count"]}' for name, stats in items]
+        lines += [
+            f"# HELP {prefix}_stage_max_seconds 各阶段单次最大耗时",
+            f"# TYPE {prefix}_stage_max_seconds gauge"
+        ]
+        lines += [f'{prefix}_stage_max_seconds{{stage="{name}"}} {stats["max_ns"] / 1e9:.6f}'
+                  for name, stats in items]
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+# 全局追踪器，默认关闭（环境变量 KG_TRACE=1 时开启）
+tracer = Tracer(enabled=os.environ.get("KG_TRACE") == "1")
+
+
+def traced(name):
+    """函数装饰器：把整个函数调用记录为一个 span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profile_build(output_path, profiler="cprofile"):
+    """
+    对一次构建进行采样/确定性性能分析
+
+    Args:
+        output_path: 输出路径（cProfile 输出 .prof 统计文件，pyinstrument 输出 HTML 报告）
+        profiler: cprofile 或 pyinstrument（可选依赖）
+    """
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("使用 pyinstrument 分析需要先安装: pip install pyinstrument")
+        profile = Profiler()
+        profile.start()
+        try:
+            yield profile
+        finally:
+            profile.stop()
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(profile.output_html())
+    else:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield profile
+        finally:
+            profile.disable()
+            profile.dump_stats(output_path)
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import threading
+
+
+# 支持的导出格式
+EXPORT_FORMAT_JSONL = "jsonl"
+EXPORT_FORMAT_PARQUET = "parquet"
+EXPORT_FORMATS = (EXPORT_FORMAT_JSONL, EXPORT_FORMAT_PARQUET)
+
+# 默认导出目录
+DEFAULT_EXPORT_DIR = os.path.join(".kgbuilder", "exports")
+# 单个文件的最大行数，超过后轮转到新文件
+DEFAULT_MAX_ROWS_PER_FILE = 1000000
+# Parquet 每个行组的行数（内存中最多缓冲这么多行）
+DEFAULT_PARQUET_BATCH_ROWS = 10000
+
+# 导出行的字段（属性字典在 Parquet 中保存为 JSON 字符串）
+EXPORT_FIELDS = ("chunk_id", "doc", "chunk_index", "model", "head", "head_type", "head_properties", "relation",
+                 "tail", "tail_type", "tail_properties")
+
+
+def triple_rows(triples, record, model=None):
+    """把一个文本块的三元组展开为带来源信息的导出行"""
+    for triple in triples:
+        yield {
+            "chunk_id": record.get("chunk_id"),
+            "doc": record.get("doc"),
+            "chunk_index": record.get("index"),
+            "model": model,
+            "head": triple.head,
+            "head_type": triple.head_type,
+            "head_properties": dict(triple.head_properties or {}),
+            "relation": triple.relation,
+            "tail": triple.tail,
+            "tail_type": triple.tail_type,
+            "tail_properties": dict(triple.tail_properties or {})
+        }
+
+
+class _RotatingExporter:
+    """
+    流式三元组导出的公共部分：按行数轮转文件，多个抽取线程可同时写入
+
+    文件命名: {directory}/{prefix}-{序号:05d}.{扩展名}，prefix 默认为导出开始时间，不会覆盖之前构建的文件
+    """
+
+    format = None
+    extension = None
+
+    def __init__(self, directory=DEFAULT_EXPORT_DIR, prefix=None, max_rows_per_file=DEFAULT_MAX_ROWS_PER_FILE):
+        self.directory = directory
+        self.prefix = prefix or f"triples-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.max_rows_per_file = max(1, int(max_rows_per_file))
+        self.files = []
+        self.rows = 0
+        self._file_rows = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _next_path(self):
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.files):05d}.{self.extension}")
+        self.files.append(path)
+        return path
+
+    def write(self, triples, record, model=None):
+        """
+        写入一个文本块的三元组
+
+        Args:
+            triples: 三元组列表（KnowledgeGraphTriple 或 CompactTriple）
+            record: 文本块记录（读取 chunk_id、doc、index）
+            model: 产出这些三元组的模型名称
+        """
+        if not triples:
+            return
+        with self._lock:
+            for row in triple_rows(triples, record, model):
+                if self._file_rows >= self.max_rows_per_file:
+                    self._finish_file()
+                self._write_row(row)
+                self._file_rows += 1
+                self.rows += 1
+
+    def flush(self):
+        """写出缓冲的行并结束当前文件（文件完整可读），之后写入的行进入新文件"""
+        with self._lock:
+            self._finish_file()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def summary(self):
+        with self._lock:
+            return {"format": self.format, "directory": self.directory, "files": list(self.files), "rows": self.rows}
+
+    def _write_row(self, row):
+        raise NotImplementedError
+
+    def _finish_file(self):
+        raise NotImplementedError
+
+
+class JsonlTripleExporter(_RotatingExporter):
+    """逐行写出 JSON Lines 文件，内存占用与构建规模无关"""
+
+    format = EXPORT_FORMAT_JSONL
+    extension = "jsonl"
+
+    def __init__(self, directory=DEFAULT_EXPORT_DIR, prefix=None, max_rows_per_file=DEFAULT_MAX_ROWS_PER_FILE):
+        super().__init__(directory, prefix, max_rows_per_file)
+        self._file = None
+
+    def _write_row(self, row):
+        if self._file is None:
+            self._file = open(self._next_path(), 'w', encoding='utf-8')
+        self._file.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    def _finish_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_rows = 0
+
+
+class ParquetTripleExporter(_RotatingExporter):
+    """
+    按行组写出 Parquet 列式文件（需要安装 pyarrow），内存中最多缓冲 batch_rows 行
+
+    属性字典的键因类型而异，保存为 JSON 字符串列
+    """
+
+    format = EXPORT_FORMAT_PARQUET
+    extension = "parquet"
+
+    def __init__(self, directory=DEFAULT_EXPORT_DIR, prefix=None, max_rows_per_file=DEFAULT_MAX_ROWS_PER_FILE,
+                 batch_rows=DEFAULT_PARQUET_BATCH_ROWS):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("导出 Parquet 需要先安装: pip install pyarrow")
+        super().__init__(directory, prefix, max_rows_per_file)
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.batch_rows = max(1, int(batch_rows))
+        self.schema = pyarrow.schema([(field, pyarrow.int64() if field == "chunk_index" else pyarrow.string())
+                                      for field in EXPORT_FIELDS])
+        self._writer = None
+        self._buffer = []
+
+    def _write_row(self, row):
+        row["head_properties"] = json.dumps(row["head_properties"], ensure_ascii=False, default=str)
+        row["tail_properties"] = json.dumps(row["tail_properties"], ensure_ascii=False, default=str)
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_rows:
+            self._write_batch()
+
+    def _write_batch(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._next_path(), self.schema)
+        self._writer.write_table(self._pa.Table.from_pylist(self._buffer, schema=self.schema))
+        self._buffer = []
+
+    def _finish_file(self):
+        self._write_batch()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._file_rows = 0
+
+
+def open_exporter(fmt=EXPORT_FORMAT_JSONL, directory=DEFAULT_EXPORT_DIR, **options):
+    """
+    创建流式三元组导出器
+
+    Args:
+        fmt: jsonl 或 parquet
+        directory: 导出目录
+        options: prefix、max_rows_per_file，Parquet 另有 batch_rows
+
+    Returns:
+        JsonlTripleExporter 或 ParquetTripleExporter
+    """
+    if fmt == EXPORT_FORMAT_JSONL:
+        return JsonlTripleExporter(directory, **options)
+    if fmt == EXPORT_FORMAT_PARQUET:
+        return ParquetTripleExporter(directory, **options)
+    raise ValueError(f"不支持的导出格式: {fmt}（可选 {', '.join(EXPORT_FORMATS)}）")
@@ -0,0 +1,242 @@
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from utils.property_types import coerce_value, TYPE_STRING
+
+
+# 规则计数项
+RULE_NAME_NORMALIZED = "name_normalized"            # 实体名称经过 Unicode/空白规范化
+RULE_ENTITY_TYPE_NORMALIZED = "entity_type_normalized"  # 实体类型经过规范化或别名映射后命中
+RULE_RELATION_NORMALIZED = "relation_normalized"    # 关系经过规范化或别名映射后命中
+RULE_REVERSED = "reversed"                          # 头尾方向颠倒，已交换
+RULE_PROPERTY_RENAMED = "property_renamed"          # 属性名规范化后映射到声明的属性
+RULE_PROPERTY_DROPPED = "property_dropped"          # 未声明的属性被删除
+RULE_PROPERTY_COERCED = "property_coerced"          # 属性值转换为声明的类型（整数、日期等）
+RULE_PROPERTY_UNCOERCIBLE = "property_uncoercible"  # 属性值无法转换为声明的类型，已删除
+REJECT_ENTITY_TYPE = "rejected_entity_type"
+REJECT_RELATION = "rejected_relation"
+REJECT_CONSTRAINT = "rejected_constraint"
+REJECT_EMPTY_NAME = "rejected_empty_name"
+
+COUNTER_KEYS = ("input", "accepted", "repaired", RULE_NAME_NORMALIZED, RULE_ENTITY_TYPE_NORMALIZED, RULE_RELATION_NORMALIZED,
+                RULE_REVERSED, RULE_PROPERTY_RENAMED, RULE_PROPERTY_DROPPED, RULE_PROPERTY_COERCED,
+                RULE_PROPERTY_UNCOERCIBLE, REJECT_ENTITY_TYPE, REJECT_RELATION, REJECT_CONSTRAINT, REJECT_EMPTY_NAME)
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_LOOKUP_STRIP_PATTERN = re.compile(r'[\s_\-·・]+')
+
+
+def normalize_text(value):
+    """Unicode NFKC 规范化（全角转半角等），合并连续空白并去掉首尾空白"""
+    return _WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", str(value))).strip()
+
+
+def _lookup_key(value):
+    """查表用的键：NFKC、忽略大小写、去掉空白和连接符（"Works_At"、"works at"、"worksAt" 对应同一个键）"""
+    return _LOOKUP_STRIP_PATTERN.sub("", unicodedata.normalize("NFKC", str(value))).casefold()
+
+
+class TripleNormalizer:
+    """
+    基于编译后本体的三元组规范化：在校验前修复 LLM 输出中的常见偏差，而不是直接丢弃
+
+    - 实体名称、类型、关系做 Unicode/空白规范化
+    - 类型和关系按 YAML 中声明的 aliases 映射到标准名称
+    - 关系的头尾类型与约束恰好相反时交换头尾
+    - 属性名映射到该类型声明的 properties，未声明的属性删除（类型未声明 properties 时保留全部属性）
+    - 属性值转换为声明的类型，未声明类型的属性转换为字符串，无法转换的属性删除
+
+    查找表在构建时一次性计算，同一本体的所有文本块共享
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.entity_types = set(compiled.entity_types)
+        self.relation_constraints = compiled.relation_constraints
+
+        self._entity_lookup = {}
+        for entity in compiled.entities:
+            for alias in list(entity.get('aliases') or []) + [entity['name']]:
+                self._entity_lookup[_lookup_key(alias)] = entity['name']
+        self._relation_lookup = {}
+        for rel in compiled.relationships:
+            for alias in list(rel.get('aliases') or []) + [rel['relation']]:
+                self._relation_lookup[_lookup_key(alias)] = rel['relation']
+
+        # 每个类型: 规范化属性名 -> 声明的属性名；未声明属性的类型不过滤
+        self._property_lookup = {}
+        self._property_types = compiled.property_types
+        for entity_type, properties in compiled.entity_properties.items():
+            if properties:
+                lookup = {_lookup_key(prop): prop for prop in properties}
+                lookup[_lookup_key("name")] = "name"
+                self._property_lookup[entity_type] = lookup
+
+    def _entity_type(self, value, counts):
+        if value in self.entity_types:
+            return value
+        entity_type = self._entity_lookup.get(_lookup_key(value))
+        if entity_type is not None:
+            counts[RULE_ENTITY_TYPE_NORMALIZED] += 1
+        return entity_type
+
+    def _relation(self, value):
+        if value in self.relation_constraints:
+            return value, False
+        relation = self._relation_lookup.get(_lookup_key(value))
+        return relation, relation is not None
+
+    def _name(self, value, counts):
+        name = normalize_text(value)
+        if name != value:
+            counts[RULE_NAME_NORMALIZED] += 1
+        return name
+
+    def _coerce(self, entity_type, properties, counts):
+        """按声明的类型转换属性值（None 值删除）"""
+        types = self._property_types.get(entity_type) or {}
+        coerced = {}
+        for key, value in properties.items():
+            if value is None:
+                continue
+            property_type = types.get(key, TYPE_STRING)
+            try:
+                coerced[key] = coerce_value(value, property_type)
+            except ValueError:
+                counts[RULE_PROPERTY_UNCOERCIBLE] += 1
+                continue
+            if property_type != TYPE_STRING and type(coerced[key]) is not type(value):
+                counts[RULE_PROPERTY_COERCED] += 1
+        return coerced
+
+    def _properties(self, entity_type, properties, counts):
+        if not isinstance(properties, dict):
+            return {}
+        lookup = self._property_lookup.get(entity_type)
+        if lookup is None:
+            return self._coerce(entity_type, properties, counts)
+        filtered = {}
+        for key, value in properties.items():
+            declared = key if key in lookup.values() else lookup.get(_lookup_key(key))
+            if declared is None:
+                counts[RULE_PROPERTY_DROPPED] += 1
+                continue
+            if declared != key:
+                counts[RULE_PROPERTY_RENAMED] += 1
+            filtered[declared] = value
+        return self._coerce(entity_type, filtered, counts)
+
+    def coerce_triples(self, triples):
+        """
+        只做属性类型转换（如工作队列结果经过 JSON 序列化后，日期变成了字符串）
+
+        替换而不是原地修改属性字典，CompactTriple 之间可能共享同一个字典
+        """
+        counts = {key: 0 for key in COUNTER_KEYS}
+        for triple in triples:
+            triple.head_properties = self._coerce(triple.head_type, triple.head_properties or {}, counts)
+            triple.tail_properties = self._coerce(triple.tail_type, triple.tail_properties or {}, counts)
+        return triples
+
+    def normalize(self, triples, counts=None):
+        """
+        批量规范化并校验三元组（原地修改通过的三元组）
+
+        Args:
+            triples: KnowledgeGraphTriple 等具有三元组属性的对象列表
+            counts: 可选计数字典，按规则累加（见 COUNTER_KEYS）
+
+        Returns:
+            (通过校验的三元组列表, [(被拒绝的三元组, 原因)])
+        """
+        if counts is None:
+            counts = {}
+        for key in COUNTER_KEYS:
+            counts.setdefault(key, 0)
+
+        accepted = []
+        rejected = []
+        for triple in triples:
+            counts["input"] += 1
+            head_type = self._entity_type(triple.head_type, counts)
+            tail_type = self._entity_type(triple.tail_type, counts)
+            if head_type is None or tail_type is None:
+                counts[REJECT_ENTITY_TYPE] += 1
+                rejected.append((triple, REJECT_ENTITY_TYPE))
+                continue
+
+            # 类型、关系或方向经过修复才通过校验的三元组，原先的精确匹配过滤会直接丢弃
+            repaired = head_type != triple.head_type or tail_type != triple.tail_type
+
+            relation, relation_normalized = self._relation(triple.relation)
+            if relation is None:
+                counts[REJECT_RELATION] += 1
+                rejected.append((triple, REJECT_RELATION))
+                continue
+
+            head, tail = self._name(triple.head, counts), self._name(triple.tail, counts)
+            if not head or not tail:
+                counts[REJECT_EMPTY_NAME] += 1
+                rejected.append((triple, REJECT_EMPTY_NAME))
+                continue
+
+            head_properties, tail_properties = triple.head_properties, triple.tail_properties
+            constraint = self.relation_constraints[relation]
+            if head_type != constraint['head'] or tail_type != constraint['tail']:
+                if head_type == constraint['tail'] and tail_type == constraint['head']:
+                    # 方向颠倒：交换头尾实体及其属性
+                    head, tail = tail, head
+                    head_type, tail_type = tail_type, head_type
+                    head_properties, tail_properties = tail_properties, head_properties
+                    counts[RULE_REVERSED] += 1
+                    repaired = True
+                else:
+                    counts[REJECT_CONSTRAINT] += 1
+                    rejected.append((triple, REJECT_CONSTRAINT))
+                    continue
+
+            if relation_normalized:
+                counts[RULE_RELATION_NORMALIZED] += 1
+                repaired = True
+            counts["repaired"] += int(repaired)
+            triple.head, triple.head_type = head, head_type
+            triple.tail, triple.tail_type = tail, tail_type
+            triple.relation = relation
+            triple.head_properties = self._properties(head_type, head_properties, counts)
+            triple.tail_properties = self._properties(tail_type, tail_properties, counts)
+            counts["accepted"] += 1
+            accepted.append(triple)
+        return accepted, rejected
+
+
+@lru_cache(maxsize=32)
+def get_normalizer(compiled):
+    """按编译后的本体缓存规范化器（compile_ontology 对同一 YAML 返回同一对象）"""
+    return TripleNormalizer(compiled)
+
+
+class NormalizationStats:
+    """线程安全的规范化计数汇总，在一次构建的所有文本块之间共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {key: 0 for key in COUNTER_KEYS}
+
+    def add(self, counts):
+        with self._lock:
+            for key, value in counts.items():
+                self._counts[key] = self._counts.get(key, 0) + value
+
+    def counts(self):
+        """原始计数（可传给另一个 NormalizationStats 的 add()）"""
+        with self._lock:
+            return dict(self._counts)
+
+    def summary(self):
+        """各规则的计数、被拒绝的三元组数和通过率（repaired 为经过修复才通过校验的三元组数）"""
+        with self._lock:
+            stats = dict(self._counts)
+        stats["rejected"] = stats["input"] - stats["accepted"]
+        stats["acceptance_rate"] = round(stats["accepted"] / stats["input"], 4) if stats["input"] else 0
+        return stats
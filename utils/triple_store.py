@@ -0,0 +1,201 @@
+import sys
+import json
+from array import array
+from collections import Counter
+
+
+_EMPTY_PROPERTIES = {}
+
+
+class Interner:
+    """字符串驻留表：相同字符串只保存一份，用连续的整数 ID 引用"""
+
+    __slots__ = ("_ids", "_values")
+
+    def __init__(self):
+        self._ids = {}
+        self._values = []
+
+    def intern(self, value):
+        idx = self._ids.get(value)
+        if idx is None:
+            idx = self._ids[value] = len(self._values)
+            self._values.append(value)
+        return idx
+
+    def get_id(self, value):
+        return self._ids.get(value)
+
+    def __getitem__(self, idx):
+        return self._values[idx]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+
+class CompactTriple:
+    """
+    轻量三元组：与 KnowledgeGraphTriple 具有相同的属性，可直接传给 generate_cypher，
+    不经过 pydantic 校验；属性字典可能在多个三元组之间共享，不要原地修改
+    """
+
+    __slots__ = ("head", "head_type", "head_properties", "relation", "tail", "tail_type", "tail_properties",
+                 "source")
+
+    def __init__(self, head, head_type, relation, tail, tail_type, head_properties=None, tail_properties=None,
+                 source=None):
+        self.head = head
+        self.head_type = head_type
+        self.head_properties = head_properties or _EMPTY_PROPERTIES
+        self.relation = relation
+        self.tail = tail
+        self.tail_type = tail_type
+        self.tail_properties = tail_properties or _EMPTY_PROPERTIES
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, data, source=None):
+        """从已解析的 JSON 字典构建（如工作队列返回的结果），缺失字段按空值处理"""
+        return cls(data.get('head', ''), data.get('head_type', ''), data.get('relation', ''),
+                   data.get('tail', ''), data.get('tail_type', ''),
+                   data.get('head_properties') or None, data.get('tail_properties') or None, source)
+
+    def to_dict(self):
+        return {
+            "head": self.head,
+            "head_type": self.head_type,
+            "head_properties": dict(self.head_properties),
+            "relation": self.relation,
+            "tail": self.tail,
+            "tail_type": self.tail_type,
+            "tail_properties": dict(self.tail_properties)
+        }
+
+    def to_model(self):
+        """转换为 pydantic 的 KnowledgeGraphTriple（仅在对外接口处使用）"""
+        from utils.llm_extractor import KnowledgeGraphTriple
+        return KnowledgeGraphTriple(**self.to_dict())
+
+    def __repr__(self):
+        return f"CompactTriple({self.head!r}:{self.head_type} -[{self.relation}]-> {self.tail!r}:{self.tail_type})"
+
+
+def _properties_key(properties):
+    """属性字典的去重键：值均可哈希时使用排序后的键值元组，否则退回 JSON 序列化"""
+    try:
+        items = tuple(sorted(properties.items()))
+        hash(items)
+        return items
+    except TypeError:
+        return json.dumps(properties, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class TripleStore:
+    """
+    大规模构建使用的列式三元组存储
+
+    - 实体名、类型名和关系名驻留为整数 ID，每个三元组只占 8 个 32 位整数
+    - 内容相同的属性字典只保存一份（ID 0 为空字典）
+    - 读取时按需生成 CompactTriple，需要 pydantic 模型时再调用 to_model()
+    """
+
+    _COLUMNS = ("head", "head_type", "relation", "tail", "tail_type", "head_properties", "tail_properties",
+                "source")
+
+    def __init__(self):
+        # 实体名和来源（chunk_id）数量大，类型名和关系名数量小，分开驻留
+        self.names = Interner()
+        self.labels = Interner()
+        self._properties = [_EMPTY_PROPERTIES]
+        self._property_ids = {_properties_key(_EMPTY_PROPERTIES): 0}
+        self._columns = {column: array('I') for column in self._COLUMNS}
+
+    def _intern_properties(self, properties):
+        if not properties:
+            return 0
+        key = _properties_key(properties)
+        idx = self._property_ids.get(key)
+        if idx is None:
+            idx = self._property_ids[key] = len(self._properties)
+            self._properties.append(dict(properties))
+        return idx
+
+    def add(self, head, head_type, relation, tail, tail_type, head_properties=None, tail_properties=None,
+            source=None):
+        """追加一个三元组，返回其下标"""
+        columns = self._columns
+        columns["head"].append(self.names.intern(head))
+        columns["head_type"].append(self.labels.intern(head_type))
+        columns["relation"].append(self.labels.intern(relation))
+        columns["tail"].append(self.names.intern(tail))
+        columns["tail_type"].append(self.labels.intern(tail_type))
+        columns["head_properties"].append(self._intern_properties(head_properties))
+        columns["tail_properties"].append(self._intern_properties(tail_properties))
+        # 来源 ID 加 1 存储，0 表示未知来源
+        columns["source"].append(self.names.intern(source) + 1 if source is not None else 0)
+        return len(columns["head"]) - 1
+
+    def add_triple(self, triple, source=None):
+        """追加 KnowledgeGraphTriple / CompactTriple 或字典"""
+        if isinstance(triple, dict):
+            return self.add(triple.get('head', ''), triple.get('head_type', ''), triple.get('relation', ''),
+                            triple.get('tail', ''), triple.get('tail_type', ''), triple.get('head_properties'),
+                            triple.get('tail_properties'), source)
+        return self.add(triple.head, triple.head_type, triple.relation, triple.tail, triple.tail_type,
+                        triple.head_properties, triple.tail_properties,
+                        source if source is not None else getattr(triple, "source", None))
+
+    def extend(self, triples, source=None):
+        for triple in triples:
+            self.add_triple(triple, source)
+
+    def __len__(self):
+        return len(self._columns["head"])
+
+    def __getitem__(self, idx):
+        columns = self._columns
+        source = columns["source"][idx]
+        return CompactTriple(
+            self.names[columns["head"][idx]],
+            self.labels[columns["head_type"][idx]],
+            self.labels[columns["relation"][idx]],
+            self.names[columns["tail"][idx]],
+            self.labels[columns["tail_type"][idx]],
+            self._properties[columns["head_properties"][idx]],
+            self._properties[columns["tail_properties"][idx]],
+            self.names[source - 1] if source else None
+        )
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def iter_models(self):
+        """逐个转换为 pydantic 模型（对外接口处使用）"""
+        for triple in self:
+            yield triple.to_model()
+
+    def iter_dicts(self):
+        for triple in self:
+            yield triple.to_dict()
+
+    def count_by(self, column):
+        """按列统计（如 relation、head_type），直接在整数列上计数"""
+        counts = Counter(self._columns[column])
+        if column == "source":
+            return {self.names[idx - 1] if idx else None: count for idx, count in counts.items()}
+        if column in ("head_properties", "tail_properties"):
+            return {idx: count for idx, count in counts.items()}
+        interner = self.labels if column in ("head_type", "relation", "tail_type") else self.names
+        return {interner[idx]: count for idx, count in counts.items()}
+
+    def memory_bytes(self):
+        """估算存储占用的字节数（整数列 + 驻留的字符串 + 共享属性字典）"""
+        total = sum(column.itemsize * len(column) for column in self._columns.values())
+        total += sum(sys.getsizeof(value) for value in self.names)
+        total += sum(sys.getsizeof(value) for value in self.labels)
+        total += sum(sys.getsizeof(properties) for properties in self._properties)
+        return total
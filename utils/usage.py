@@ -0,0 +1,105 @@
+import threading
+from utils.token_accounting import estimate_cost
+
+
+def parse_token_usage(token_usage):
+    """
+    从响应的 usage 字段中提取 token 用量，兼容不同服务商的缓存字段
+
+    - OpenAI / 智谱 / 通义千问: prompt_tokens_details.cached_tokens
+    - DeepSeek: prompt_cache_hit_tokens
+    - Anthropic: cache_read_input_tokens（input_tokens 不含缓存读取和缓存写入的 token，prompt_tokens 取三者之和，
+      与其他服务商一致，缓存命中率的分母为完整的输入 token 数）
+
+    Returns:
+        {"prompt_tokens", "completion_tokens", "cached_tokens"}，无法识别时返回 None
+    """
+    if not token_usage:
+        return None
+
+    prompt_tokens = token_usage.get('prompt_tokens', token_usage.get('input_tokens', 0)) or 0
+    if 'prompt_tokens' not in token_usage:
+        prompt_tokens += ((token_usage.get('cache_read_input_tokens') or 0) +
+                          (token_usage.get('cache_creation_input_tokens') or 0))
+    completion_tokens = token_usage.get('completion_tokens', token_usage.get('output_tokens', 0)) or 0
+
+    cached_tokens = None
+    details = token_usage.get('prompt_tokens_details') or token_usage.get('input_token_details') or {}
+    if isinstance(details, dict):
+        cached_tokens = details.get('cached_tokens', details.get('cache_read'))
+    if cached_tokens is None:
+        cached_tokens = token_usage.get('prompt_cache_hit_tokens', token_usage.get('cache_read_input_tokens'))
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        # None 表示服务商未报告缓存信息
+        "cached_tokens": cached_tokens
+    }
+
+
+class UsageTracker:
+    """线程安全的 token 用量统计，记录每次 LLM 响应的实际用量和缓存命中情况"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_model = {}
+
+    def record(self, model_name, usage, latency=None):
+        """
+        记录一次响应的用量
+
+        Args:
+            model_name: 模型名称
+            usage: parse_token_usage 的返回值
+            latency: 可选，本次请求的耗时（秒）
+        """
+        if not usage:
+            return
+        with self._lock:
+            stats = self.by_model.setdefault(model_name, {
+                "requests": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "cache_reported_prompt_tokens": 0,
+                "latency_seconds": 0.0,
+                "latency_requests": 0
+            })
+            stats["requests"] += 1
+            stats["prompt_tokens"] += usage["prompt_tokens"]
+            stats["completion_tokens"] += usage["completion_tokens"]
+            if usage["cached_tokens"] is not None:
+                stats["cached_tokens"] += usage["cached_tokens"]
+                stats["cache_reported_prompt_tokens"] += usage["prompt_tokens"]
+            if latency is not None:
+                stats["latency_seconds"] += latency
+                stats["latency_requests"] += 1
+
+    def summary(self):
+        """
+        汇总所有模型的用量，cache_hit_rate 只在报告了缓存信息的请求上计算；
+        estimated_cost 按参考价格估算（美元），任一模型价格未知时为 None
+        """
+        with self._lock:
+            total = {
+                "requests": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "cache_reported_prompt_tokens": 0,
+                "latency_seconds": 0.0,
+                "latency_requests": 0
+            }
+            costs = []
+            for model_name, stats in self.by_model.items():
+                for key in total:
+                    total[key] += stats[key]
+                costs.append(estimate_cost(model_name, stats["prompt_tokens"], stats["completion_tokens"]))
+        reported = total.pop("cache_reported_prompt_tokens")
+        total["cache_hit_rate"] = round(total["cached_tokens"] / reported, 4) if reported else None
+        latency_seconds = total.pop("latency_seconds")
+        latency_requests = total.pop("latency_requests")
+        total["avg_latency_seconds"] = round(latency_seconds / latency_requests, 3) if latency_requests else None
+        total["estimated_cost"] = round(sum(costs), 4) if costs and None not in costs else None
+        return total
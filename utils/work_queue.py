@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# 任务状态
+TASK_PENDING = "pending"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+
+def triple_to_dict(triple):
+    """把三元组对象序列化为字典（兼容 pydantic v1/v2）"""
+    if hasattr(triple, "model_dump"):
+        return triple.model_dump()
+    return triple.dict()
+
+
+class ChunkQueue:
+    """
+    持久化的文本块工作队列（SQLite 实现，仅限单机：协调者和工作进程须在同一台机器上访问本地磁盘上的队列文件）
+
+    协调者发布文本块，工作进程租用 (lease) 文本块并在可见性超时内完成；
+    超时未完成的租约（如工作进程崩溃）会被其他工作进程重新租用。
+    队列使用 WAL 模式，依赖共享内存和可靠的文件锁，不能放在 NFS/SMB 等网络文件系统上；
+    跨机器分发需要替换为基于服务端的实现（如 Redis），对外接口只有 publish / lease / complete / fail / collect。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chunk_id TEXT,
+                    doc TEXT,
+                    chunk_index INTEGER,
+                    text TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    collected INTEGER DEFAULT 0,
+                    updated_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+
+    def set_meta(self, **values):
+        """保存构建参数（本体、模型等），工作进程从队列中读取，保证所有节点使用同一配置"""
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [(key, json.dumps(value, ensure_ascii=False)) for key, value in values.items()])
+
+    def get_meta(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT key, value FROM meta").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def publish(self, records, batch_size=500):
+        """发布文本块记录，返回发布数量（支持迭代器，按批写入）"""
+        count = 0
+        now = time.time()
+        batch = []
+        with self._connect() as conn:
+            for record in records:
+                batch.append((record["chunk_id"], record["doc"], record["index"], record["text"],
+                              TASK_PENDING, now))
+                if len(batch) >= batch_size:
+                    self._insert(conn, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self._insert(conn, batch)
+                count += len(batch)
+        return count
+
+    @staticmethod
+    def _insert(conn, batch):
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO tasks (chunk_id, doc, chunk_index, text, status, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            batch)
+        conn.execute("COMMIT")
+
+    def lease(self, worker_id, count=1, visibility_timeout=300, max_attempts=3):
+        """
+        租用最多 count 个待处理文本块（包括租约已过期的文本块）
+
+        租约过期且已达到 max_attempts 次尝试的文本块（如每次都让工作进程崩溃或卡死）不再重新租用，
+        在同一事务中标记为失败
+
+        Returns:
+            [{"task_id", "chunk_id", "doc", "index", "text"}]
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE 获取写锁，保证多个工作进程不会租到同一个文本块
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                    "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                    (TASK_FAILED, f"租约超时，已尝试 {max_attempts} 次", now, TASK_LEASED, now, max_attempts))
+                rows = conn.execute(
+                    "SELECT id, chunk_id, doc, chunk_index, text FROM tasks "
+                    "WHERE status = ? OR (status = ? AND lease_expires < ? AND attempts < ?) "
+                    "ORDER BY id LIMIT ?",
+                    (TASK_PENDING, TASK_LEASED, now, max_attempts, count)).fetchall()
+                conn.executemany(
+                    "UPDATE tasks SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE id = ?",
+                    [(TASK_LEASED, worker_id, now + visibility_timeout, now, row[0]) for row in rows])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [{"task_id": row[0], "chunk_id": row[1], "doc": row[2], "index": row[3], "text": row[4]}
+                for row in rows]
+
+    def complete(self, task_id, worker_id, triples):
+        """提交结果；租约已被其他工作进程接管时返回 False，结果被丢弃"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (TASK_DONE, json.dumps(triples, ensure_ascii=False, default=str), time.time(), task_id, TASK_LEASED, worker_id))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker_id, error, max_attempts=3):
+        """报告处理失败：未超过最大尝试次数时重新入队，否则标记为失败"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (max_attempts, TASK_FAILED, TASK_PENDING, error, time.time(), task_id, TASK_LEASED, worker_id))
+
+    def fetch_done(self, limit=100):
+        """
+        读取已完成但尚未确认收集的结果（不修改状态）；协调者写入成功后调用 ack()，
+        写入中途失败或协调者崩溃时，未确认的结果在下一次 collect 中重新读取（MERGE 写入可重复执行）
+
+        Returns:
+            [{"task_id", "chunk_id", "doc", "index", "triples"}]
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, chunk_id, doc, chunk_index, result FROM tasks "
+                "WHERE status = ? AND collected = 0 ORDER BY id LIMIT ?",
+                (TASK_DONE, limit)).fetchall()
+        return [{"task_id": row[0], "chunk_id": row[1], "doc": row[2], "index": row[3],
+                 "triples": json.loads(row[4] or "[]")}
+                for row in rows]
+
+    def ack(self, task_ids):
+        """确认结果已写入，标记为已收集"""
+        with self._connect() as conn:
+            conn.executemany("UPDATE tasks SET collected = 1 WHERE id = ?", [(task_id,) for task_id in task_ids])
+
+    def counts(self):
+        """各状态的文本块数量"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        counts = {TASK_PENDING: 0, TASK_LEASED: 0, TASK_DONE: 0, TASK_FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def is_finished(self):
+        counts = self.counts()
+        return counts[TASK_PENDING] == 0 and counts[TASK_LEASED] == 0
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(queue, api_key, worker_id=None, concurrency=4, visibility_timeout=300, max_attempts=3,
+               poll_interval=2.0, exit_when_empty=True, on_task=None):
+    """
+    工作进程主循环：租用文本块、调用 LLM 抽取并提交三元组
+
+    Args:
+        queue: ChunkQueue
+        api_key: LLM API Key
+        worker_id: 工作进程标识（默认 主机名-进程号）
+        concurrency: 本进程内并发 LLM 请求数（每完成一个文本块补租一个，始终保持该数量的在途请求）
+        visibility_timeout: 租约可见性超时（秒），超时未完成的文本块会被重新分配
+        max_attempts: 单个文本块的最大尝试次数
+        poll_interval: 队列为空时的轮询间隔（秒）
+        exit_when_empty: 队列中没有待处理和处理中的文本块时退出
+        on_task: 可选回调 on_task(task, triples_count, error)
+
+    Returns:
+        本进程处理的文本块数量
+    """
+    from utils.llm_extractor import process_text_with_llm
+
+    worker_id = worker_id or default_worker_id()
+    meta = queue.get_meta()
+    ontology = meta["ontology"]
+    model_name = meta.get("model", "glm-4-flash")
+    extract_options = meta.get("extract_options", {})
+    processed = 0
+
+    def handle(task):
+        # process_text_with_llm 捕获调用异常并返回空列表，通过 report 区分失败和“没有三元组”，失败的文本块按 fail() 重试
+        report = {}
+        triples = process_text_with_llm(task["text"], ontology, api_key, model_name, report=report,
+                                        log_context={"chunk_id": task["chunk_id"], "doc": task["doc"],
+                                                     "worker_id": worker_id}, **extract_options)
+        if report.get("error"):
+            raise RuntimeError(report["error"])
+        return [triple_to_dict(triple) for triple in triples]
+
+    concurrency = max(1, concurrency)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            # 每完成一个文本块就补租一个，慢文本块不会让其他槽位空闲
+            free_slots = concurrency - len(in_flight)
+            if free_slots > 0:
+                for task in queue.lease(worker_id, free_slots, visibility_timeout, max_attempts):
+                    in_flight[executor.submit(handle, task)] = task
+            if not in_flight:
+                if exit_when_empty and queue.is_finished():
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            # 仍有空闲槽位时按轮询间隔醒来，接收其他进程新发布的文本块
+            timeout = poll_interval if len(in_flight) < concurrency else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = in_flight.pop(future)
+                try:
+                    triples = future.result()
+                    queue.complete(task["task_id"], worker_id, triples)
+                    error = None
+                except Exception as e:
+                    triples = []
+                    error = str(e)
+                    queue.fail(task["task_id"], worker_id, error, max_attempts)
+                processed += 1
+                if on_task is not None:
+                    on_task(task, len(triples), error)